@@ -1,4 +1,4 @@
-from log.config import logger, debug, info, warning, error, exception, catch, success, trace, notice, set_level
+from log.config import logger, debug, info, warning, error, exception, catch, success, trace, notice, set_level, set_enqueue
 
 
 __all__ = [
@@ -13,6 +13,7 @@ __all__ = [
     "success",
     "trace",
     "set_level",
+    "set_enqueue",
 ]
 
 try:
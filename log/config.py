@@ -1,7 +1,7 @@
 from loguru import logger
 
 import sys
-import os
+import time
 from enum import Enum
 from functools import partial
 
@@ -21,6 +21,14 @@ __all__ = [
 
 CONSOLE = True
 LOG_FILE_PATH = None  # r"t:/d_maya/log.log"
+# Non-blocking mode: records are queued and written by a background thread.
+# Off by default so sinks inside Maya write on the calling thread; servers turn it on with set_enqueue
+ENQUEUE = False
+# File rotation: whichever of size / age is reached first; old files are compressed and pruned
+LOG_ROTATION_SIZE = 10 * 1024 * 1024
+LOG_ROTATION_INTERVAL = 24 * 60 * 60
+LOG_COMPRESSION = "zip"
+LOG_RETENTION = "10 days"
 
 
 # format
@@ -45,13 +53,108 @@ except Exception:
 logger.notice = partial(logger.log, "NOTICE")
 
 # filter
-_log_filter = {"level": "TRACE"}
+# The threshold number is resolved once in set_level, not per record
+_log_filter = {"level": "TRACE", "no": logger.level("TRACE").no}
 
 
 def level_filter(record):
-    filter_level = _log_filter["level"]
-    current_level_no = logger.level(filter_level).no
-    return record["level"].no >= current_level_no
+    return record["level"].no >= _log_filter["no"]
+
+
+class SizeOrTimeRotation:
+    """Rotate when the file would exceed `size` bytes or has been open for `interval` seconds."""
+
+    def __init__(self, size=LOG_ROTATION_SIZE, interval=LOG_ROTATION_INTERVAL):
+        self.size = size
+        self.interval = interval
+        self._file = None
+        self._opened = 0.0
+
+    def __call__(self, message, file):
+        now = message.record["time"].timestamp()
+        if file is not self._file:
+            self._file = file
+            self._opened = now
+        return file.tell() + len(message) > self.size or now - self._opened >= self.interval
+
+
+# Callables (name, seconds) told how long each console write took; see add_sink_hook
+sink_hooks = []
+
+
+class TimedStream:
+    """Proxy to a text stream that reports the duration of each write to sink_hooks."""
+
+    def __init__(self, name, stream):
+        self.name = name
+        self._stream = stream
+
+    def write(self, message):
+        start = time.perf_counter()
+        self._stream.write(message)
+        elapsed = time.perf_counter() - start
+        for hook in sink_hooks:
+            hook(self.name, elapsed)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+# Clear existing handlers
+logger.remove()
+#
+
+CONSOLE_ID = None
+LOG_FILE_ID = None
+
+
+def _add_sinks():
+    """(Re)add the console and file sinks at the current threshold.
+
+    Sinks are added with the threshold as their level, so loguru drops disabled
+    levels before building the record (no frame lookup, no formatting).
+    """
+    global CONSOLE_ID, LOG_FILE_ID
+    level = _log_filter["no"]
+    # Console
+    if CONSOLE:
+        if CONSOLE_ID is not None:
+            logger.remove(CONSOLE_ID)
+        CONSOLE_ID = logger.add(
+            # The plain stream keeps loguru's Windows console handling when nothing is timing it
+            TimedStream("console", sys.stdout) if sink_hooks else sys.stdout,  # 输出到控制台
+            level=level,  # 最低日志级别
+            filter=level_filter,
+            format=formatter,
+            enqueue=ENQUEUE,
+        )
+
+    # File
+    if LOG_FILE_PATH:
+        if LOG_FILE_ID is not None:
+            logger.remove(LOG_FILE_ID)
+        LOG_FILE_ID = logger.add(
+            LOG_FILE_PATH,  # 输出到文件
+            level=level,  # 最低日志级别
+            filter=level_filter,
+            format=formatter,
+            enqueue=ENQUEUE,
+            rotation=SizeOrTimeRotation(),
+            compression=LOG_COMPRESSION,
+            retention=LOG_RETENTION,
+        )
+
+
+_add_sinks()
+
+
+def add_sink_hook(hook):
+    """Time console writes and report them to hook(name, seconds)."""
+    sink_hooks.append(hook)
+    _add_sinks()
 
 
 # set level
@@ -62,35 +165,16 @@ def set_level(level: int):
         logger.error("Invalid level type. Must be str or int.")
         return
     _log_filter["level"] = level
+    _log_filter["no"] = logger.level(level).no
+    _add_sinks()
     logger.success(f"Log level set to '{level}'")
 
 
-# Clear existing handlers
-logger.remove()
-#
-
-# Console
-LOG_CONSOLE_ID = None
-if CONSOLE:
-    CONSOLE_ID = logger.add(
-        sys.stdout,  # 输出到控制台
-        level="TRACE",  # 最低日志级别
-        filter=level_filter,
-        format=formatter,
-    )
-
-
-# File
-LOG_FILE_ID = None
-if LOG_FILE_PATH:
-    if os.path.exists(LOG_FILE_PATH):
-        os.remove(LOG_FILE_PATH)
-    LOG_FILE_ID = logger.add(
-        LOG_FILE_PATH,  # 输出到文件
-        level="TRACE",  # 最低日志级别
-        filter=level_filter,
-        format=formatter,
-    )
+def set_enqueue(enabled: bool = True):
+    """Switch the console and file sinks to (or from) non-blocking, queued writes."""
+    global ENQUEUE
+    ENQUEUE = enabled
+    _add_sinks()
 
 
 # Modify handler levels
@@ -1,4 +1,6 @@
-from functools import partial
+import threading
+import time
+from collections import Counter, deque
 
 from log.config import logger, level_filter, DEFAULT_FORMAT
 from log.mayaScriptLineColor import ScriptEditorStyler
@@ -7,11 +9,33 @@ from maya import cmds, utils
 
 __all__ = ["uiMessage"]
 
+# Messages kept per flush; older ones are folded into a "+N more" summary
+MAX_PENDING = 3
+# Minimum seconds between two flushes to the viewport
+FLUSH_INTERVAL = 0.1
+
 
 class MessageHandler:
-    def __init__(self):
-        self._message_list = []
+    """Coalescing, rate-limited queue in front of cmds.inViewMessage.
+
+    show() only appends to a bounded deque and schedules at most one deferred
+    flush, at most once per flush_interval, so log bursts from any thread cost
+    the UI thread a handful of inViewMessage calls.
+
+    :param cmds: maya.cmds or a stub with inViewMessage.
+    :param utils: maya.utils or a stub with executeDeferred.
+    """
+
+    def __init__(self, cmds=cmds, utils=utils, max_pending=MAX_PENDING, flush_interval=FLUSH_INTERVAL):
+        self.cmds = cmds
+        self.utils = utils
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=max_pending)
+        self._overflow = Counter()
         self._job_scheduled = False
+        self._last_flush = 0.0
 
         self._is_muted = False
         self.pos = "botLeft"
@@ -20,46 +44,58 @@ class MessageHandler:
         self.fadeStayTime = 1000
         self.fadeOutTime = 100
 
+    def _schedule(self):
+        delay = self._last_flush + self.flush_interval - time.monotonic()
+        if delay > 0:
+            timer = threading.Timer(delay, self.utils.executeDeferred, (self._show_messages,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.utils.executeDeferred(self._show_messages)
+
     def _show_messages(self):
-        if not self._message_list:
+        with self._lock:
+            pending = list(self._pending)
+            overflow = self._overflow
+            self._pending.clear()
+            self._overflow = Counter()
             self._job_scheduled = False
-            return
+            self._last_flush = time.monotonic()
 
-        self._job_scheduled = False
+        if overflow:
+            summary = ", ".join(
+                f"+{count} more {level.lower()} message{'s' if count > 1 else ''}" for level, count in overflow.most_common()
+            )
+            level = max(overflow, key=lambda x: LEVEL_PRIORITY.get(x, 0))
+            color = LEVEL_COLORS.get(level, "#FFFFFF")
+            pending.insert(0, (level, {**pending[-1][1], "amg": f'<font color="{color}">{summary}</font>'}))
 
-        for showMessage_command in self._message_list:
+        for _, kwargs in pending:
             try:
-                showMessage_command()
+                self.cmds.inViewMessage(**kwargs)
             except Exception:
                 pass
-        self._message_list.clear()
 
-    def show(self, msg, *args, **kwargs):
+    def show(self, msg, *args, level=None, **kwargs):
         """Displays a message in the viewport unless muted."""
         if self._is_muted:
             return
-        pos = kwargs.get("pos") or kwargs.get("position") or self.pos
-        fade = kwargs.get("fade") or kwargs.get("f") or self.fade
-        fadeInTime = kwargs.get("fadeInTime") or kwargs.get("fit") or self.fadeInTime
-        fadeStayTime = kwargs.get("fadeStayTime") or kwargs.get("fst") or self.fadeStayTime
-        fadeOutTime = kwargs.get("fadeOutTime") or kwargs.get("fot") or self.fadeOutTime
-
-        showMessage_command = partial(
-            cmds.inViewMessage,
+        command = dict(
             amg=msg,
-            pos=pos,
-            fade=fade,
-            fadeInTime=fadeInTime,
-            fadeStayTime=fadeStayTime,
-            fadeOutTime=fadeOutTime,
+            pos=kwargs.get("pos") or kwargs.get("position") or self.pos,
+            fade=kwargs.get("fade") or kwargs.get("f") or self.fade,
+            fadeInTime=kwargs.get("fadeInTime") or kwargs.get("fit") or self.fadeInTime,
+            fadeStayTime=kwargs.get("fadeStayTime") or kwargs.get("fst") or self.fadeStayTime,
+            fadeOutTime=kwargs.get("fadeOutTime") or kwargs.get("fot") or self.fadeOutTime,
         )
-        self._message_list.append(showMessage_command)
-        if len(self._message_list) > 3:
-            self._message_list.pop(0)
-
-        if not self._job_scheduled:
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._overflow[self._pending[0][0] or "INFO"] += 1
+            self._pending.append((level, command))
+            if self._job_scheduled:
+                return
             self._job_scheduled = True
-            utils.executeDeferred(self._show_messages)
+        self._schedule()
 
     def mute(self, mute_status: bool = None):
         """Sets the mute status."""
@@ -88,6 +124,8 @@ LEVEL_COLORS = {
     "WARNING": "#f5f543",
     "ERROR": "#f14c4c",
 }
+# A "+N more" summary folding several levels takes the color of the most severe one
+LEVEL_PRIORITY = {"TRACE": 0, "DEBUG": 1, "INFO": 2, "NOTICE": 3, "SUCCESS": 4, "WARNING": 5, "ERROR": 6}
 
 uiMessage = MessageHandler()
 scriptStyler = ScriptEditorStyler()
@@ -100,7 +138,7 @@ def popup_sink(message):
     color = LEVEL_COLORS.get(level_name, "#FFFFFF")
     msg = f'<font color="{color}">{level_name}: {log_message}</font>'
     scriptStyler.update(level_name)
-    uiMessage.show(msg)
+    uiMessage.show(msg, level=level_name)
 
 
 # Maya inViewMessage format
@@ -1,8 +1,15 @@
+import threading
+from functools import partial
+
 from maya import cmds, utils
-import maya.OpenMayaUI as omui
 
-from shiboken2 import wrapInstance
-from PySide2.QtWidgets import QWidget, QLineEdit
+# Qt bindings only exist in an interactive Maya session
+try:
+    import maya.OpenMayaUI as omui
+    from shiboken2 import wrapInstance
+    from PySide2.QtWidgets import QWidget, QLineEdit
+except ImportError:
+    omui = wrapInstance = QWidget = QLineEdit = None
 
 
 error_style_sheet = """
@@ -13,7 +20,7 @@ error_style_sheet = """
 
     }
     QLineEdit:focus {
-        border-color: #5C9DED; 
+        border-color: #5C9DED;
     }
 """
 
@@ -25,7 +32,7 @@ warning_style_sheet = """
 
     }
     QLineEdit:focus {
-        border-color: #5C9DED; 
+        border-color: #5C9DED;
 
     }
 """
@@ -38,7 +45,7 @@ success_style_sheet = """
 
     }
     QLineEdit:focus {
-        border-color: #5C9DED; 
+        border-color: #5C9DED;
 
     }
 """
@@ -50,47 +57,91 @@ style_sheet_dict = {
     "SUCCESS": success_style_sheet,
 }
 
+# Within one flush the most severe level wins, so a burst ending in INFO still shows its error
+LEVEL_PRIORITY = {"ERROR": 3, "WARNING": 2, "SUCCESS": 1}
 
-class ScriptEditorStyler:
-    def __init__(self):
-        self._job_scheduled = False
 
-        self._commandLine_list = []
-        self._lineEdit_list = []
+def find_line_edits(maya_cmds=cmds):
+    """Return the enabled QLineEdit of every Maya command line."""
+    if wrapInstance is None:
+        return []
+    line_edits = []
+    for x in maya_cmds.lsUI(type="commandLine") or []:
+        maya_control = omui.MQtUtil.findControl(x)
+        if not maya_control:
+            continue
+        qt_commandLine = wrapInstance(int(maya_control), QWidget)
+        for lineEdit in qt_commandLine.findChildren(QLineEdit):
+            if lineEdit.isEnabled():
+                line_edits.append(lineEdit)
+                break
+    return line_edits
 
-        self._jobs = []
-        self._level = "INFO"
 
-        self._getLineEditControls()
+class ScriptEditorStyler:
+    """Colors the command line by the most severe log level of each update.
 
-    def _getMayaControl(self, name):
-        maya_control = omui.MQtUtil.findControl(name)
-        return wrapInstance(int(maya_control), QWidget) if maya_control else None
+    Updates are coalesced into one deferred call; every widget gets a single
+    textChanged connection and its style sheet is only touched when it changes.
 
-    def _getLineEditControls(self):
-        for x in cmds.lsUI(type="commandLine"):
-            qt_commandLine = self._getMayaControl(x)
-            self._commandLine_list.append(qt_commandLine)
-            qt_lineEdit: list[QLineEdit] = qt_commandLine.findChildren(QLineEdit)
-            for lineEdit in qt_lineEdit:
-                if lineEdit.isEnabled():
-                    self._lineEdit_list.append(lineEdit)
-                    break
+    :param cmds: maya.cmds or a stub with lsUI.
+    :param utils: maya.utils or a stub with executeDeferred.
+    :param find_line_edits: callable(cmds) -> widgets, replaceable for testing.
+    """
 
-    def _reset(self, lineEdit):
-        lineEdit.setStyleSheet("")
-        lineEdit.textChanged.disconnect()
+    def __init__(self, cmds=cmds, utils=utils, find_line_edits=find_line_edits):
+        self.cmds = cmds
+        self.utils = utils
+        self.find_line_edits = find_line_edits
 
-    def update(self, level):
-        self._level = level
+        self._lock = threading.Lock()
+        self._job_scheduled = False
+        self._level = "INFO"
+        self._lineEdit_list = None
+        # id(widget) -> applied style sheet; doubles as the set of connected widgets
+        self._styles = {}
+
+    def _widgets(self):
+        # Discovered lazily: the script editor may not exist when the logger is imported
+        if not self._lineEdit_list:
+            self._lineEdit_list = self.find_line_edits(self.cmds)
+        return self._lineEdit_list
+
+    def _reset(self, lineEdit, *_):
+        # textChanged passes the new text, which is not needed here
+        if self._styles.get(id(lineEdit)):
+            lineEdit.setStyleSheet("")
+            self._styles[id(lineEdit)] = ""
 
-        if not self._job_scheduled:
+    def update(self, level):
+        # Log sinks may run on any thread; only the deferred call touches widgets
+        with self._lock:
+            if self._job_scheduled:
+                if LEVEL_PRIORITY.get(level, 0) >= LEVEL_PRIORITY.get(self._level, 0):
+                    self._level = level
+                return
+            self._level = level
             self._job_scheduled = True
-            utils.executeDeferred(self._update)
+        self.utils.executeDeferred(self._update)
 
     def _update(self):
-        for x in self._lineEdit_list:
-            x.setStyleSheet(style_sheet_dict.get(self._level, ""))
-            x.textChanged.connect(lambda: self._reset(x))
-        self._job_scheduled = False
-        self._level = "INFO"
+        with self._lock:
+            style_sheet = style_sheet_dict.get(self._level, "")
+            self._job_scheduled = False
+            self._level = "INFO"
+        alive = []
+        for x in self._widgets():
+            key = id(x)
+            try:
+                if key not in self._styles:
+                    x.textChanged.connect(partial(self._reset, x))
+                    self._styles[key] = ""
+                if self._styles[key] != style_sheet:
+                    x.setStyleSheet(style_sheet)
+                    self._styles[key] = style_sheet
+            except RuntimeError:
+                # The underlying C++ widget was deleted
+                self._styles.pop(key, None)
+                continue
+            alive.append(x)
+        self._lineEdit_list = alive
@@ -0,0 +1,26 @@
+import threading
+
+import pytest
+
+from z_stocks import session
+from z_stocks.fake_server import FakeServer, FaultInjector, SyntheticMarket
+from z_stocks.rate_limit import xueqiu_limiter
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """本地模拟雪球/推送服务，不注入延迟与故障；三个接口地址与本地联调一样指向同一个 host:port。"""
+    server = FakeServer(("127.0.0.1", 0), SyntheticMarket(watchlist_size=20), FaultInjector(0, 0, 0, 0, 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(session, "XUEQIU_URL", url)
+    monkeypatch.setattr(session, "XUEQIU_STOCK_URL", url)
+    monkeypatch.setattr(session, "PUSH_URL", url)
+    monkeypatch.setattr(session, "XUEQIU_PREFIXES", (f"{url}/",))
+    monkeypatch.setattr(xueqiu_limiter, "rate", 1000.0)
+    monkeypatch.setattr(xueqiu_limiter, "burst", 1000)
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
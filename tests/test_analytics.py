@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from z_stocks import analytics  # noqa: E402
+
+NOW = int(time.time() * 1000)
+LAST_YEAR = NOW - 365 * 24 * 3600 * 1000
+
+
+def entry(updated_at, *changes):
+    return {
+        "updated_at": updated_at,
+        "rebalancing_histories": [
+            {"stock_symbol": symbol, "prev_weight_adjusted": prev, "weight": weight} for symbol, prev, weight in changes
+        ],
+    }
+
+
+def test_today_moves_count_buys_and_sells():
+    matrix = analytics.HoldingsMatrix(cubes=1, symbols=1)
+    assert matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 0, 10), ("SZ000001", 20, 5))]) == {"buy": {}, "sell": {}}
+    signals = matrix.apply_rebalance("B", [entry(NOW, ("SH600000", 5, 15), ("SZ000001", 10, 0))])
+
+    assert signals == {"buy": {"SH600000": 2}, "sell": {"SZ000001": 2}}
+    assert matrix.coordinated_moves() == signals
+    assert matrix.coordinated_moves(min_cubes=3) == {"buy": {}, "sell": {}}
+
+
+def test_net_move_is_counted_once_per_cube():
+    matrix = analytics.HoldingsMatrix()
+    matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 0, 10))])
+    matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 10, 20))])
+    assert matrix.coordinated_moves(min_cubes=1) == {"buy": {"SH600000": 1}, "sell": {}}
+
+    # 同一天内加仓后又全部卖出，净调整归零，不再计入 buy
+    matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 20, 0))])
+    assert matrix.coordinated_moves(min_cubes=1) == {"buy": {}, "sell": {}}
+    matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 5, 0))])
+    assert matrix.coordinated_moves(min_cubes=1) == {"buy": {}, "sell": {"SH600000": 1}}
+
+
+def test_historical_entries_only_update_weights():
+    matrix = analytics.HoldingsMatrix()
+    history = [entry(LAST_YEAR, ("SH600000", 0, 30))]
+    assert matrix.apply_rebalance("A", history) == {"buy": {}, "sell": {}}
+    assert matrix.apply_rebalance("B", history) == {"buy": {}, "sell": {}}
+
+    assert matrix.coordinated_moves(min_cubes=1) == {"buy": {}, "sell": {}}
+    assert matrix.consensus() == [("SH600000", 30.0, 2)]
+
+
+def test_update_holdings_overwrites_row_and_consensus():
+    matrix = analytics.HoldingsMatrix(cubes=1, symbols=1)
+    matrix.update_holdings("A", {"SH600000": 40, "SZ000001": 60})
+    matrix.update_holdings("B", {"SH600000": 20})
+    matrix.update_holdings("A", {"SH600000": 80})
+
+    assert matrix.consensus() == [("SH600000", 50.0, 2)]
+    assert matrix.consensus(top=0) == []
+    assert matrix.weights.shape[0] >= 2 and matrix.weights.shape[1] >= 2
+
+
+def test_similarity_and_overlap():
+    matrix = analytics.HoldingsMatrix()
+    matrix.update_holdings("A", {"SH600000": 50, "SZ000001": 50})
+    matrix.update_holdings("B", {"SH600000": 50, "SZ000001": 50})
+    matrix.update_holdings("C", {"SH600519": 100})
+
+    similarity = matrix.similarity()
+    assert np.allclose(similarity, [[1, 1, 0], [1, 1, 0], [0, 0, 1]])
+    overlap = matrix.overlap(chunk=2)
+    assert np.allclose(overlap, [[100, 100, 0], [100, 100, 0], [0, 0, 100]])
+
+
+def test_day_roll_clears_moves():
+    matrix = analytics.HoldingsMatrix()
+    matrix.apply_rebalance("A", [entry(NOW, ("SH600000", 0, 10))])
+    matrix._day = matrix._day.replace(year=matrix._day.year - 1)
+    assert matrix.coordinated_moves(min_cubes=1) == {"buy": {}, "sell": {}}
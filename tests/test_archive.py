@@ -0,0 +1,104 @@
+import datetime
+
+import pytest
+
+from z_stocks import archive
+
+T0 = 1_700_000_000_000
+
+
+def entry(rb_id, ts, *changes):
+    return {
+        "id": rb_id,
+        "updated_at": ts,
+        "rebalancing_histories": [
+            {"stock_symbol": symbol, "stock_name": symbol, "prev_weight_adjusted": prev, "weight": weight, "price": price}
+            for symbol, prev, weight, price in changes
+        ],
+    }
+
+
+def current(rb_id, ts, cash, **holdings):
+    return {
+        "last_success_rb": {
+            "id": rb_id,
+            "updated_at": ts,
+            "cash": cash,
+            "holdings": [{"stock_symbol": symbol, "weight": weight} for symbol, weight in holdings.items()],
+        }
+    }
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = archive.Archive(tmp_path / "archive.db")
+    db.add_rebalances(
+        "ZH1",
+        [
+            entry(2, T0 + 2000, ("SH600000", 10, 30, 8.1)),
+            entry(1, T0, ("SH600000", 0, 10, 8.0), ("SZ000001", 0, 20, 12.0)),
+        ],
+    )
+    db.add_rebalances("ZH2", [entry(7, T0 + 1000, ("SH600000", 0, 50, 8.05))])
+    db.add_holdings("ZH1", current(1, T0, 70, SH600000=10, SZ000001=20))
+    db.add_holdings("ZH1", current(2, T0 + 2000, 50, SH600000=30, SZ000001=20))
+    yield db
+    db.close()
+
+
+def test_to_ms():
+    assert archive.to_ms(T0) == T0
+    assert archive.to_ms(T0 / 1000) == T0
+    assert archive.to_ms(str(T0 // 1000)) == T0
+    stamp = datetime.datetime.fromtimestamp(T0 / 1000, tz=datetime.timezone.utc)
+    assert archive.to_ms(stamp) == T0
+
+
+def test_weight_history(db):
+    assert db.weight_history("ZH1", "SH600000") == [(T0, 0, 10, 8.0), (T0 + 2000, 10, 30, 8.1)]
+    assert db.weight_history("ZH1", "SH600000", start=T0 + 1, end=T0 + 3000) == [(T0 + 2000, 10, 30, 8.1)]
+    # end 是开区间，start 接受秒级时间戳
+    assert db.weight_history("ZH1", "SH600000", start=T0 / 1000, end=T0 + 2000) == [(T0, 0, 10, 8.0)]
+    assert db.weight_history("ZH1", "SH600519") == []
+
+
+def test_holdings_history(db):
+    assert db.holdings_history("ZH1", "SH600000") == [(T0, 10), (T0 + 2000, 30)]
+    assert db.holdings_history("ZH1", archive.CASH) == [(T0, 70), (T0 + 2000, 50)]
+
+
+def test_changes_window(db):
+    assert [(ts, cube, symbol) for ts, cube, symbol, *_ in db.changes(T0 + 500)] == [
+        (T0 + 1000, "ZH2", "SH600000"),
+        (T0 + 2000, "ZH1", "SH600000"),
+    ]
+    assert [row[:3] for row in db.changes(T0, T0 + 2000, cube_id="ZH1")] == [(T0, "ZH1", "SH600000"), (T0, "ZH1", "SZ000001")]
+
+
+def test_snapshot(db):
+    assert db.snapshot("ZH1") == {"SH600000": 30, "SZ000001": 20, archive.CASH: 50}
+    assert db.snapshot("ZH1", at=T0 + 1999) == {"SH600000": 10, "SZ000001": 20, archive.CASH: 70}
+    assert db.snapshot("ZH1", at=T0 - 1) == {}
+    assert db.snapshot("ZH2") == {}
+
+
+def test_inserts_are_idempotent(db):
+    db.record("ZH1", [entry(1, T0, ("SH600000", 0, 99, 1.0))], current(2, T0 + 2000, 0, SH600000=99))
+    db.add_rebalances("ZH1", [])
+
+    assert db.weight_history("ZH1", "SH600000") == [(T0, 0, 10, 8.0), (T0 + 2000, 10, 30, 8.1)]
+    assert db.snapshot("ZH1")["SH600000"] == 30
+    assert len(db.changes(0)) == 4
+
+
+def test_reopen_keeps_rows(tmp_path):
+    path = tmp_path / "archive.db"
+    db = archive.Archive(path)
+    db.record("ZH1", [entry(1, T0, ("SH600000", 0, 10, 8.0))], None)
+    db.close()
+
+    db = archive.Archive(path)
+    try:
+        assert db.weight_history("ZH1", "SH600000") == [(T0, 0, 10, 8.0)]
+    finally:
+        db.close()
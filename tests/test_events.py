@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+
+import pytest
+
+from z_stocks import events
+from z_stocks.watchlist_diff import WatchEntry, diff_watchlist, index_watchlist, load_watchlist
+
+
+class Recorder(events.Subscriber):
+    """记录收到的事件；gate 未放行前卡在第一个事件上，模拟处理很慢的订阅者。"""
+
+    def __init__(self, name, types=None, buffer=events.SUBSCRIBER_BUFFER, gate=None):
+        super().__init__(name, types, buffer)
+        self.gate = gate
+        self.busy = threading.Event()
+        self.events = []
+
+    def handle(self, event):
+        self.busy.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.events.append(event)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = events.EventBus()
+    monkeypatch.setattr(events, "bus", bus)
+    return bus
+
+
+def test_publish_without_subscribers_is_a_no_op(bus):
+    assert not bus
+    assert bus.publish(events.REBALANCE, {}) is None
+
+
+def test_slow_subscriber_drops_and_counts(bus):
+    gate = threading.Event()
+    slow = bus.subscribe(Recorder("slow", buffer=2, gate=gate))
+    fast = bus.subscribe(Recorder("fast"))
+
+    bus.publish(events.HOLDINGS, {"n": 0})
+    assert slow.busy.wait(5)
+    for i in range(1, 10):
+        assert bus.publish(events.HOLDINGS, {"n": i}) is not None
+
+    # 一个在处理中，两个在缓冲区，其余丢弃；发布方从不阻塞
+    assert slow.dropped == 7 and slow.received == 3
+    assert bus.stats()["slow"]["dropped"] == 7
+    assert events.EVENTS_DROPPED._values[("slow",)] >= 7
+    gate.set()
+    wait_for(lambda: len(slow.events) == 3 and len(fast.events) == 10)
+    assert [e.data["n"] for e in slow.events] == [0, 1, 2]
+    assert fast.dropped == 0 and [e.data["n"] for e in fast.events] == list(range(10))
+
+
+def test_type_filter(bus):
+    watch = Recorder("watch", types=[events.WATCH_ADD, events.WATCH_REMOVE])
+    bus.subscribe(watch)
+    bus.publish(events.REBALANCE, {})
+    bus.publish(events.WATCH_ADD, {})
+    assert watch.received == 1
+
+
+def test_unsubscribe(bus):
+    subscriber = bus.subscribe(Recorder("a"))
+    bus.unsubscribe(subscriber)
+    assert not bus
+    assert bus.publish(events.REBALANCE, {}) is None
+    assert subscriber.received == 0
+
+
+def test_file_subscriber_writes_json_lines(tmp_path):
+    subscriber = events.FileSubscriber(tmp_path / "events.jsonl")
+    event = events.Event(events.WATCH_ADD, {"symbol": "SH600000", "name": "浦发银行"}, at=1.5)
+    subscriber.handle(event)
+    subscriber.handle(event)
+
+    lines = (tmp_path / "events.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {"id": event.id, "type": events.WATCH_ADD, "time": 1.5, "data": event.data}
+
+
+def test_publish_watchlist_splits_delta(bus):
+    recorder = Recorder("all")
+    recorder.start = lambda: None
+    bus.subscribe(recorder)
+
+    old = index_watchlist([{"symbol": "SH600000", "name": "浦发银行"}, {"symbol": "SZ000001", "name": "平安银行"}])
+    new = load_watchlist([{"symbol": "SH600000", "name": "浦发银行", "remark": "观察"}, {"symbol": "SH600519", "name": "贵州茅台"}])
+    delta, current = diff_watchlist(old, new)
+    events.publish_watchlist("user0", delta, current)
+
+    published = []
+    while not recorder._queue.empty():
+        published.append(recorder._queue.get_nowait())
+    by_type = {e.type: e.data for e in published}
+    assert len(published) == 3
+    assert by_type[events.WATCH_ADD]["symbol"] == "SH600519"
+    assert by_type[events.WATCH_REMOVE]["symbol"] == "SZ000001"
+    assert by_type[events.WATCH_MODIFY]["changes"] == {"remark": {"old": "", "new": "观察"}}
+    assert all(e["user"] == "user0" for e in by_type.values())
+    assert events.describe(published[0]) == "user0 add 贵州茅台 (SH600519)"
+
+
+def test_publish_helpers_skip_work_without_subscribers(bus):
+    delta, current = diff_watchlist({}, [WatchEntry("SH600000", "浦发银行")])
+    events.publish_watchlist("user0", delta, current)
+    events.publish_rebalances("cube", "ZH0000001", [{"id": 1, "updated_at": 0, "rebalancing_histories": [{}]}])
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from z_stocks import fast_json
+
+MISSING = object()
+
+CASES = [
+    # 正常情况：走只解码目标值的快速路径
+    ('{"data": {"count": 2, "stocks": [{"symbol": "SH600000"}]}, "error_code": 0}', ("data", "stocks")),
+    # 同名键只出现在兄弟子树里
+    ('{"other": {"stocks": [9]}, "data": {"count": 0}}', ("data", "stocks")),
+    ('{"data": {"count": 0}, "other": {"stocks": [9]}}', ("data", "stocks")),
+    # 同名键在更深一层
+    ('{"data": {"inner": {"stocks": [9]}}}', ("data", "stocks")),
+    # 同名键在数组里的对象中
+    ('{"data": [{"stocks": [9]}]}', ("data", "stocks")),
+    ('{"list": [{"data": {"stocks": [9]}}], "data": {}}', ("data", "stocks")),
+    # 同名的字符串值，以及字符串中的括号和引号
+    ('{"data": {"tag": "stocks"}}', ("data", "stocks")),
+    ('{"data": {"note": "}{[\\"stocks\\": 1", "stocks": [1]}}', ("data", "stocks")),
+    ('{"note": "{\\"data\\": {", "other": {"stocks": [9]}}', ("data", "stocks")),
+    # 顶层键
+    ('{"stocks": [1], "data": {}}', ("stocks",)),
+]
+
+
+def reference(text, path):
+    obj = json.loads(text)
+    for key in path:
+        try:
+            obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            return MISSING
+    return obj
+
+
+@pytest.fixture(autouse=True)
+def stdlib_backend(monkeypatch):
+    monkeypatch.setattr(fast_json, "orjson", None)
+
+
+@pytest.mark.parametrize("text, path", CASES)
+def test_extract_matches_full_decode(text, path):
+    assert fast_json.extract(text.encode("utf-8"), *path, default=MISSING) == reference(text, path)
+
+
+def test_missing_without_default_raises():
+    with pytest.raises(KeyError):
+        fast_json.extract(b'{"other": {"stocks": [9]}, "data": {}}', "data", "stocks")
+
+
+def test_unique_key_under_parents_skips_full_decode(monkeypatch):
+    def loads(data):
+        raise AssertionError("full decode")
+
+    monkeypatch.setattr(fast_json, "loads", loads)
+    text, path = CASES[0]
+    assert fast_json.extract(text.encode("utf-8"), *path) == [{"symbol": "SH600000"}]
@@ -0,0 +1,100 @@
+import pytest
+import requests
+
+from z_stocks import fast_json, fingerprint, get_stocks, rate_limit
+from z_stocks.rate_limit import xueqiu_limiter
+
+
+def make_response(body=b"{}", status=200, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update({k.replace("_", "-"): v for k, v in headers.items()})
+    return response
+
+
+@pytest.fixture
+def cache():
+    return fingerprint.FingerprintCache()
+
+
+def test_etag_becomes_if_none_match(cache):
+    assert not cache.unchanged("k", make_response(ETag='"abc"'))
+    assert cache.request_headers("k") == {}
+    cache.commit("k")
+    assert cache.request_headers("k") == {"If-None-Match": '"abc"'}
+
+
+def test_last_modified_becomes_if_modified_since(cache):
+    stamp = "Sat, 17 Oct 2026 08:00:00 GMT"
+    cache.unchanged("k", make_response(Last_Modified=stamp))
+    cache.commit("k")
+    assert cache.request_headers("k") == {"If-Modified-Since": stamp}
+
+
+def test_conditional_requests_can_be_disabled(cache, monkeypatch):
+    cache.unchanged("k", make_response(ETag='"abc"'))
+    cache.commit("k")
+    monkeypatch.setattr(fingerprint, "CONDITIONAL_REQUESTS", False)
+    assert cache.request_headers("k") == {}
+
+
+def test_not_modified_counts_as_unchanged(cache):
+    assert cache.unchanged("k", make_response(b"", status=304))
+    assert cache.stats()["not_modified"] == 1
+
+
+def test_body_hash_needs_commit_before_hit(cache):
+    assert not cache.unchanged("k", make_response(b'{"a": 1}'))
+    # apply 失败没有 commit，同样的响应下一轮仍要完整处理
+    assert not cache.unchanged("k", make_response(b'{"a": 1}'))
+    cache.commit("k")
+    assert cache.unchanged("k", make_response(b'{"a": 1}'))
+    assert not cache.unchanged("k", make_response(b'{"a": 2}'))
+    # body hash 没有对应的条件请求头
+    assert cache.request_headers("k") == {}
+    assert cache.stats() == {"hits": 1, "misses": 3, "not_modified": 0, "hit_rate": 0.25}
+
+
+def test_forget_drops_committed_fingerprint(cache):
+    cache.unchanged("k", make_response(b"x"))
+    cache.commit("k")
+    cache.forget("k")
+    assert not cache.unchanged("k", make_response(b"x"))
+
+
+def test_watchlist_is_skipped_until_it_changes(fake_server, monkeypatch):
+    monkeypatch.setattr(get_stocks, "fingerprints", fingerprint.FingerprintCache())
+    url = get_stocks.get_url("4000000001")
+
+    first = get_stocks.get_stocks_from_url(url)
+    assert len(first) == 20
+    get_stocks.fingerprints.commit(url)
+    assert get_stocks.get_stocks_from_url(url) is None
+
+    fake_server.market.churn("4000000001")
+    assert get_stocks.get_stocks_from_url(url) is not None
+
+
+def test_not_modified_is_not_throttling():
+    assert rate_limit.throttle_reason(make_response(b"", status=304)) is None
+    assert rate_limit.throttle_reason(make_response(b"<html>", **{"Content-Type": "text/html"})) == "反爬页面"
+
+
+def test_not_modified_neither_throttles_nor_decodes(fake_server, monkeypatch):
+    monkeypatch.setattr(get_stocks, "fingerprints", fingerprint.FingerprintCache())
+    throttled = []
+    monkeypatch.setattr(xueqiu_limiter, "on_throttled", throttled.append)
+    decoded = []
+    extract = fast_json.extract
+    monkeypatch.setattr(fast_json, "extract", lambda *args: decoded.append(args) or extract(*args))
+    url = get_stocks.get_url("4000000002")
+
+    assert get_stocks.get_stocks_from_url(url)
+    get_stocks.fingerprints.commit(url)
+    assert get_stocks.get_stocks_from_url(url) is None
+
+    assert fake_server.stats["not_modified"] == 1
+    assert get_stocks.fingerprints.stats()["not_modified"] == 1
+    assert len(decoded) == 1
+    assert throttled == []
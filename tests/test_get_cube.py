@@ -0,0 +1,83 @@
+import pytest
+
+from z_stocks import fast_json, fingerprint, get_cube
+
+
+@pytest.fixture
+def market(fake_server, monkeypatch):
+    monkeypatch.setattr(get_cube, "fingerprints", fingerprint.FingerprintCache())
+    monkeypatch.setattr(get_cube, "INCREMENTAL_HISTORY", True)
+    monkeypatch.setattr(get_cube, "HISTORY_PAGE_SIZE", 10)
+    monkeypatch.setattr(get_cube, "HISTORY_MAX_PAGES", 5)
+    return fake_server.market
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    decoded = []
+    response_json = fast_json.response_json
+    monkeypatch.setattr(fast_json, "response_json", lambda response: decoded.append(response.url) or response_json(response))
+    return decoded
+
+
+def make_cube(market, cube_id, count):
+    """创建组合并追加调仓，最新调仓单 id 为 count。"""
+    market.add_cube(cube_id)
+    for _ in range(count - 1):
+        market.rebalance(cube_id)
+
+
+def requests(server):
+    return server.stats["requests"]
+
+
+def test_stops_paging_at_laster_id(fake_server, market):
+    make_cube(market, "ZH0100001", 26)
+    before = requests(fake_server)
+    entries = get_cube.fetch_history("ZH0100001", laster_id=20)
+
+    assert [x["id"] for x in entries] == [26, 25, 24, 23, 22, 21]
+    assert requests(fake_server) - before == 1
+
+
+def test_follows_pages_until_laster_id(fake_server, market):
+    make_cube(market, "ZH0100002", 26)
+    before = requests(fake_server)
+    entries = get_cube.fetch_history("ZH0100002", laster_id=3)
+
+    assert [x["id"] for x in entries] == list(range(26, 3, -1))
+    assert requests(fake_server) - before == 3
+
+
+def test_paging_is_capped_at_max_pages(fake_server, market, monkeypatch):
+    monkeypatch.setattr(get_cube, "HISTORY_PAGE_SIZE", 5)
+    monkeypatch.setattr(get_cube, "HISTORY_MAX_PAGES", 2)
+    make_cube(market, "ZH0100003", 30)
+    before = requests(fake_server)
+    entries = get_cube.fetch_history("ZH0100003", laster_id=1)
+
+    assert [x["id"] for x in entries] == list(range(30, 20, -1))
+    assert requests(fake_server) - before == 2
+
+
+def test_no_new_entries_skips_decoding(market, decoded):
+    make_cube(market, "ZH0100004", 12)
+    assert get_cube.fetch_history("ZH0100004", laster_id=12) == []
+    assert decoded == []
+
+
+def test_new_cube_fetches_full_history_in_one_request(fake_server, market, monkeypatch, decoded):
+    monkeypatch.setattr(get_cube, "HISTORY_MAX_PAGES", 1)
+    make_cube(market, "ZH0100005", 30)
+    before = requests(fake_server)
+    entries = get_cube.fetch_history("ZH0100005")
+
+    assert [x["id"] for x in entries] == list(range(30, 0, -1))
+    assert requests(fake_server) - before == 1
+    assert "count=" not in decoded[0]
+
+
+def test_non_incremental_filters_by_laster_id(market, monkeypatch):
+    monkeypatch.setattr(get_cube, "INCREMENTAL_HISTORY", False)
+    make_cube(market, "ZH0100006", 15)
+    assert [x["id"] for x in get_cube.fetch_history("ZH0100006", laster_id=12)] == [15, 14, 13]
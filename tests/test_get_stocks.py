@@ -0,0 +1,38 @@
+import pytest
+
+from z_stocks import get_stocks
+from z_stocks.watchlist_diff import index_watchlist
+
+STOCKS = [{"symbol": "SH600000", "name": "浦发银行", "marketplace": "CN", "watched": 1}]
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+    saved = []
+    monkeypatch.setattr(get_stocks.push_queue, "submit", lambda *args, **kwargs: submitted.append(args))
+    monkeypatch.setattr(get_stocks, "save_user", lambda name, user_data: saved.append(name))
+    monkeypatch.setattr(get_stocks, "TREND_SIGNALS", False)
+    return submitted
+
+
+def user():
+    return {"uuid": "4000000003", "stocks": index_watchlist(STOCKS)}
+
+
+def test_modified_only_is_saved_but_not_pushed(submitted):
+    data = user()
+    assert get_stocks.push_user("user0", data, [{**STOCKS[0], "watched": 2}])
+    assert submitted == []
+    assert data["stocks"]["SH600000"].watched == 2
+
+
+def test_modified_only_is_pushed_when_enabled(submitted, monkeypatch):
+    monkeypatch.setattr(get_stocks, "PUSH_MODIFIED", True)
+    assert get_stocks.push_user("user0", user(), [{**STOCKS[0], "remark": "观察"}])
+    assert len(submitted) == 1
+
+
+def test_added_stock_is_pushed(submitted):
+    assert get_stocks.push_user("user0", user(), STOCKS + [{"symbol": "SH600519", "name": "贵州茅台", "marketplace": "CN"}])
+    assert len(submitted) == 1
@@ -0,0 +1,83 @@
+import json
+
+from z_stocks import fingerprint, get_cube, latency
+
+T0 = 1_700_000_000.0
+
+
+def rb(rb_id, updated_at):
+    return {"id": rb_id, "updated_at": int(updated_at * 1000)}
+
+
+def breaches():
+    return latency.SLA_BREACHES._values.get((), 0)
+
+
+def make_tracker(tmp_path, **kwargs):
+    return latency.LatencyTracker(tmp_path / "latency.jsonl", sla=60, window=100, stale_after=600, **kwargs)
+
+
+def deliver(tracker, cube_id, rb_ids, enqueued, delivered):
+    detections = tracker.enqueued(cube_id, rb_ids, at=enqueued)
+    tracker.on_sent(detections)(delivered)
+    return detections
+
+
+def test_stages_are_timestamped(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.seen("ZH1", [rb(1, T0)], at=T0 + 3)
+    tracker.seen("ZH1", [rb(1, T0)], at=T0 + 9)
+    (d,) = deliver(tracker, "ZH1", [1], enqueued=T0 + 4, delivered=T0 + 10)
+
+    assert (d.seen, d.enqueued, d.delivered, d.total) == (T0 + 3, T0 + 4, T0 + 10, 10)
+    assert tracker.percentiles("ZH1") == {0.5: 10, 0.9: 10, 0.99: 10}
+    (line,) = (tmp_path / "latency.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(line)["detect"] == 3
+
+
+def test_stale_entries_are_not_tracked(tmp_path):
+    tracker = make_tracker(tmp_path)
+    # 补抓到的一小时前的调仓不算检测延迟
+    tracker.seen("ZH1", [rb(1, T0 - 3600), rb(2, T0 - 30)], at=T0)
+
+    assert deliver(tracker, "ZH1", [1], enqueued=T0 + 1, delivered=T0 + 2) == []
+    assert [d.rb_id for d in deliver(tracker, "ZH1", [2], enqueued=T0 + 1, delivered=T0 + 2)] == [2]
+    assert tracker.percentiles() == {0.5: 32, 0.9: 32, 0.99: 32}
+
+
+def test_stale_filter_can_be_disabled(tmp_path):
+    tracker = latency.LatencyTracker(None, sla=0, stale_after=0)
+    tracker.seen("ZH1", [rb(1, T0 - 3600)], at=T0)
+    assert len(tracker.enqueued("ZH1", [1], at=T0)) == 1
+
+
+def test_sla_breaches_are_counted(tmp_path):
+    tracker = make_tracker(tmp_path)
+    before = breaches()
+    tracker.seen("ZH1", [rb(1, T0), rb(2, T0)], at=T0 + 5)
+    deliver(tracker, "ZH1", [1], enqueued=T0 + 6, delivered=T0 + 59)
+    assert breaches() == before
+
+    deliver(tracker, "ZH1", [2], enqueued=T0 + 6, delivered=T0 + 61)
+    assert breaches() == before + 1
+
+
+def test_discarded_entries_are_not_delivered(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.seen("ZH1", [rb(1, T0)], at=T0)
+    tracker.discard("ZH1", [1])
+    assert tracker.enqueued("ZH1", [1], at=T0) == []
+    assert tracker.summary() == {"*": {0.5: None, 0.9: None, 0.99: None}}
+
+
+def test_first_poll_of_a_cube_is_not_tracked(fake_server, monkeypatch):
+    tracker = latency.LatencyTracker(None)
+    monkeypatch.setattr(latency, "tracker", tracker)
+    monkeypatch.setattr(get_cube, "fingerprints", fingerprint.FingerprintCache())
+    fake_server.market.add_cube("ZH0200001")
+    fake_server.market.rebalance("ZH0200001")
+
+    get_cube.fetch_cube({"cube_id": "ZH0200001"})
+    assert tracker._pending == {}
+    get_cube.fetch_cube({"cube_id": "ZH0200001", "laster_id": 1})
+    assert list(tracker._pending) == [("ZH0200001", 2)]
@@ -0,0 +1,165 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class StubUtils:
+    """maya.utils 的替身，executeDeferred 只记录回调，由测试手动执行。"""
+
+    def __init__(self):
+        self.deferred = []
+
+    def executeDeferred(self, fn, *args):
+        self.deferred.append((fn, args))
+
+    def run(self):
+        deferred, self.deferred = self.deferred, []
+        for fn, args in deferred:
+            fn(*args)
+
+
+class StubCmds:
+    def __init__(self):
+        self.messages = []
+
+    def about(self, batch=False):
+        return True
+
+    def inViewMessage(self, **kwargs):
+        self.messages.append(kwargs)
+
+    def lsUI(self, type=None):
+        return []
+
+
+class Signal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class LineEdit:
+    def __init__(self):
+        self.textChanged = Signal()
+        self.style_sheets = []
+        self.deleted = False
+
+    def setStyleSheet(self, style_sheet):
+        if self.deleted:
+            raise RuntimeError("Internal C++ object already deleted.")
+        self.style_sheets.append(style_sheet)
+
+
+@pytest.fixture
+def maya(monkeypatch):
+    module = types.ModuleType("maya")
+    module.cmds = StubCmds()
+    module.utils = StubUtils()
+    monkeypatch.setitem(sys.modules, "maya", module)
+    monkeypatch.setitem(sys.modules, "maya.cmds", module.cmds)
+    monkeypatch.setitem(sys.modules, "maya.utils", module.utils)
+    for name in ("log.logInViewMessage", "log.mayaScriptLineColor"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return module
+
+
+@pytest.fixture
+def inview(maya):
+    return importlib.import_module("log.logInViewMessage")
+
+
+@pytest.fixture
+def line_color(maya):
+    return importlib.import_module("log.mayaScriptLineColor")
+
+
+def test_burst_is_one_deferred_flush(maya, inview):
+    handler = inview.MessageHandler(maya.cmds, maya.utils, max_pending=3, flush_interval=0)
+    for i in range(50):
+        handler.show(f"message {i}", level="INFO")
+
+    assert len(maya.utils.deferred) == 1
+    maya.utils.run()
+    assert [m["amg"] for m in maya.cmds.messages[1:]] == ["message 47", "message 48", "message 49"]
+
+    # flush 之后的新消息重新调度
+    handler.show("again", level="INFO")
+    assert len(maya.utils.deferred) == 1
+
+
+def test_overflow_summary_uses_most_severe_color(maya, inview):
+    handler = inview.MessageHandler(maya.cmds, maya.utils, max_pending=3, flush_interval=0)
+    for i in range(5):
+        handler.show(f"warning {i}", level="WARNING")
+    for i in range(5):
+        handler.show(f"error {i}", level="ERROR")
+    maya.utils.run()
+
+    summary = maya.cmds.messages[0]["amg"]
+    assert summary == f'<font color="{inview.LEVEL_COLORS["ERROR"]}">+5 more warning messages, +2 more error messages</font>'
+    assert len(maya.cmds.messages) == 4
+
+
+def test_single_overflow_is_singular(maya, inview):
+    handler = inview.MessageHandler(maya.cmds, maya.utils, max_pending=1, flush_interval=0)
+    handler.show("a", level="ERROR")
+    handler.show("b", level="ERROR")
+    maya.utils.run()
+    assert "+1 more error message<" in maya.cmds.messages[0]["amg"]
+
+
+def test_muted_handler_schedules_nothing(maya, inview):
+    handler = inview.MessageHandler(maya.cmds, maya.utils, flush_interval=0)
+    handler.mute(True)
+    handler.show("hidden")
+    assert maya.utils.deferred == []
+
+
+def test_styler_coalesces_to_most_severe_level(maya, line_color):
+    widget = LineEdit()
+    styler = line_color.ScriptEditorStyler(maya.cmds, maya.utils, lambda cmds: [widget])
+    for level in ("WARNING", "ERROR", "INFO", "SUCCESS"):
+        styler.update(level)
+
+    assert len(maya.utils.deferred) == 1
+    maya.utils.run()
+    assert widget.style_sheets == [line_color.error_style_sheet]
+
+
+def test_styler_connects_each_widget_once(maya, line_color):
+    widget = LineEdit()
+    styler = line_color.ScriptEditorStyler(maya.cmds, maya.utils, lambda cmds: [widget])
+    for _ in range(5):
+        styler.update("ERROR")
+        maya.utils.run()
+
+    assert len(widget.textChanged.slots) == 1
+    # 样式没有变化时不重复设置
+    assert widget.style_sheets == [line_color.error_style_sheet]
+
+    widget.textChanged.emit("ls")
+    assert widget.style_sheets[-1] == ""
+    styler.update("ERROR")
+    maya.utils.run()
+    assert widget.style_sheets[-1] == line_color.error_style_sheet
+    assert len(widget.textChanged.slots) == 1
+
+
+def test_styler_drops_deleted_widgets(maya, line_color):
+    alive, deleted = LineEdit(), LineEdit()
+    deleted.deleted = True
+    found = [[alive, deleted], [alive]]
+    styler = line_color.ScriptEditorStyler(maya.cmds, maya.utils, lambda cmds: found.pop(0))
+    styler.update("WARNING")
+    maya.utils.run()
+
+    assert styler._lineEdit_list == [alive]
+    assert alive.style_sheets == [line_color.warning_style_sheet]
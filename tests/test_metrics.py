@@ -0,0 +1,53 @@
+import io
+import urllib.request
+
+from z_stocks import metrics, shard
+
+SHARD_TEXT = """\
+# HELP z_stocks_fetch_total 请求数
+# TYPE z_stocks_fetch_total counter
+z_stocks_fetch_total{sender="CUBE"} 3
+z_stocks_fetch_total{sender="STOCKS"} 1
+# HELP z_stocks_backlog 待处理目标数
+# TYPE z_stocks_backlog gauge
+z_stocks_backlog 2
+# HELP z_stocks_fetch_seconds 请求耗时
+# TYPE z_stocks_fetch_seconds histogram
+z_stocks_fetch_seconds_bucket{le="0.5"} 1
+z_stocks_fetch_seconds_bucket{le="+Inf"} 4
+z_stocks_fetch_seconds_sum 1.5
+z_stocks_fetch_seconds_count 4
+"""
+
+
+def test_merge_labels_samples_and_groups_families():
+    text = metrics.merge({0: SHARD_TEXT, 1: SHARD_TEXT.replace(" 3\n", " 5\n")})
+    lines = text.splitlines()
+
+    assert lines.count("# TYPE z_stocks_fetch_total counter") == 1
+    assert 'z_stocks_fetch_total{shard="0",sender="CUBE"} 3' in lines
+    assert 'z_stocks_fetch_total{shard="1",sender="CUBE"} 5' in lines
+    assert 'z_stocks_backlog{shard="1"} 2' in lines
+    assert 'z_stocks_fetch_seconds_bucket{shard="0",le="+Inf"} 4' in lines
+    assert 'z_stocks_fetch_seconds_sum{shard="1"} 1.5' in lines
+
+    # 同一组的样本紧跟在它的 HELP / TYPE 后面
+    start = lines.index("# TYPE z_stocks_fetch_seconds histogram")
+    assert all(line.startswith("z_stocks_fetch_seconds") for line in lines[start + 1 :])
+    assert len(lines[start + 1 :]) == 8
+
+
+def test_supervisor_scrapes_shards_and_reports_up(monkeypatch):
+    def urlopen(url, timeout=None):
+        if url.endswith(":9101/metrics"):
+            return io.BytesIO(SHARD_TEXT.encode("utf-8"))
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    text = shard.Supervisor(2, metrics_port=9100).render_metrics()
+    lines = text.splitlines()
+
+    assert 'z_stocks_fetch_total{shard="0",sender="CUBE"} 3' in lines
+    assert not any('shard="1"' in line for line in lines if not line.startswith("z_stocks_shard_up"))
+    assert 'z_stocks_shard_up{shard="0"} 1' in lines
+    assert 'z_stocks_shard_up{shard="1"} 0' in lines
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from z_stocks import push_queue as pq
+
+
+class FlakySend:
+    """前 failures 次返回 False，之后成功，记录每次调用。"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.done = threading.Event()
+
+    def __call__(self, title, message, sender=None):
+        self.calls.append((title, message, sender))
+        if len(self.calls) <= self.failures:
+            return False
+        self.done.set()
+        return True
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(pq, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(pq, "MAX_ATTEMPTS", 3)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def test_retries_until_sent_and_calls_on_sent():
+    send = FlakySend(failures=2)
+    queue = pq.PushQueue(send=send)
+    delivered = []
+
+    assert queue.submit("t", "m", sender="CUBE", on_sent=delivered.append)
+    assert send.done.wait(5)
+    wait_for(lambda: delivered)
+
+    assert len(send.calls) == 3
+    assert queue.sent == 1 and queue.failed == 0
+    assert delivered[0] <= time.time()
+
+
+def test_gives_up_after_max_attempts():
+    send = FlakySend(failures=10)
+    queue = pq.PushQueue(send=send)
+    queue.submit("t", "m")
+    wait_for(lambda: queue.failed == 1)
+
+    assert len(send.calls) == pq.MAX_ATTEMPTS
+    assert queue.sent == 0
+
+
+def test_send_exception_counts_as_failure():
+    calls = []
+
+    def send(title, message, sender=None):
+        calls.append(title)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return True
+
+    queue = pq.PushQueue(send=send)
+    queue.submit("t", "m")
+    wait_for(lambda: queue.sent == 1)
+    assert len(calls) == 2
+
+
+def test_dedup_key_is_delivered_once():
+    send = FlakySend()
+    queue = pq.PushQueue(send=send)
+
+    assert queue.submit("t", "m", key="cube/1/2/0")
+    assert not queue.submit("t", "m", key="cube/1/2/0")
+    assert queue.submit("t", "m", key="cube/1/3/0")
+    wait_for(lambda: queue.sent == 2)
+    time.sleep(0.05)
+    assert len(send.calls) == 2
+
+
+def test_full_queue_drops_instead_of_blocking():
+    gate = threading.Event()
+
+    def send(title, message, sender=None):
+        gate.wait(5)
+        return True
+
+    queue = pq.PushQueue(send=send, maxsize=1)
+    results = [queue.submit(f"t{i}", "m") for i in range(20)]
+    gate.set()
+
+    assert not all(results)
+    assert queue.dropped == results.count(False)
+
+
+def test_coalesces_within_window():
+    send = FlakySend()
+    queue = pq.PushQueue(send=send, coalesce_window=0.1)
+    delivered = []
+    queue.submit("first", "a", coalesce_key="stocks/1/0", on_sent=delivered.append)
+    queue.submit("second", "b", coalesce_key="stocks/1/0", on_sent=delivered.append)
+    wait_for(lambda: len(delivered) == 2)
+
+    assert send.calls == [("second", "a\n\nb", None)]
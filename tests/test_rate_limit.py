@@ -0,0 +1,98 @@
+import types
+
+import pytest
+
+from z_stocks import rate_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def trip(breaker):
+    return [breaker.record_failure() for _ in range(breaker.threshold)]
+
+
+def test_opens_after_threshold_and_reports_once(clock):
+    breaker = rate_limit.CircuitBreaker(threshold=3, cooldown=60, max_cooldown=1000)
+    assert trip(breaker) == [False, False, True]
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == pytest.approx(60)
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = rate_limit.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.now += 60
+
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    # 探测在途时其他调用方等待
+    assert not breaker.allow()
+    assert breaker.retry_in() == pytest.approx(rate_limit.BREAKER_PROBE_WAIT)
+
+
+def test_failed_probe_doubles_cooldown_without_new_report(clock):
+    breaker = rate_limit.CircuitBreaker(threshold=1, cooldown=60, max_cooldown=200)
+    assert breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()
+
+    assert not breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.cooldown == 120
+    assert breaker.retry_in() == pytest.approx(120)
+
+    clock.now += 120
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert breaker.cooldown == 200
+
+
+def test_probe_wait_expiry_readmits_a_probe(clock):
+    breaker = rate_limit.CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.now += 60
+    assert breaker.allow()
+
+    clock.now += rate_limit.BREAKER_PROBE_WAIT - 1
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_success_closes_and_rearms_report(clock):
+    breaker = rate_limit.CircuitBreaker(threshold=2, cooldown=60)
+    assert trip(breaker) == [False, True]
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record_success()
+
+    assert breaker.state == breaker.CLOSED and breaker.cooldown == 60
+    assert breaker.allow() and breaker.allow()
+    # 再次从闭合断开时重新发送一次报告
+    assert trip(breaker) == [False, True]
+
+
+def test_limiter_backs_off_and_recovers(clock):
+    limiter = rate_limit.AdaptiveLimiter(rate=2.0, burst=5)
+    limiter.on_throttled("HTTP 429")
+    assert limiter.rate == 1.0 and limiter._tokens == 0
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(1.0 + rate_limit.RECOVER_STEP)
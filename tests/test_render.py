@@ -0,0 +1,66 @@
+import pytest
+
+from z_stocks import render
+
+
+@pytest.mark.parametrize(
+    "text, width",
+    [
+        ("SH600000", 8),
+        ("贵州茅台", 8),
+        ("，。、：；！？", 14),
+        ("（港股通）", 10),
+        ("【ＡＢＣ】", 10),
+        ("腾讯控股-W", 10),
+        ("", 0),
+    ],
+)
+def test_display_width(text, width):
+    assert render.display_width(text) == width
+
+
+def test_ljust_aligns_by_display_width():
+    assert render.display_width(render.ljust("平安银行（深）", 20)) == 20
+    assert render.ljust("a" * 30, 20) == "a" * 30
+
+
+def lines(n):
+    return "".join(f"{render.INDENT}股票{i:03d} SH{600000 + i}\n" for i in range(n))
+
+
+def test_short_message_is_one_page():
+    assert render.paginate("标题", "abc", limit=10) == [("标题", "abc")]
+    assert render.paginate("标题", lines(100), limit=0) == [("标题", lines(100))]
+
+
+def test_split_pages_by_line_under_limit():
+    message = lines(40)
+    pages = render.paginate("标题", message, limit=200, overflow="split")
+
+    assert len(pages) > 1
+    assert [title for title, _ in pages] == [f"标题 ({i}/{len(pages)})" for i in range(1, len(pages) + 1)]
+    assert all(len(page) <= 200 for _, page in pages)
+    assert all(page.endswith("\n") for _, page in pages)
+    assert "".join(page for _, page in pages) == message
+
+
+def test_split_cuts_overlong_lines():
+    message = "x" * 25 + "\nshort\n"
+    assert render.split(message, 10) == ["x" * 10, "x" * 10, "x" * 5 + "\n", "short\n"]
+
+
+def test_cap_truncates_and_counts_omitted_lines():
+    message = lines(40)
+    ((title, page),) = render.paginate("标题", message, limit=200, overflow="cap")
+
+    assert title == "标题"
+    assert len(page) <= 200
+    kept = page.count("SH6")
+    assert page.endswith(f"…… 省略 {40 - kept} 行\n")
+    assert message.startswith(page[: page.rindex("\n\n")])
+
+
+def test_paginate_uses_module_defaults(monkeypatch):
+    monkeypatch.setattr(render, "MESSAGE_LIMIT", 200)
+    monkeypatch.setattr(render, "MESSAGE_OVERFLOW", "cap")
+    assert len(render.paginate("标题", lines(40))) == 1
@@ -0,0 +1,44 @@
+import pytest
+import requests
+
+from z_stocks import get_cube, get_stocks, replay, session
+
+
+def fetch_all():
+    return (
+        get_cube.fetch_history("ZH0000001", 0),
+        get_cube.fetch_current("ZH0000001"),
+        get_stocks.get_stocks_from_url(get_stocks.get_url("1000000001")),
+    )
+
+
+def test_recorded_responses_replay_offline(fake_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(session, "recorder", replay.Recorder(tmp_path, tag="shard0"))
+    recorded = fetch_all()
+    monkeypatch.setattr(session, "recorder", None)
+    fake_server.shutdown()
+    fake_server.server_close()
+
+    assert sorted(p.name for p in tmp_path.rglob("*.jsonl.gz")) == [
+        "current.shard0.jsonl.gz",
+        "history.shard0.jsonl.gz",
+        "watchlist.shard0.jsonl.gz",
+    ]
+    # 回放挂在新的会话上，测试结束后不影响共享会话
+    monkeypatch.setattr(session, "xueqiu_session", session._build_session({}, {}))
+    replay.enable_replay(tmp_path)
+    assert fetch_all() == recorded
+
+
+def test_unrecorded_url_is_404(tmp_path, monkeypatch):
+    monkeypatch.setattr(session, "xueqiu_session", session._build_session({}, {}))
+    replay.enable_replay(tmp_path)
+    with pytest.raises(requests.HTTPError):
+        get_cube.fetch_current("ZH_NOT_RECORDED")
+
+
+def test_replay_steps_through_records_in_order():
+    records = [{"time": t, "url": "https://xueqiu.com/a?x=1", "status": 200, "headers": {}, "body": str(t)} for t in (1, 2)]
+    adapter = replay.ReplayAdapter({replay.normalize_url(records[0]["url"]): records})
+    key = replay.normalize_url("https://stock.xueqiu.com/a?x=1")
+    assert [adapter._pick(key)["body"] for _ in range(3)] == ["1", "2", "2"]
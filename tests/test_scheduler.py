@@ -0,0 +1,108 @@
+import datetime
+import types
+
+import pytest
+
+from z_stocks import scheduler
+
+
+def at(day, hour, minute=0, second=0):
+    """2024-01-01 是周一；返回 UTC+8 下 1 月 day 日 hour:minute 的时间戳。"""
+    return datetime.datetime(2024, 1, day, hour, minute, second, tzinfo=scheduler.MARKET_TZ).timestamp()
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(scheduler, "JITTER", 0)
+    monkeypatch.setattr(scheduler, "random", types.SimpleNamespace(uniform=lambda a, b: a))
+
+
+@pytest.mark.parametrize(
+    "ts, phase",
+    [
+        (at(1, 8, 59), scheduler.OFF_HOURS),
+        (at(1, 9, 0), scheduler.PRE_OPEN),
+        (at(1, 9, 29, 59), scheduler.PRE_OPEN),
+        (at(1, 9, 30), scheduler.TRADING),
+        (at(1, 12, 0), scheduler.OFF_HOURS),
+        (at(1, 13, 0), scheduler.TRADING),
+        (at(1, 15, 59), scheduler.TRADING),
+        (at(1, 16, 0), scheduler.OFF_HOURS),
+        (at(5, 10, 0), scheduler.TRADING),
+        (at(6, 10, 0), scheduler.WEEKEND),
+        (at(7, 23, 59), scheduler.WEEKEND),
+    ],
+)
+def test_market_phase(ts, phase):
+    assert scheduler.market_phase(ts) == phase
+
+
+def test_market_phase_ignores_local_timezone():
+    # 周一 01:30 UTC 即 09:30 UTC+8
+    ts = datetime.datetime(2024, 1, 1, 1, 30, tzinfo=datetime.timezone.utc).timestamp()
+    assert scheduler.market_phase(ts) == scheduler.TRADING
+
+
+@pytest.mark.parametrize(
+    "ts, boundary",
+    [
+        (at(1, 0, 0), at(1, 9, 0)),
+        (at(1, 9, 0), at(1, 9, 30)),
+        (at(1, 9, 15), at(1, 9, 30)),
+        (at(1, 11, 0), at(1, 12, 0)),
+        (at(1, 12, 30), at(1, 13, 0)),
+        (at(1, 15, 0), at(1, 16, 0)),
+        (at(1, 20, 0), at(2, 0, 0)),
+    ],
+)
+def test_next_boundary(ts, boundary):
+    assert scheduler.next_boundary(ts) == boundary
+
+
+def test_interval_uses_phase_and_idle_factor():
+    s = scheduler.Scheduler()
+    s.add("a")
+    assert s.interval("a", at(1, 10, 0)) == scheduler.BASE_INTERVALS[scheduler.TRADING] * scheduler.MAX_FACTOR
+    assert s.interval("a", at(6, 10, 0)) == scheduler.BASE_INTERVALS[scheduler.WEEKEND] * scheduler.MAX_FACTOR
+
+
+def test_interval_is_capped_at_phase_boundary():
+    s = scheduler.Scheduler()
+    s.add("a")
+    # 收盘后的 60s × 4 被截断到 9:00 开盘前的剩余时间
+    assert s.interval("a", at(1, 8, 59)) == 60
+    assert s.interval("a", at(1, 8, 59, 30)) == 30
+    # 周日晚上截断到午夜
+    assert s.interval("a", at(7, 23, 58)) == 120
+
+
+def test_activity_decays_by_half_life():
+    s = scheduler.Scheduler()
+    s.add("a")
+    now = at(1, 10, 0)
+    s.done("a", changed=True, now=now)
+    s.done("a", changed=True, now=now)
+
+    assert s.activity("a", now) == 2.0
+    assert s.activity("a", now + scheduler.ACTIVITY_HALF_LIFE) == pytest.approx(1.0)
+    assert s.activity("a", now + 2 * scheduler.ACTIVITY_HALF_LIFE) == pytest.approx(0.5)
+    # 活跃目标间隔缩短到 MAX_FACTOR / (1 + 2)，但不低于基础间隔
+    assert s.interval("a", now) == pytest.approx(scheduler.BASE_INTERVALS[scheduler.TRADING] * scheduler.MAX_FACTOR / 3)
+    s.done("a", changed=True, now=now)
+    s.done("a", changed=True, now=now)
+    assert s.interval("a", now) == scheduler.BASE_INTERVALS[scheduler.TRADING]
+
+
+def test_done_requeues_by_interval():
+    s = scheduler.Scheduler()
+    now = at(1, 10, 0)
+    s.add("a", due=now)
+    s.add("b", scale=2.0, due=now)
+    assert s.pop_due(now) == ["a", "b"]
+
+    s.done("a", changed=False, now=now)
+    s.done("b", changed=False, now=now)
+    assert s.wait_time(now) == 8
+    assert s.pop_due(now + 8) == ["a"]
+    assert s.pop_due(now + 16) == ["b"]
+    assert s.wait_time(now) is None
@@ -0,0 +1,26 @@
+from z_stocks import fn_push, get_cube, session
+from z_stocks.rate_limit import xueqiu_limiter
+
+
+def test_push_bypasses_xueqiu_limiter_on_shared_host(fake_server, monkeypatch):
+    def acquire():
+        raise AssertionError("push traffic must not take Xueqiu tokens")
+
+    monkeypatch.setattr(xueqiu_limiter, "acquire", acquire)
+    assert fn_push.push("title", "message", sender="CUBE")
+    assert fake_server.stats["pushes"] == 1
+    assert fake_server.pushes[0][1]["title"] == "title"
+
+
+def test_xueqiu_requests_take_limiter_tokens(fake_server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(xueqiu_limiter, "acquire", lambda: calls.append(1))
+    get_cube.fetch_current("ZH0000001")
+    assert calls == [1]
+
+
+def test_classification_uses_configured_prefixes(monkeypatch):
+    monkeypatch.setattr(session, "XUEQIU_PREFIXES", ("https://xueqiu.com/", "https://stock.xueqiu.com/"))
+    assert session._is_xueqiu("https://xueqiu.com/cubes/rebalancing/current.json")
+    assert not session._is_xueqiu("https://xueqiu.com.evil.example/x")
+    assert not session._is_xueqiu("http://www.ggsuper.com.cn/push/api/v1/sendMsg3_New.php")
@@ -0,0 +1,57 @@
+from collections import Counter
+
+from z_stocks import get_cube, get_stocks, shard
+from z_stocks.rate_limit import AdaptiveLimiter
+
+KEYS = [f"ZH{i:07d}" for i in range(2000)]
+
+
+def test_placement_is_deterministic():
+    a = shard.HashRing(range(4))
+    b = shard.HashRing(range(4))
+    assert [a.node_for(k) for k in KEYS] == [b.node_for(k) for k in KEYS]
+
+
+def test_placement_is_roughly_balanced():
+    ring = shard.HashRing(range(4))
+    counts = Counter(ring.node_for(k) for k in KEYS)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.6
+
+
+def test_adding_a_shard_moves_few_keys():
+    before = shard.HashRing(range(4))
+    after = shard.HashRing(range(5))
+    moved = [k for k in KEYS if before.node_for(k) != after.node_for(k)]
+    # 理想情况下只有约 1/5 的目标换到新分片，且都换到新分片上
+    assert len(moved) < len(KEYS) * 0.35
+    assert all(after.node_for(k) == 4 for k in moved)
+
+
+def test_single_shard_owns_everything():
+    ring = shard.HashRing(range(1))
+    assert {ring.node_for(k) for k in KEYS} == {0}
+
+
+def test_build_engine_partitions_targets(monkeypatch):
+    cubes = {f"cube{i}": {"cube_id": f"ZH{i:07d}"} for i in range(50)}
+    users = {f"user{i}": {"uuid": str(1000000000 + i), "stocks": {}} for i in range(50)}
+    monkeypatch.setattr(get_cube, "load_cubes", lambda: cubes)
+    monkeypatch.setattr(get_cube, "seed_analytics", lambda cube_dict: None)
+    monkeypatch.setattr(get_stocks, "load_users", lambda: users)
+
+    engines = [shard.build_engine(i, 3) for i in range(3)]
+    keys = [key for engine in engines for key in engine._targets]
+    assert sorted(keys) == sorted([f"CUBE/{name}" for name in cubes] + [f"STOCKS/{name}" for name in users])
+    assert all(len(engine) for engine in engines)
+
+
+def test_share_budget_scales_rate_and_burst():
+    limiter = AdaptiveLimiter(rate=2.0, burst=5)
+    shard.share_budget(limiter, 2)
+    assert (limiter.rate, limiter.max_rate, limiter.burst) == (1.0, 1.0, 2)
+    assert limiter._tokens <= 2
+
+    limiter = AdaptiveLimiter(rate=2.0, burst=5)
+    shard.share_budget(limiter, 8)
+    assert limiter.burst == 1
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+
+import pytest
+
+from z_stocks import state
+
+
+def test_sqlite_round_trip_survives_reopen(tmp_path):
+    path = tmp_path / "state.db"
+    store = state.SqliteStateStore(path)
+    store.put_many("cube", {"a": {"laster_id": 1}, "b": {"laster_id": 2}})
+    store.put("cube", "a", {"laster_id": 3})
+    store.put("stocks", "u", {"stocks": [{"symbol": "SH600000", "name": "浦发银行"}]})
+    store.close()
+
+    store = state.SqliteStateStore(path)
+    try:
+        assert store.load("cube") == {"a": {"laster_id": 3}, "b": {"laster_id": 2}}
+        assert store.load("stocks") == {"u": {"stocks": [{"symbol": "SH600000", "name": "浦发银行"}]}}
+        assert store.load("missing") == {}
+    finally:
+        store.close()
+
+
+def test_sqlite_uses_wal(tmp_path):
+    path = tmp_path / "state.db"
+    state.SqliteStateStore(path).close()
+    conn = sqlite3.connect(str(path))
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+
+def test_sqlite_put_many_is_atomic(tmp_path):
+    store = state.SqliteStateStore(tmp_path / "state.db")
+    try:
+        store.put_many("cube", {"a": {"laster_id": 1}})
+        # 第二行违反 NOT NULL，第一行的写入也要一起回滚
+        with pytest.raises(sqlite3.IntegrityError):
+            store.put_many("cube", {"a": {"laster_id": 2}, None: {"laster_id": 3}})
+        assert store.load("cube") == {"a": {"laster_id": 1}}
+    finally:
+        store.close()
+
+
+def test_json_store_merges_and_rewrites_atomically(tmp_path):
+    path = tmp_path / "cube_symbol.json"
+    path.write_text(json.dumps({"a": {"cube_id": "ZH1"}}), encoding="utf-8")
+    store = state.JsonStateStore({"cube": path})
+    store.put("cube", "a", {"laster_id": 5})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": {"cube_id": "ZH1", "laster_id": 5}}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_load_targets_overlays_saved_state(tmp_path, monkeypatch):
+    path = tmp_path / "cube_symbol.json"
+    path.write_text(json.dumps({"a": {"cube_id": "ZH1"}, "b": {"cube_id": "ZH2"}}), encoding="utf-8")
+    store = state.SqliteStateStore(tmp_path / "state.db")
+    store.put_many("cube", {"a": {"laster_id": 7}, "gone": {"laster_id": 1}})
+    monkeypatch.setattr(state, "JSON_FILES", {"cube": path})
+    monkeypatch.setattr(state, "_store", store)
+    try:
+        assert state.load_targets("cube") == {"a": {"cube_id": "ZH1", "laster_id": 7}, "b": {"cube_id": "ZH2"}}
+    finally:
+        store.close()
@@ -0,0 +1,78 @@
+from z_stocks import watchers
+from z_stocks.watchlist_diff import WatchEntry, WatchlistDelta
+
+MOUTAI = WatchEntry("SH600519", "贵州茅台")
+T0 = 1_700_000_000.0
+
+
+def added(*entries):
+    return WatchlistDelta(added={x.symbol: x for x in entries})
+
+
+def removed(*entries):
+    return WatchlistDelta(removed={x.symbol: x for x in entries})
+
+
+def index():
+    return watchers.WatcherIndex(min_users=3, window=600)
+
+
+def test_threshold_fires_once_per_window():
+    idx = index()
+    assert idx.apply("u1", added(MOUTAI), T0) == []
+    assert idx.apply("u2", added(MOUTAI), T0 + 10) == []
+    (signal,) = idx.apply("u3", added(MOUTAI), T0 + 20)
+
+    assert (signal.direction, signal.symbol, signal.name) == ("add", "SH600519", "贵州茅台")
+    assert signal.users == ["u1", "u2", "u3"] and signal.watchers == 3
+    assert idx.apply("u4", added(MOUTAI), T0 + 30) == []
+    assert idx.watching("SH600519") == 4
+
+
+def test_window_expiry_rearms_signal():
+    idx = index()
+    for i, user in enumerate(["u1", "u2", "u3"]):
+        idx.apply(user, added(MOUTAI), T0 + i)
+
+    # u1、u2 滑出窗口，用户数回落到阈值以下，之后再次达到阈值时重新提醒
+    assert idx.apply("u4", added(MOUTAI), T0 + 601) == []
+    (signal,) = idx.apply("u5", added(MOUTAI), T0 + 601)
+    assert signal.users == ["u3", "u4", "u5"]
+
+
+def test_add_then_remove_cancels_out():
+    idx = index()
+    idx.apply("u1", added(MOUTAI), T0)
+    idx.apply("u2", added(MOUTAI), T0 + 1)
+    assert idx.apply("u2", removed(MOUTAI), T0 + 2) == []
+    assert idx.apply("u3", added(MOUTAI), T0 + 3) == []
+    assert idx.watching("SH600519") == 2
+
+    (signal,) = idx.apply("u4", added(MOUTAI), T0 + 4)
+    assert signal.users == ["u1", "u3", "u4"]
+
+
+def test_removals_fire_with_remaining_watchers():
+    idx = index()
+    idx.seed("u0", {MOUTAI.symbol: MOUTAI})
+    for user in ("u1", "u2", "u3"):
+        idx.seed(user, {MOUTAI.symbol: MOUTAI})
+    signals = [s for i, user in enumerate(["u1", "u2", "u3"]) for s in idx.apply(user, removed(MOUTAI), T0 + i)]
+
+    assert [(s.direction, s.users, s.watchers) for s in signals] == [("remove", ["u1", "u2", "u3"], 1)]
+
+
+def test_seed_produces_no_signals():
+    idx = index()
+    for i in range(10):
+        idx.seed(f"u{i}", {MOUTAI.symbol: MOUTAI})
+    assert idx.watching("SH600519") == 10
+    assert idx.apply("u10", added(MOUTAI), T0) == []
+    assert idx.watching("SH600519") == 11
+
+
+def test_prune_clears_idle_windows():
+    idx = index()
+    idx.apply("u1", added(MOUTAI), T0)
+    idx.apply("u1", added(WatchEntry("SH600000", "浦发银行")), T0 + 1200)
+    assert ("add", "SH600519") not in idx._recent
@@ -0,0 +1,180 @@
+import datetime
+import threading
+
+import numpy as np
+
+# 至少多少个组合在同一天同向调整同一只股票才算信号
+COORDINATED_MIN_CUBES = 2
+# 矩阵初始容量，不够时按倍数扩容
+INITIAL_CUBES = 64
+INITIAL_SYMBOLS = 1024
+
+
+class HoldingsMatrix:
+    """组合 × 股票 的权重矩阵，收到调仓时增量更新。
+
+    weights[i, j] 是组合 i 中股票 j 的权重（百分比），moves[i, j] 是组合 i 今天对股票 j 的累计调整量，
+    跨天时清零。buys[j] / sells[j] 是今天净加仓 / 净减仓股票 j 的组合数，随调仓增量维护，
+    每次更新只触及被调整的单元格。其余统计都是对矩阵的向量化运算。
+    """
+
+    def __init__(self, cubes: int = INITIAL_CUBES, symbols: int = INITIAL_SYMBOLS):
+        self.cubes = []
+        self.symbols = []
+        self._cube_index = {}
+        self._symbol_index = {}
+        self.weights = np.zeros((cubes, symbols), dtype=np.float32)
+        self.moves = np.zeros((cubes, symbols), dtype=np.float32)
+        self.buys = np.zeros(symbols, dtype=np.int32)
+        self.sells = np.zeros(symbols, dtype=np.int32)
+        self._day = datetime.date.today()
+        self._lock = threading.Lock()
+
+    def _grow(self, rows, cols):
+        if rows <= self.weights.shape[0] and cols <= self.weights.shape[1]:
+            return
+        shape = (max(rows, self.weights.shape[0] * 2), max(cols, self.weights.shape[1] * 2))
+        for name in ("weights", "moves"):
+            old = getattr(self, name)
+            new = np.zeros(shape, dtype=old.dtype)
+            new[: old.shape[0], : old.shape[1]] = old
+            setattr(self, name, new)
+        for name in ("buys", "sells"):
+            old = getattr(self, name)
+            new = np.zeros(shape[1], dtype=old.dtype)
+            new[: old.shape[0]] = old
+            setattr(self, name, new)
+
+    def _row(self, cube_id):
+        row = self._cube_index.get(cube_id)
+        if row is None:
+            row = self._cube_index[cube_id] = len(self.cubes)
+            self.cubes.append(cube_id)
+            self._grow(len(self.cubes), len(self.symbols))
+        return row
+
+    def _cols(self, symbols):
+        cols = []
+        for symbol in symbols:
+            col = self._symbol_index.get(symbol)
+            if col is None:
+                col = self._symbol_index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            cols.append(col)
+        self._grow(len(self.cubes), len(self.symbols))
+        return np.asarray(cols, dtype=np.intp)
+
+    def _roll_day(self):
+        today = datetime.date.today()
+        if today != self._day:
+            self._day = today
+            self.moves[:] = 0
+            self.buys[:] = 0
+            self.sells[:] = 0
+
+    @property
+    def _view(self):
+        return self.weights[: len(self.cubes), : len(self.symbols)]
+
+    def update_holdings(self, cube_id, holdings: dict):
+        """用完整持仓 {symbol: weight} 覆盖组合的一行。"""
+        with self._lock:
+            row = self._row(cube_id)
+            cols = self._cols(holdings)
+            self.weights[row] = 0
+            self.weights[row, cols] = np.fromiter(holdings.values(), dtype=np.float32, count=len(cols))
+
+    def apply_rebalance(self, cube_id, entries, min_cubes: int = COORDINATED_MIN_CUBES):
+        """应用 history.json 的调仓单：更新权重，并只把 updated_at 在今天的调仓计入今天的调整量。
+
+        新组合第一次轮询或停机后补抓到的历史调仓只更新权重，不会被当作今天的同向调整。
+
+        :return: 本次今天的调仓涉及的股票中，今天被至少 min_cubes 个组合同向调整的
+            {"buy": {symbol: n}, "sell": {symbol: n}}。
+        """
+        changes = [(s["stock_symbol"], s.get("weight") or 0.0) for x in entries for s in x["rebalancing_histories"]]
+        if not changes:
+            return {"buy": {}, "sell": {}}
+        with self._lock:
+            self._roll_day()
+            row = self._row(cube_id)
+            symbols, weight = zip(*changes)
+            # 先算列号：_cols 扩容时会替换 self.weights
+            cols = self._cols(symbols)
+            self.weights[row, cols] = np.asarray(weight, dtype=np.float32)
+
+            moves = [
+                (s["stock_symbol"], s.get("prev_weight_adjusted") or 0.0, s.get("weight") or 0.0)
+                for x in entries
+                if datetime.date.fromtimestamp(x["updated_at"] / 1000) == self._day
+                for s in x["rebalancing_histories"]
+            ]
+            if not moves:
+                return {"buy": {}, "sell": {}}
+            symbols, prev, weight = zip(*moves)
+            cols = self._cols(symbols)
+            weight = np.asarray(weight, dtype=np.float32)
+            touched = np.unique(cols)
+            before = self.moves[row, touched].copy()
+            np.add.at(self.moves[row], cols, weight - np.asarray(prev, dtype=np.float32))
+            after = self.moves[row, touched]
+            self.buys[touched] += (after > 0).astype(np.int32) - (before > 0)
+            self.sells[touched] += (after < 0).astype(np.int32) - (before < 0)
+            return self._signals(touched, min_cubes)
+
+    def _signals(self, cols, min_cubes):
+        buys = self.buys[cols]
+        sells = self.sells[cols]
+        return {
+            "buy": {self.symbols[j]: int(n) for j, n in zip(cols[buys >= min_cubes], buys[buys >= min_cubes])},
+            "sell": {self.symbols[j]: int(n) for j, n in zip(cols[sells >= min_cubes], sells[sells >= min_cubes])},
+        }
+
+    def consensus(self, top: int = 20):
+        """按平均权重排序的共识持仓: [(symbol, 平均权重, 持有组合数), ...]。"""
+        with self._lock:
+            view = self._view
+            if view.size == 0:
+                return []
+            mean = view.mean(axis=0)
+            holders = np.count_nonzero(view, axis=0)
+            order = np.argsort(mean)[::-1][:top]
+            return [(self.symbols[j], float(mean[j]), int(holders[j])) for j in order if mean[j] > 0]
+
+    def similarity(self):
+        """组合两两之间持仓的余弦相似度矩阵，行列顺序同 self.cubes。"""
+        with self._lock:
+            view = self._view.astype(np.float64)
+        norm = np.linalg.norm(view, axis=1, keepdims=True)
+        unit = np.divide(view, norm, out=np.zeros_like(view), where=norm > 0)
+        return unit @ unit.T
+
+    def overlap(self, chunk: int = 64):
+        """组合两两之间的持仓重合度 sum(min(w_a, w_b))，按行分块计算以控制内存。"""
+        with self._lock:
+            view = self._view.copy()
+        n = view.shape[0]
+        result = np.zeros((n, n), dtype=np.float32)
+        for start in range(0, n, chunk):
+            block = view[start : start + chunk]
+            result[start : start + chunk] = np.minimum(block[:, None, :], view[None, :, :]).sum(axis=2)
+        return result
+
+    def coordinated_moves(self, min_cubes: int = COORDINATED_MIN_CUBES):
+        """今天被至少 min_cubes 个组合同向调整的股票: {"buy": {symbol: n}, "sell": {symbol: n}}。"""
+        with self._lock:
+            self._roll_day()
+            return self._signals(np.arange(len(self.symbols)), min_cubes)
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_matrix() -> HoldingsMatrix:
+    """返回进程内共享的持仓矩阵。"""
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            _matrix = HoldingsMatrix()
+        return _matrix
@@ -0,0 +1,159 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import log
+
+ARCHIVE_ENABLED = True
+archive_db = Path(os.environ.get("Z_STOCKS_ARCHIVE_DB", Path(__file__).parent / r"data" / r"archive.db"))
+
+# 持仓快照中现金使用的 symbol
+CASH = "CASH"
+
+# 两张表都是只追加的；索引覆盖查询用到的全部列，查询不需要回表
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rebalances (
+    cube_id TEXT NOT NULL,
+    rb_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    name TEXT,
+    prev_weight REAL,
+    weight REAL,
+    price REAL,
+    PRIMARY KEY (cube_id, rb_id, symbol)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rebalances_by_symbol ON rebalances (cube_id, symbol, ts, prev_weight, weight, price);
+CREATE INDEX IF NOT EXISTS rebalances_by_time ON rebalances (ts, cube_id, symbol, prev_weight, weight, price);
+
+CREATE TABLE IF NOT EXISTS holdings (
+    cube_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    rb_id INTEGER,
+    weight REAL,
+    PRIMARY KEY (cube_id, symbol, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS holdings_by_time ON holdings (cube_id, ts, symbol, weight);
+"""
+
+
+def to_ms(value) -> int:
+    """把 datetime / 秒级时间戳 / 毫秒时间戳统一为毫秒时间戳。"""
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp() * 1000)
+    value = float(value)
+    # 早于 1973 年的毫秒时间戳不会出现，按秒处理
+    return int(value * 1000) if value < 1e11 else int(value)
+
+
+class Archive:
+    """调仓历史与持仓快照的只追加归档 (SQLite, WAL)。
+
+    时间均为毫秒时间戳，查询结果按时间升序。
+    """
+
+    def __init__(self, path=archive_db):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, sql, rows):
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(sql, rows)
+
+    def _read(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add_rebalances(self, cube_id, entries):
+        """写入 history.json 中的调仓单列表。"""
+        rows = [
+            (
+                cube_id,
+                x["id"],
+                x["updated_at"],
+                s.get("stock_symbol"),
+                s.get("stock_name"),
+                s.get("prev_weight_adjusted") or 0.0,
+                s.get("weight") or 0.0,
+                s.get("price") or 0.0,
+            )
+            for x in entries
+            for s in x["rebalancing_histories"]
+        ]
+        self._write("INSERT OR IGNORE INTO rebalances VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def add_holdings(self, cube_id, current, ts=None):
+        """写入 current.json 中 last_success_rb 的持仓快照（含现金）。"""
+        rb = current["last_success_rb"]
+        ts = to_ms(ts if ts is not None else rb.get("updated_at") or time.time())
+        rows = [(cube_id, ts, x["stock_symbol"], rb.get("id"), x["weight"]) for x in rb["holdings"]]
+        rows.append((cube_id, ts, CASH, rb.get("id"), rb.get("cash") or 0.0))
+        self._write("INSERT OR IGNORE INTO holdings VALUES (?, ?, ?, ?, ?)", rows)
+
+    def record(self, cube_id, new_entries, current):
+        """把一次 fetch_cube 的结果写入归档。"""
+        self.add_rebalances(cube_id, new_entries)
+        if current is not None:
+            self.add_holdings(cube_id, current)
+
+    def weight_history(self, cube_id, symbol, start=0, end=None):
+        """组合 cube_id 中 symbol 的调仓记录: [(ts, prev_weight, weight, price), ...]。"""
+        return self._read(
+            "SELECT ts, prev_weight, weight, price FROM rebalances WHERE cube_id = ? AND symbol = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (cube_id, symbol, to_ms(start), to_ms(end) if end is not None else 2**62),
+        )
+
+    def holdings_history(self, cube_id, symbol, start=0, end=None):
+        """组合 cube_id 中 symbol 在各持仓快照中的权重: [(ts, weight), ...]。"""
+        return self._read(
+            "SELECT ts, weight FROM holdings WHERE cube_id = ? AND symbol = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (cube_id, symbol, to_ms(start), to_ms(end) if end is not None else 2**62),
+        )
+
+    def changes(self, start, end=None, cube_id=None):
+        """时间窗口 [start, end) 内的所有调仓: [(ts, cube_id, symbol, prev_weight, weight, price), ...]。"""
+        sql = "SELECT ts, cube_id, symbol, prev_weight, weight, price FROM rebalances WHERE ts >= ? AND ts < ?"
+        params = [to_ms(start), to_ms(end) if end is not None else 2**62]
+        if cube_id is not None:
+            sql += " AND cube_id = ?"
+            params.append(cube_id)
+        return self._read(sql + " ORDER BY ts", params)
+
+    def snapshot(self, cube_id, at=None):
+        """组合在 at 时刻（默认最新）的持仓: {symbol: weight}。"""
+        rows = self._read(
+            "SELECT symbol, weight FROM holdings WHERE cube_id = ? AND ts = "
+            "(SELECT MAX(ts) FROM holdings WHERE cube_id = ? AND ts <= ?)",
+            (cube_id, cube_id, to_ms(at) if at is not None else 2**62),
+        )
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> Archive:
+    """返回进程内共享的归档。"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = Archive()
+            log.info(f"调仓归档: {_archive.path}")
+        return _archive
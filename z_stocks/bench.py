@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import BaseAdapter
+
+import log
+import z_stocks.get_cube as get_cube
+import z_stocks.get_stocks as get_stocks
+from z_stocks import archive, replay, state
+from z_stocks.engine import Engine
+from z_stocks.fingerprint import fingerprints
+from z_stocks.latency import tracker as detection_tracker
+from z_stocks.fake_server import SyntheticMarket
+from z_stocks.push_queue import push_queue
+from z_stocks.rate_limit import xueqiu_limiter
+from z_stocks.watchlist_diff import index_watchlist
+
+FLEETS = (10, 100, 1000)
+ROUNDS = 5
+# 每次请求时目标发生变化的概率
+CHANGE_RATE = 0.02
+# 模拟的单次请求耗时（秒）
+LATENCY = 0.02
+WATCHLIST_SIZE = 200
+
+
+class SyntheticXueqiu(BaseAdapter):
+    """在内存中模拟雪球接口的传输层，每次请求以 change_rate 的概率让目标发生变化。"""
+
+    def __init__(self, change_rate=CHANGE_RATE, latency=LATENCY, watchlist_size=WATCHLIST_SIZE):
+        super().__init__()
+        self.change_rate = change_rate
+        self.latency = latency
+        self.market = SyntheticMarket(watchlist_size)
+
+    def send(self, request, **kwargs):
+        time.sleep(self.latency)
+        query = {k: v[0] for k, v in parse_qs(urlsplit(request.url).query).items()}
+        if random.random() < self.change_rate:
+            endpoint = replay.endpoint_of(request.url)
+            if endpoint == "history":
+                self.market.rebalance(query["cube_symbol"])
+            elif endpoint == "watchlist":
+                self.market.churn(query["uid"])
+        status, body = self.market.route(request.url)
+        return replay.make_response(request, status, body)
+
+    def close(self):
+        pass
+
+
+def _percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _timed(fn, started, key):
+    def wrapper(*args):
+        started[key] = time.perf_counter()
+        return fn(*args)
+
+    return wrapper
+
+
+def _finished(fn, started, latencies, key):
+    def wrapper(*args):
+        try:
+            return fn(*args)
+        finally:
+            latencies.append(time.perf_counter() - started[key])
+
+    return wrapper
+
+
+def run_fleet(size, rounds=ROUNDS, adapter=None, concurrency=None):
+    """用 size 个组合和 size 个用户跑 rounds 轮，返回统计结果。"""
+    adapter = adapter or SyntheticXueqiu()
+    market = adapter.market
+    replay.mount(adapter)
+
+    cube_dict = {f"cube{i}": {"cube_id": f"ZH{i:07d}"} for i in range(size)}
+    for cube in cube_dict.values():
+        cube["laster_id"] = market.add_cube(cube["cube_id"])
+    users = {f"user{i}": {"uuid": str(1000000000 + i)} for i in range(size)}
+    for user in users.values():
+        user["stocks"] = index_watchlist(market.add_user(user["uuid"]))
+    owners = {f"{name} 组合更新": cube["cube_id"] for name, cube in cube_dict.items()}
+    owners.update({f"{name} 自选更新通知": user["uuid"] for name, user in users.items()})
+
+    notify = []
+
+    def record_push(title, message, sender=None):
+        created = market.created.pop(owners.get(title), None)
+        if created is not None:
+            notify.append(time.time() - created)
+        return True
+
+    push_queue.send = record_push
+    engine = Engine(concurrency) if concurrency else Engine()
+    started = {}
+    latencies = []
+    for target in get_cube.targets(cube_dict) + get_stocks.targets(users):
+        target.fetch = _timed(target.fetch, started, target.key)
+        target.apply = _finished(target.apply, started, latencies, target.key)
+        engine.add(target)
+
+    before = fingerprints.stats()
+
+    async def _run():
+        begin = time.perf_counter()
+        for _ in range(rounds):
+            await engine.poll_once()
+        return time.perf_counter() - begin
+
+    try:
+        elapsed = asyncio.run(_run())
+    finally:
+        engine.close()
+    # 等待后台推送线程把本轮的推送处理完
+    deadline = time.time() + 5
+    while push_queue.qsize() and time.time() < deadline:
+        time.sleep(0.01)
+
+    after = fingerprints.stats()
+    hits = after["hits"] - before["hits"]
+    lookups = hits + after["misses"] - before["misses"]
+    return {
+        "fleet": size,
+        "targets": len(engine),
+        "rounds_per_sec": rounds / elapsed,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p99": _percentile(latencies, 0.99),
+        "notify_p50": _percentile(notify, 0.5),
+        "notify_p99": _percentile(notify, 0.99),
+        "notifications": len(notify),
+        "errors": engine.stats["errors"],
+        "fingerprint_hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+def main(fleets=FLEETS, rounds=ROUNDS, change_rate=CHANGE_RATE, latency=LATENCY, concurrency=None):
+    """对每个规模的模拟舰队跑基准，不访问网络、不写入真实状态。"""
+    log.set_level(3)
+    xueqiu_limiter.rate = xueqiu_limiter.max_rate = 1e9
+    xueqiu_limiter.burst = 1e9
+    tmp_dir = Path(tempfile.mkdtemp())
+    state._store = state.SqliteStateStore(tmp_dir / "bench.db")
+    archive._archive = archive.Archive(tmp_dir / "archive.db")
+    detection_tracker.path = tmp_dir / "latency.jsonl"
+
+    results = []
+    for size in fleets:
+        result = run_fleet(size, rounds, SyntheticXueqiu(change_rate, latency), concurrency)
+        results.append(result)
+        print(
+            f"fleet={result['fleet']:>5} targets={result['targets']:>5} "
+            f"rounds/s={result['rounds_per_sec']:>8.3f} "
+            f"latency p50={result['latency_p50'] * 1000:>8.2f}ms p99={result['latency_p99'] * 1000:>8.2f}ms "
+            f"notify p50={result['notify_p50'] * 1000:>8.2f}ms p99={result['notify_p99'] * 1000:>8.2f}ms "
+            f"({result['notifications']} pushes, {result['errors']} errors, "
+            f"unchanged {result['fingerprint_hit_rate']:.0%})"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线基准：模拟的组合/用户舰队")
+    parser.add_argument("--fleets", type=int, nargs="+", default=list(FLEETS))
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--change-rate", type=float, default=CHANGE_RATE)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    main(args.fleets, args.rounds, args.change_rate, args.latency, args.concurrency)
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import log
+from z_stocks import metrics, profiling
+from z_stocks.push_queue import push_queue
+from z_stocks.rate_limit import CircuitBreaker
+from z_stocks.scheduler import Scheduler
+
+# 同时在途的检测任务数量上限
+CONCURRENCY = 8
+# 启动时随机错开各目标的首次检测，避免同一时刻集中请求
+START_JITTER = 5
+# 调度循环最长空等时间，保证时段切换能及时生效
+MAX_IDLE = 30
+
+
+class Target:
+    """一个被监控的目标（一个组合或一个用户的自选）。
+
+    :param name: 目标名称，用于日志与错误报告。
+    :param fetch: 无参的同步函数，只做网络请求，在线程池中执行。
+    :param apply: 接收 fetch 结果的同步函数，更新状态并推送，返回是否有变化。
+        同一批到期的目标按到期顺序依次 apply。为 None 时以 fetch 的返回值作为是否有变化。
+    :param scale: 检测间隔相对调度器基础间隔的倍率。
+    :param sender: 错误报告的推送发送者，同一 sender 的目标共用一个熔断器。
+    :param error_title: 错误报告的推送标题。
+    :param shard_key: 多进程分片时用于分配目标的键，默认为 key。
+    """
+
+    def __init__(self, name, fetch, apply=None, scale=1.0, sender=None, error_title=None, shard_key=None):
+        self.name = name
+        self.fetch = fetch
+        self.apply = apply
+        self.scale = scale
+        self.sender = sender
+        self.error_title = error_title or f"{name} 监控出错"
+        # 不同监控中可能有同名目标，调度时以 sender 区分
+        self.key = f"{sender}/{name}"
+        self.shard_key = str(shard_key) if shard_key is not None else self.key
+
+
+class Engine:
+    """基于 asyncio 的轮询引擎。
+
+    调度器按市场时段和目标活跃度决定每个目标的下次检测时间。每次把到期的一批目标并发 fetch
+    （阻塞请求在线程池中执行，受信号量限制），再按到期顺序依次 apply，推送顺序是确定的。
+    请求节奏由全局限流器控制，连续失败由每个监控 (sender) 的熔断器处理。
+    """
+
+    def __init__(self, concurrency: int = CONCURRENCY, scheduler: Scheduler = None):
+        self.concurrency = concurrency
+        self.scheduler = scheduler or Scheduler()
+        self._targets = {}
+        self._executor = None
+        self._semaphore = None
+        self._wakeup = None
+        self._breakers = {}
+        self._tasks = set()
+        self.stats = {"polls": 0, "errors": 0, "changes": 0}
+
+    def breaker(self, sender) -> CircuitBreaker:
+        if sender not in self._breakers:
+            self._breakers[sender] = CircuitBreaker()
+        return self._breakers[sender]
+
+    def __len__(self):
+        return len(self._targets)
+
+    def add(self, *targets: Target):
+        for target in targets:
+            self._targets[target.key] = target
+
+    async def call(self, fn, *args):
+        """在线程池中执行阻塞函数，受并发上限约束。"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def _fetch(self, target: Target):
+        breaker = self.breaker(target.sender)
+        retry_in = breaker.retry_in()
+        if retry_in:
+            return None, retry_in
+        try:
+            with profiling.span("engine.fetch"):
+                return await self.call(target.fetch), None
+        except Exception as e:
+            return e, None
+
+    def _failed(self, target: Target, error: Exception):
+        breaker = self.breaker(target.sender)
+        self.stats["errors"] += 1
+        metrics.POLL_ERRORS.inc(sender=target.sender)
+        log.exception(error)
+        if breaker.record_failure():
+            log.error(f"{target.name} 连续失败 {breaker.failures} 次，熔断 {breaker.cooldown}s 并发送错误报告.")
+            push_queue.submit(target.error_title, str(error), sender=target.sender)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, keys, reschedule=True):
+        with profiling.span("engine.dispatch"):
+            await self._dispatch_batch(keys, reschedule)
+
+    async def _dispatch_batch(self, keys, reschedule):
+        start = time.perf_counter()
+        targets = [self._targets[key] for key in keys]
+        fetches = [asyncio.create_task(self._fetch(t)) for t in targets]
+        for target, fetch in zip(targets, fetches):
+            result, retry_in = await fetch
+            if retry_in:
+                if reschedule:
+                    self.scheduler.delay(target.key, retry_in)
+                    self._wakeup.set()
+                continue
+            changed = False
+            self.stats["polls"] += 1
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                with profiling.span("engine.apply"):
+                    changed = bool(await self.call(target.apply, result) if target.apply else result)
+                self.breaker(target.sender).record_success()
+                metrics.mark_success(target.key)
+            except Exception as e:
+                self._failed(target, e)
+            self.stats["changes"] += changed
+            if reschedule:
+                self.scheduler.done(target.key, changed)
+                self._wakeup.set()
+        metrics.ROUND_SECONDS.set(time.perf_counter() - start)
+
+    def _setup(self):
+        if self._executor is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._wakeup = asyncio.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="engine")
+
+    async def poll_once(self, keys=None):
+        """不经过调度器，立即把 keys（默认全部目标）检测一轮，用于基准测试与调试。"""
+        self._setup()
+        await self._dispatch(list(self._targets) if keys is None else keys, reschedule=False)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run_async(self):
+        self._setup()
+        for target in self._targets.values():
+            self.scheduler.add(target.key, target.scale, due=time.time() + random.uniform(0, START_JITTER))
+        log.success(f"轮询引擎已启动，共 {len(self._targets)} 个目标，并发上限 {self.concurrency}")
+        try:
+            while True:
+                due = self.scheduler.pop_due()
+                if due:
+                    self._spawn(self._dispatch(due))
+                wait = self.scheduler.wait_time()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=MAX_IDLE if wait is None else min(MAX_IDLE, wait))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.close()
+
+    def run(self):
+        asyncio.run(self.run_async())
@@ -0,0 +1,296 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+import log
+from z_stocks import fast_json, metrics, session
+from z_stocks.fn_push import send_push_notification
+from z_stocks.push_queue import PushQueue
+
+# 事件类型
+REBALANCE = "cube.rebalance"
+HOLDINGS = "cube.holdings"
+WATCH_ADD = "watchlist.add"
+WATCH_REMOVE = "watchlist.remove"
+WATCH_MODIFY = "watchlist.modify"
+EVENT_TYPES = (REBALANCE, HOLDINGS, WATCH_ADD, WATCH_REMOVE, WATCH_MODIFY)
+
+# 每个订阅者最多缓存多少个未处理的事件，满了之后新事件被丢弃并计数，不会阻塞轮询
+SUBSCRIBER_BUFFER = 1000
+# 事件写入的 JSON Lines 文件，为 None 时不写
+event_log = Path(os.environ.get("Z_STOCKS_EVENT_LOG", Path(__file__).parent / r"data" / r"events.jsonl"))
+# 收到事件后 POST JSON 的地址
+WEBHOOK_URLS = []
+WEBHOOK_TIMEOUT = (2, 5)
+# 除主推送外，额外接收事件推送的 token
+PUSH_TOKENS = []
+# SSE 连接上没有事件时发送心跳的间隔（秒），用于发现已断开的连接
+SSE_HEARTBEAT = 15
+
+EVENTS = metrics.REGISTRY.register(metrics.Counter("z_stocks_events_total", "发布的事件数", ("type",)))
+EVENTS_DROPPED = metrics.REGISTRY.register(metrics.Counter("z_stocks_events_dropped_total", "订阅者缓冲区已满而丢弃的事件数", ("subscriber",)))
+
+_ids = itertools.count(1)
+
+
+class Event:
+    """一个变化事件。
+
+    :ivar id: 进程内递增的序号。
+    :ivar type: 事件类型，见 EVENT_TYPES。
+    :ivar time: 发布时间（秒）。
+    :ivar data: 事件内容，可 JSON 序列化。
+    """
+
+    __slots__ = ("id", "type", "time", "data")
+
+    def __init__(self, type, data, at=None):
+        self.id = next(_ids)
+        self.type = type
+        self.time = time.time() if at is None else at
+        self.data = data
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "type": self.type, "time": self.time, "data": self.data}
+
+    def __repr__(self):
+        return f"Event({self.id}, {self.type}, {self.data})"
+
+
+class Subscriber:
+    """在自己的线程中处理事件的订阅者。
+
+    事件先放进长度为 buffer 的队列，队列满时丢弃新事件并计数，处理慢的订阅者不会拖慢发布方。
+
+    :param types: 只接收这些类型的事件，为 None 时接收全部。
+    """
+
+    def __init__(self, name, types=None, buffer=SUBSCRIBER_BUFFER):
+        self.name = name
+        self.types = frozenset(types) if types else None
+        self._queue = queue.Queue(maxsize=buffer)
+        self._thread = None
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def wants(self, event) -> bool:
+        return self.types is None or event.type in self.types
+
+    def offer(self, event) -> bool:
+        """非阻塞地放入缓冲区，满时返回 False。"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            EVENTS_DROPPED.inc(subscriber=self.name)
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log.warning(f"事件订阅者 {self.name} 处理过慢，已丢弃 {self.dropped} 个事件")
+            return False
+        self.received += 1
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"Events-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                self.handle(event)
+                self.handled += 1
+            except Exception as e:
+                self.failed += 1
+                log.error(f"事件订阅者 {self.name} 处理 {event.type} 失败: {e}")
+
+    def handle(self, event):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "handled": self.handled,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "backlog": self._queue.qsize(),
+        }
+
+
+class FileSubscriber(Subscriber):
+    """把事件逐行追加到 JSON Lines 文件。"""
+
+    def __init__(self, path=None, types=None, buffer=SUBSCRIBER_BUFFER):
+        self.path = Path(path or event_log)
+        super().__init__(f"file:{self.path.name}", types, buffer)
+
+    def handle(self, event):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(fast_json.dumps(event.to_dict()) + "\n")
+
+
+class WebhookSubscriber(Subscriber):
+    """把每个事件 POST 到 url，请求体为 Event.to_dict()。失败不重试，只计数。"""
+
+    def __init__(self, url, types=None, buffer=SUBSCRIBER_BUFFER, timeout=WEBHOOK_TIMEOUT):
+        super().__init__(f"webhook:{url}", types, buffer)
+        self.url = url
+        self.timeout = timeout
+
+    def handle(self, event):
+        response = session.post(self.url, service="push", json=event.to_dict(), timeout=self.timeout)
+        response.raise_for_status()
+
+
+class PushSubscriber(Subscriber):
+    """把事件推送给另一个 token，通过独立的 PushQueue 发送，失败时同样退避重试。"""
+
+    def __init__(self, token, types=None, buffer=SUBSCRIBER_BUFFER):
+        super().__init__(f"push:{token}", types, buffer)
+        self.queue = PushQueue(send=partial(send_push_notification, token))
+
+    def handle(self, event):
+        self.queue.submit(describe(event), fast_json.dumps(event.data, pretty=True), sender="EVENTS", key=f"event/{event.id}")
+
+
+class StreamSubscriber(Subscriber):
+    """一个 SSE 连接，事件由连接的处理线程通过 events() 取出，而不是订阅者线程。"""
+
+    def start(self):
+        pass
+
+    def events(self, heartbeat: float = SSE_HEARTBEAT):
+        """逐个返回事件，超过 heartbeat 秒没有事件时返回 None。"""
+        while True:
+            try:
+                yield self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield None
+            else:
+                self.handled += 1
+
+
+def describe(event) -> str:
+    """事件的一行摘要，用作推送标题。"""
+    data = event.data
+    if event.type == REBALANCE:
+        return f"{data['cube_name']} 调仓 {len(data['changes'])} 只"
+    if event.type == HOLDINGS:
+        return f"{data['cube_name']} 持仓 {len(data['holdings'])} 只"
+    return f"{data['user']} {event.type.rpartition('.')[2]} {data['name']} ({data['symbol']})"
+
+
+class EventBus:
+    """进程内事件总线。publish() 只把事件放进各订阅者的缓冲区，不会阻塞。"""
+
+    def __init__(self):
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        with self._lock:
+            self._subscribers += (subscriber,)
+        subscriber.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+
+    def publish(self, type, data, at=None):
+        """发布一个事件，没有订阅者时直接返回 None。"""
+        subscribers = self._subscribers
+        if not subscribers:
+            return None
+        event = Event(type, data, at)
+        EVENTS.inc(type=type)
+        for subscriber in subscribers:
+            if subscriber.wants(event):
+                subscriber.offer(event)
+        return event
+
+    def stats(self) -> dict:
+        return {s.name: s.stats() for s in self._subscribers}
+
+
+bus = EventBus()
+
+
+def publish_rebalances(cube_name, cube_id, entries):
+    if not bus:
+        return
+    for x in entries:
+        if not x["rebalancing_histories"]:
+            continue
+        changes = [
+            {
+                "symbol": s.get("stock_symbol"),
+                "name": s.get("stock_name"),
+                "prev_weight": s.get("prev_weight_adjusted") or 0.0,
+                "weight": s.get("weight") or 0.0,
+                "price": s.get("price") or 0.0,
+            }
+            for s in x["rebalancing_histories"]
+        ]
+        data = {"cube_name": cube_name, "cube_id": cube_id, "rb_id": x["id"], "updated_at": x["updated_at"], "changes": changes}
+        bus.publish(REBALANCE, data)
+
+
+def publish_holdings(cube_name, cube_id, rb):
+    if not bus:
+        return
+    holdings = [{"symbol": x["stock_symbol"], "name": x["stock_name"], "weight": x["weight"]} for x in rb["holdings"]]
+    bus.publish(HOLDINGS, {"cube_name": cube_name, "cube_id": cube_id, "cash": rb["cash"], "holdings": holdings})
+
+
+def publish_watchlist(user, delta, current):
+    """WatchlistDelta 拆成逐只股票的 add / remove / modify 事件。"""
+    if not bus:
+        return
+    for kind, stocks in ((WATCH_ADD, delta.added), (WATCH_REMOVE, delta.removed)):
+        for stock in stocks.values():
+            bus.publish(kind, {"user": user, **stock.to_dict()})
+    for symbol, changes in delta.modified.items():
+        changed = {field: {"old": old, "new": new} for field, (old, new) in changes.items()}
+        bus.publish(WATCH_MODIFY, {"user": user, **current[symbol].to_dict(), "changes": changed})
+
+
+def _sse(query: dict):
+    """GET /events?types=cube.rebalance,watchlist.add 的 text/event-stream 响应。"""
+    types = [t for t in query.get("types", "").split(",") if t] or None
+    subscriber = bus.subscribe(StreamSubscriber(f"sse:{threading.get_ident()}", types))
+
+    def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            for event in subscriber.events():
+                if event is None:
+                    yield b": keepalive\n\n"
+                    continue
+                yield f"id: {event.id}\nevent: {event.type}\ndata: {fast_json.dumps(event.data)}\n\n".encode("utf-8")
+        finally:
+            bus.unsubscribe(subscriber)
+
+    return "text/event-stream; charset=utf-8", stream()
+
+
+def install():
+    """按配置注册文件、webhook、推送订阅者，并在指标服务上提供 /events (SSE) 与 /events/stats。"""
+    if event_log:
+        bus.subscribe(FileSubscriber(event_log))
+    for url in WEBHOOK_URLS:
+        bus.subscribe(WebhookSubscriber(url))
+    for token in PUSH_TOKENS:
+        bus.subscribe(PushSubscriber(token))
+    metrics.add_stream_route("/events", _sse)
+    metrics.add_route("/events/stats", lambda query: (200, bus.stats()))
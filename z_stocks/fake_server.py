@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import log
+
+HOST = "127.0.0.1"
+PORT = 8765
+WATCHLIST_SIZE = 200
+# 全局每秒产生的调仓数与自选变化数
+REBALANCES_PER_SEC = 0.2
+CHURN_PER_SEC = 0.2
+# 故障注入：平均延迟与抖动（秒），429/5xx/反爬页面的概率
+LATENCY = 0.05
+LATENCY_JITTER = 0.05
+ERROR_429_RATE = 0.01
+ERROR_5XX_RATE = 0.01
+ANTI_CRAWL_RATE = 0.0
+# 周期性限流窗口：每 THROTTLE_PERIOD 秒中有 THROTTLE_DURATION 秒所有雪球请求返回 429，0 表示关闭
+THROTTLE_PERIOD = 0
+THROTTLE_DURATION = 0
+
+ANTI_CRAWL_PAGE = b"<html><body>Please verify you are human</body></html>"
+
+
+def make_stock(i):
+    return {
+        "symbol": f"SH{600000 + i}",
+        "name": f"股票{i}",
+        "type": 11,
+        "remark": "",
+        "exchange": "SH",
+        "created": 1766365894640,
+        "watched": 1766365894640,
+        "category": 1,
+        "marketplace": "CN",
+    }
+
+
+class SyntheticMarket:
+    """内存中的组合调仓与用户自选数据，未见过的组合和用户在第一次被请求时创建。
+
+    created 记录每个目标尚未被取走的最早变化时间，用于计算 time-to-notify。
+    """
+
+    def __init__(self, watchlist_size=WATCHLIST_SIZE):
+        self.watchlist_size = watchlist_size
+        self.cubes = {}
+        self.users = {}
+        self.created = {}
+        self._lock = threading.Lock()
+
+    def _rebalance(self, cube_id, rb_id):
+        stock = make_stock(random.randrange(self.watchlist_size))
+        return {
+            "id": rb_id,
+            "status": "success",
+            "cube_id": cube_id,
+            "updated_at": int(time.time() * 1000),
+            "rebalancing_histories": [
+                {
+                    "stock_name": stock["name"],
+                    "stock_symbol": stock["symbol"],
+                    "weight": random.uniform(0, 30),
+                    "prev_weight_adjusted": random.uniform(0, 30),
+                    "price": random.uniform(1, 100),
+                }
+            ],
+        }
+
+    def _cube(self, cube_id):
+        if cube_id not in self.cubes:
+            self.cubes[cube_id] = [self._rebalance(cube_id, 1)]
+        return self.cubes[cube_id]
+
+    def _user(self, uid):
+        if uid not in self.users:
+            self.users[uid] = [make_stock(i) for i in range(self.watchlist_size)]
+        return self.users[uid]
+
+    def add_cube(self, cube_id) -> int:
+        """创建组合，返回最新调仓单 id。"""
+        with self._lock:
+            return self._cube(cube_id)[0]["id"]
+
+    def add_user(self, uid) -> list:
+        """创建用户，返回当前自选列表的副本。"""
+        with self._lock:
+            return list(self._user(uid))
+
+    def rebalance(self, cube_id=None):
+        """给 cube_id（默认随机一个已知组合）新增一条调仓单。"""
+        with self._lock:
+            if cube_id is None:
+                if not self.cubes:
+                    return
+                cube_id = random.choice(list(self.cubes))
+            history = self._cube(cube_id)
+            history.insert(0, self._rebalance(cube_id, history[0]["id"] + 1))
+            self.created.setdefault(cube_id, time.time())
+
+    def churn(self, uid=None):
+        """给 uid（默认随机一个已知用户）新增一只自选股或删掉一只。"""
+        with self._lock:
+            if uid is None:
+                if not self.users:
+                    return
+                uid = random.choice(list(self.users))
+            stocks = self._user(uid)
+            if stocks and random.random() < 0.5:
+                stocks.pop(random.randrange(len(stocks)))
+            else:
+                stocks.insert(0, make_stock(self.watchlist_size + random.randrange(10**6)))
+            self.created.setdefault(uid, time.time())
+
+    def history(self, cube_id, count=None, page=1) -> dict:
+        with self._lock:
+            history = self._cube(cube_id)
+            count = count or len(history)
+            return {
+                "count": count,
+                "page": page,
+                "maxPage": -(-len(history) // count),
+                "totalCount": len(history),
+                "list": history[(page - 1) * count : page * count],
+            }
+
+    def current(self, cube_id) -> dict:
+        with self._lock:
+            holdings = [h for rb in self._cube(cube_id)[:20] for h in rb["rebalancing_histories"]]
+        return {"last_success_rb": {"holdings": holdings, "cash": 10.0}}
+
+    def watchlist(self, uid) -> dict:
+        with self._lock:
+            return {"data": {"stocks": list(self._user(uid))}}
+
+    def route(self, url: str):
+        """按 URL 返回 (status, body)，未知路径返回 404。"""
+        parts = urlsplit(url)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if parts.path.endswith("/cubes/rebalancing/history.json"):
+            count = int(query["count"]) if "count" in query else None
+            body = self.history(query["cube_symbol"], count, int(query.get("page", 1)))
+        elif parts.path.endswith("/cubes/rebalancing/current.json"):
+            body = self.current(query["cube_symbol"])
+        elif parts.path.endswith("/stock/portfolio/stock/list.json"):
+            body = self.watchlist(query["uid"])
+        else:
+            return 404, b'{"error_description": "not found"}'
+        return 200, json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+class FaultInjector:
+    """按配置给响应注入延迟、429、5xx 与反爬页面。"""
+
+    def __init__(
+        self,
+        latency=LATENCY,
+        jitter=LATENCY_JITTER,
+        error_429_rate=ERROR_429_RATE,
+        error_5xx_rate=ERROR_5XX_RATE,
+        anti_crawl_rate=ANTI_CRAWL_RATE,
+        throttle_period=THROTTLE_PERIOD,
+        throttle_duration=THROTTLE_DURATION,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.anti_crawl_rate = anti_crawl_rate
+        self.throttle_period = throttle_period
+        self.throttle_duration = throttle_duration
+        self._start = time.time()
+
+    def delay(self):
+        time.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+
+    def fault(self):
+        """返回 (status, content_type, body) 表示注入的故障，不注入时返回 None。"""
+        if self.throttle_period and (time.time() - self._start) % self.throttle_period < self.throttle_duration:
+            return 429, "application/json", b'{"error_description": "throttled"}'
+        roll = random.random()
+        if roll < self.error_429_rate:
+            return 429, "application/json", b'{"error_description": "too many requests"}'
+        roll -= self.error_429_rate
+        if roll < self.error_5xx_rate:
+            return random.choice((500, 502, 503)), "text/plain", b"server error"
+        roll -= self.error_5xx_rate
+        if roll < self.anti_crawl_rate:
+            return 200, "text/html", ANTI_CRAWL_PAGE
+        return None
+
+
+class FakeServer(ThreadingHTTPServer):
+    """模拟雪球三个接口与推送接口的本地 HTTP 服务。"""
+
+    daemon_threads = True
+
+    def __init__(self, address, market: SyntheticMarket, faults: FaultInjector):
+        super().__init__(address, FakeHandler)
+        self.market = market
+        self.faults = faults
+        self.stats = {"requests": 0, "faults": 0, "pushes": 0, "not_modified": 0}
+        self.pushes = []
+        self._stats_lock = threading.Lock()
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        log.trace("fake_server: {}", format % args)
+
+    def _reply(self, status, body, content_type="application/json;charset=UTF-8", etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        if self.path.startswith("/_stats"):
+            return self._reply(200, json.dumps(server.stats).encode("utf-8"))
+        server.faults.delay()
+        fault = server.faults.fault()
+        if fault:
+            server.count("faults")
+            status, content_type, body = fault
+            return self._reply(status, body, content_type)
+        status, body = server.market.route(self.path)
+        if status != 200:
+            return self._reply(status, body)
+        # 与雪球一样带 ETag，条件请求命中时返回没有响应体的 304
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._reply(status, body, etag=etag)
+
+    def do_POST(self):
+        server = self.server
+        server.count("requests")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.endswith("/push/api/v1/sendMsg3_New.php"):
+            return self._reply(404, b"{}")
+        server.faults.delay()
+        server.count("pushes")
+        server.pushes.append((time.time(), json.loads(body or b"{}")))
+        self._reply(200, json.dumps({"code": "80000000", "msg": "Success"}).encode("utf-8"))
+
+
+def _churn_loop(market: SyntheticMarket, rebalances_per_sec, churn_per_sec, tick=0.1):
+    while True:
+        time.sleep(tick)
+        for rate, change in ((rebalances_per_sec, market.rebalance), (churn_per_sec, market.churn)):
+            expected = rate * tick
+            while expected > 0:
+                if random.random() < expected:
+                    change()
+                expected -= 1
+
+
+def serve(host=HOST, port=PORT, rebalances_per_sec=REBALANCES_PER_SEC, churn_per_sec=CHURN_PER_SEC, faults=None, market=None):
+    """启动模拟服务（阻塞）。监控进程通过环境变量指向它::
+
+    Z_STOCKS_XUEQIU_URL=http://127.0.0.1:8765 Z_STOCKS_XUEQIU_STOCK_URL=http://127.0.0.1:8765 \\
+    Z_STOCKS_PUSH_URL=http://127.0.0.1:8765 python -m z_stocks.main
+    """
+    market = market or SyntheticMarket()
+    server = FakeServer((host, port), market, faults or FaultInjector())
+    threading.Thread(target=_churn_loop, args=(market, rebalances_per_sec, churn_per_sec), name="FakeChurn", daemon=True).start()
+    log.success(f"模拟雪球/推送服务已启动: http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟雪球与推送接口，用于压测")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--rebalances", type=float, default=REBALANCES_PER_SEC, help="每秒调仓数")
+    parser.add_argument("--churn", type=float, default=CHURN_PER_SEC, help="每秒自选变化数")
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--jitter", type=float, default=LATENCY_JITTER)
+    parser.add_argument("--rate-429", type=float, default=ERROR_429_RATE)
+    parser.add_argument("--rate-5xx", type=float, default=ERROR_5XX_RATE)
+    parser.add_argument("--rate-anti-crawl", type=float, default=ANTI_CRAWL_RATE)
+    parser.add_argument("--throttle-period", type=float, default=THROTTLE_PERIOD)
+    parser.add_argument("--throttle-duration", type=float, default=THROTTLE_DURATION)
+    args = parser.parse_args()
+    serve(
+        args.host,
+        args.port,
+        args.rebalances,
+        args.churn,
+        FaultInjector(
+            args.latency,
+            args.jitter,
+            args.rate_429,
+            args.rate_5xx,
+            args.rate_anti_crawl,
+            args.throttle_period,
+            args.throttle_duration,
+        ),
+    )
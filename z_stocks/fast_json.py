@@ -0,0 +1,101 @@
+import json
+import re
+
+from z_stocks import metrics
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_decoder = json.JSONDecoder()
+_COLON = re.compile(r"\s*:\s*")
+# 对象的键、字符串值、括号，用于确认某个位置所在的键路径
+_TOKEN = re.compile(r'("(?:[^"\\]|\\.)*")\s*:|"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_MISSING = object()
+
+
+def loads(data):
+    """解码 bytes 或 str。"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+def dumps(obj, pretty: bool = False) -> str:
+    """编码为不转义中文的 JSON 字符串。
+
+    pretty 用于需要人工查看和编辑的配置文件，始终使用标准库的 4 空格缩进，
+    保证不同后端写出的文件格式一致。
+    """
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=4)
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def response_json(response):
+    """解码 requests 响应。直接解码原始字节，跳过 response.json() 的编码探测与转为 str。"""
+    with metrics.STAGE_SECONDS.time(stage="decode"):
+        return loads(response.content)
+
+
+def _walk(obj, path, default):
+    for key in path:
+        try:
+            obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            if default is _MISSING:
+                raise
+            return default
+    return obj
+
+
+def _parents(text: str, end: int):
+    """text[:end] 末尾所在位置的外层键列表，根对象为 []；位于数组中或不在对象中时返回 None。"""
+    stack = []
+    key = None
+    for match in _TOKEN.finditer(text, 0, end):
+        token = match.group()
+        if match.group(1):
+            key = match.group(1)
+        elif token in "{[":
+            stack.append(key if token == "{" else None)
+            key = None
+        elif token in "}]":
+            if stack:
+                stack.pop()
+            key = None
+    if not stack or stack[0] is not None or None in stack[1:]:
+        return None
+    return [json.loads(k) for k in stack[1:]]
+
+
+def extract(content: bytes, *path, default=_MISSING):
+    """从 JSON 原始字节中取出 path 指向的值，例如 extract(content, "data", "stocks")。
+
+    标准库后端下，如果 path 的最后一个键在响应中只出现一次，且它前面的内容确认它正好位于
+    path 的父级键之下，只解码这个键对应的值，跳过其余字段；否则（以及 orjson 后端下，
+    整体解码已经足够快）解码整个响应再逐级取值，两条路径的结果相同。
+    找不到时返回 default，未给出 default 时抛出 KeyError。
+    """
+    with metrics.STAGE_SECONDS.time(stage="decode"):
+        return _extract(content, path, default)
+
+
+def _extract(content, path, default):
+    if orjson is None and path and isinstance(path[-1], str):
+        text = content.decode("utf-8") if isinstance(content, (bytes, bytearray)) else content
+        key = json.dumps(path[-1], ensure_ascii=False)
+        if text.count(key) == 1 and all(isinstance(k, str) for k in path):
+            start = text.index(key)
+            match = _COLON.match(text, start + len(key))
+            if match and _parents(text, start) == list(path[:-1]):
+                return _decoder.raw_decode(text, match.end())[0]
+        content = text
+    return _walk(loads(content), path, default)
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+
+# 发送 If-None-Match / If-Modified-Since，服务端支持时直接返回 304
+CONDITIONAL_REQUESTS = True
+
+
+class FingerprintCache:
+    """每个目标最近一次成功处理的响应指纹。
+
+    指纹优先使用 ETag / Last-Modified，没有时使用响应体的 blake2b 摘要。
+    fetch 阶段调用 unchanged() 判断响应与上次处理过的是否相同，不同时暂存新指纹；
+    apply 成功后调用 commit() 才生效，apply 失败时下一轮仍会完整处理。
+    """
+
+    def __init__(self):
+        self._committed = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def fingerprint(response) -> str:
+        etag = response.headers.get("ETag")
+        if etag:
+            return f"etag:{etag}"
+        last_modified = response.headers.get("Last-Modified")
+        if last_modified:
+            return f"lm:{last_modified}"
+        return hashlib.blake2b(response.content, digest_size=16).hexdigest()
+
+    def request_headers(self, key) -> dict:
+        """key 对应的条件请求头。"""
+        if not CONDITIONAL_REQUESTS:
+            return {}
+        with self._lock:
+            committed = self._committed.get(key)
+        if committed is None:
+            return {}
+        kind, _, value = committed.partition(":")
+        if kind == "etag":
+            return {"If-None-Match": value}
+        if kind == "lm":
+            return {"If-Modified-Since": value}
+        return {}
+
+    def unchanged(self, key, response) -> bool:
+        """响应是否与 key 上次处理过的相同（或服务端返回 304）。"""
+        if response.status_code == 304:
+            with self._lock:
+                self.hits += 1
+                self.not_modified += 1
+            return True
+        fingerprint = self.fingerprint(response)
+        with self._lock:
+            if self._committed.get(key) == fingerprint:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._pending[key] = fingerprint
+        return False
+
+    def commit(self, key):
+        """key 的响应已经处理完，记住它的指纹。"""
+        with self._lock:
+            fingerprint = self._pending.pop(key, None)
+            if fingerprint is not None:
+                self._committed[key] = fingerprint
+
+    def forget(self, key):
+        with self._lock:
+            self._committed.pop(key, None)
+            self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+fingerprints = FingerprintCache()
@@ -1,6 +1,7 @@
 import requests
 from functools import partial
 import log
+from z_stocks import session
 
 
 def send_push_notification(token: str, title: str, message: str, url: str = None, sender: str = None):
@@ -14,7 +15,7 @@ def send_push_notification(token: str, title: str, message: str, url: str = None
     :param sender: (可选) 发送者名称。
     :return: bool, True 表示成功, False 表示失败。
     """
-    api_url = "http://www.ggsuper.com.cn/push/api/v1/sendMsg3_New.php"
+    api_url = f"{session.PUSH_URL}/push/api/v1/sendMsg3_New.php"
 
     payload = {
         "token": token,
@@ -29,7 +30,8 @@ def send_push_notification(token: str, title: str, message: str, url: str = None
         payload["sender"] = sender
 
     try:
-        response = requests.post(api_url, json=payload)
+        # 显式标记为推送，地址与雪球相同时（本地模拟服务）也不走雪球会话与限流器
+        response = session.post(api_url, service="push", json=payload)
         response.raise_for_status()  # 如果请求失败 (如 4xx, 5xx), 则抛出异常
 
         result = response.json()
@@ -1,114 +1,231 @@
-import requests
 import log
-from pathlib import Path
-import json
+import re
 import datetime
-import time
-import random
-from z_stocks._headers import headers
-from z_stocks.fn_push import push
-
-cube_json = Path(__file__).parent / r"data" / r"cube_symbol.json"
-
+import threading
+from functools import partial
+from z_stocks import archive, events, fast_json, latency, metrics, render, session, state
+
+try:
+    from z_stocks import analytics
+except ImportError:  # 未安装 numpy 时关闭持仓分析
+    analytics = None
+from z_stocks.fingerprint import fingerprints
+from z_stocks.push_queue import push_queue
+from z_stocks.engine import Engine, Target
+
+# 各接口同时在途的请求数上限
+MAX_IN_FLIGHT_HISTORY = 8
+MAX_IN_FLIGHT_CURRENT = 4
+_history_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT_HISTORY)
+_current_slots = threading.BoundedSemaphore(MAX_IN_FLIGHT_CURRENT)
+# 增量获取调仓历史：每页条数与最多翻页数
+INCREMENTAL_HISTORY = True
+HISTORY_PAGE_SIZE = 10
+HISTORY_MAX_PAGES = 5
+# 多个组合同向调整的提醒；持仓矩阵只在本进程内，多进程分片时只能看到本分片的组合，由 shard 关闭
+COORDINATED_SIGNALS = True
+_NEWEST_ID = re.compile(rb'"list"\s*:\s*\[\s*\{[^{]*?"id"\s*:\s*(\d+)')
+
+
+def peek_newest_id(content: bytes):
+    """不解码 JSON，直接从原始响应中取出第一条（最新）调仓单的 id，取不到时返回 None。"""
+    match = _NEWEST_ID.search(content)
+    return int(match.group(1)) if match else None
+
+
+def history_key(cube_id):
+    """调仓历史第一页在指纹缓存中的键。"""
+    return f"history/{cube_id}"
+
+
+def fetch_history(cube_id, laster_id=0):
+    """获取组合 laster_id 之后的调仓单（按时间从新到旧）。
+
+    增量模式下按页请求，遇到 laster_id 即停止翻页；最新一条没有变化时不解码 JSON。
+    新组合（laster_id 为 0）没有可以停下的位置，与非增量模式一样一次取回接口默认返回的完整历史，
+    不受 HISTORY_MAX_PAGES 限制。第一页与上次处理过的响应完全相同时直接返回，见 history_key。
+    """
+    base_url = f"{session.XUEQIU_URL}/cubes/rebalancing/history.json?cube_symbol={cube_id}"
+    key = history_key(cube_id)
+    if not INCREMENTAL_HISTORY or not laster_id:
+        with _history_slots:
+            response = session.get(base_url, headers=fingerprints.request_headers(key))
+        response.raise_for_status()
+        if fingerprints.unchanged(key, response):
+            return []
+        return [x for x in fast_json.response_json(response)["list"] if x["id"] > laster_id]
+
+    entries = []
+    for page in range(1, HISTORY_MAX_PAGES + 1):
+        with _history_slots:
+            response = session.get(f"{base_url}&count={HISTORY_PAGE_SIZE}&page={page}", headers=fingerprints.request_headers(key) if page == 1 else None)
+        response.raise_for_status()
 
-def get_cube_data(cube):
+        if page == 1:
+            if fingerprints.unchanged(key, response):
+                return entries
+            newest_id = peek_newest_id(response.content)
+            if newest_id is not None and newest_id <= laster_id:
+                log.trace("组合 {} 无新调仓单 {}", cube_id, newest_id)
+                return entries
+
+        data = fast_json.response_json(response)
+        for x in data["list"]:
+            if x["id"] <= laster_id:
+                return entries
+            entries.append(x)
+        if len(data["list"]) < HISTORY_PAGE_SIZE or page >= data.get("maxPage", page):
+            break
+    return entries
+
+
+def fetch_current(cube_id):
+    """获取组合的当前持仓。"""
+    url = f"{session.XUEQIU_URL}/cubes/rebalancing/current.json?cube_symbol={cube_id}"
+    with _current_slots:
+        response = session.get(url)
+    response.raise_for_status()
+    return fast_json.response_json(response)
+
+
+def fetch_cube(cube):
+    """只做网络请求，不修改状态。返回 (新调仓单列表, 当前持仓或 None)。"""
     cube_id = cube.get("cube_id", 0)
     laster_id = cube.get("laster_id", 0)
-    rebalancing_history = f"https://xueqiu.com/cubes/rebalancing/history.json?cube_symbol={cube_id}"
-    rebalancing_current = f"https://xueqiu.com/cubes/rebalancing/current.json?cube_symbol={cube_id}"
 
-    try:
-        response = requests.get(rebalancing_history, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        log.error(e)
-        return None
+    new_entries = fetch_history(cube_id, laster_id)
+    new_entries.reverse()
+    if new_entries and laster_id:
+        # 只记录时间戳，不影响组合状态；组合第一次轮询拿到的都是历史调仓，不计入检测延迟
+        latency.tracker.seen(cube_id, new_entries)
 
-    data = response.json()["list"]
-    data.reverse()
-    is_changed = False
+    current = None
+    if any(x["rebalancing_histories"] for x in new_entries):
+        current = fetch_current(cube_id)
+    return new_entries, current
 
-    msg = ""
-    for x in data:
-        if x["id"] <= laster_id:
-            log.trace("跳过已处理调仓单 {}", x["id"])
-            continue
-        else:
-            log.info("处理调仓单 {}", x["id"])
-            update_time = datetime.datetime.fromtimestamp(x["updated_at"] / 1000)
-            update_time = update_time.strftime("%Y-%m-%d %H:%M:%S")
-            msg += f"[{str(update_time)}]" + "\n\n"
-            cube["laster_id"] = x["id"]
-            for s in x["rebalancing_histories"]:
-                is_changed = True
-                stock_name = s.get("stock_name")
-                stock_symbol = s.get("stock_symbol")
-                weight = s.get("weight") or 0.0
-                price = s.get("price") or 0.0
-                prev_weight = s.get("prev_weight_adjusted") or 0.0
-
-                msg += f"    {stock_name}({stock_symbol})\n"
-                msg += f"{' ' * 50} 价格:{price:>8.2f} \n"
-                msg += f"{' ' * 50}{prev_weight:>5.2f}%  >>> {weight:>5.2f}%\n"
-
-                log.success(f"    {prev_weight:>5.2f}%  >>> {weight:>5.2f}%，价格:{price:>8.2f}")
-            msg += "\n\n"
 
-    if is_changed:
-        is_changed = False
-        msg += " " * 50 + "\n"
-        msg += " " * 50 + "\n"
-        msg += "当前持仓 \n"
+def apply_cube(cube, new_entries, current):
+    """把 fetch_cube 的结果应用到组合状态上，有调仓时返回推送消息。"""
+    is_changed = False
+    for x in new_entries:
+        log.info("处理调仓单 {}", x["id"])
+        cube["laster_id"] = x["id"]
+        if x["rebalancing_histories"]:
+            metrics.REBALANCES.inc()
+        for s in x["rebalancing_histories"]:
+            is_changed = True
+            weight = s.get("weight") or 0.0
+            price = s.get("price") or 0.0
+            prev_weight = s.get("prev_weight_adjusted") or 0.0
+            log.success(f"    {prev_weight:>5.2f}%  >>> {weight:>5.2f}%，价格:{price:>8.2f}")
 
-        response = requests.get(rebalancing_current, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        for x in data["last_success_rb"]["holdings"]:
-            # 格式化持仓行
-            name_part = f"{x['stock_name']}({x['stock_symbol']})"
-            visual_width = sum(2 if "\u4e00" <= char <= "\u9fff" else 1 for char in name_part)
-            padding = 28 - visual_width
-            msg += f"    {name_part}{' ' * padding}{x['weight']:>7.2f}% \n"
-        # 格式化现金行
-        cash_part = "现金"
-        cash_visual_width = sum(2 if "\u4e00" <= char <= "\u9fff" else 1 for char in cash_part)
-        cash_padding = 28 - cash_visual_width
-        msg += f"    {cash_part}{' ' * cash_padding}{data['last_success_rb']['cash']:>7.2f}% \n"
-        return msg
+    if is_changed:
+        with metrics.STAGE_SECONDS.time(stage="render"):
+            return "".join(render.render_rebalances(new_entries) + render.render_holdings(current["last_success_rb"]))
     return None
 
 
-def main():
-    error_num = 0
-    while True:
+def load_cubes():
+    return state.load_targets("cube")
+
+
+def save_cubes(cubes: dict):
+    """只保存发生变化的组合 {cube_name: cube}。"""
+    state.get_store().put_many("cube", {name: {"laster_id": cube["laster_id"]} for name, cube in cubes.items()})
+
+
+def push_cube(cube_name, cube, fetched):
+    """应用 fetch_cube 的结果，有新调仓时推送并保存，返回是否有调仓。"""
+    laster_id = cube.get("laster_id", 0)
+    msg = apply_cube(cube, *fetched)
+    rb_ids = [x["id"] for x in fetched[0]]
+    if msg:
+        events.publish_rebalances(cube_name, cube["cube_id"], fetched[0])
+        events.publish_holdings(cube_name, cube["cube_id"], fetched[1]["last_success_rb"])
+        detections = latency.tracker.enqueued(cube["cube_id"], rb_ids)
+        pages = render.paginate(f"{cube_name} 组合更新", msg)
+        for i, (title, page) in enumerate(pages):
+            push_queue.submit(
+                title,
+                page,
+                sender="CUBE",
+                key=f"cube/{cube['cube_id']}/{cube['laster_id']}/{i}",
+                coalesce_key=f"cube/{cube['cube_id']}/{i}",
+                on_sent=latency.tracker.on_sent(detections) if i == len(pages) - 1 else None,
+            )
+    elif rb_ids:
+        latency.tracker.discard(cube["cube_id"], rb_ids)
+    if cube.get("laster_id", 0) != laster_id:
+        save_cubes({cube_name: cube})
+    if archive.ARCHIVE_ENABLED and fetched[0]:
         try:
-            log.info("开始新的一轮检测")
-
-            with cube_json.open("r", encoding="utf-8") as f:
-                cube_dict = json.load(f)
-
-            for cube_name, cube in cube_dict.items():
-                time.sleep(1)
-                try:
-                    msg = get_cube_data(cube)
-                    if msg:
-                        push(f"{cube_name} 组合更新", msg, sender="CUBE")
-                        with cube_json.open("w", encoding="utf-8") as f:
-                            json.dump(cube_dict, f, ensure_ascii=False, indent=4)
-                except Exception as e:
-                    log.error(e)
-
-            error_num = 0
+            archive.get_archive().record(cube["cube_id"], *fetched)
         except Exception as e:
-            error_num += 1
-            if error_num >= 10:
-                log.error(f"连续失败十次，发送错误报告没，程序暂停 {7200 * 2}s.")
-                push("组合监控脚本出错", e, sender="CUBE")
-            log.exception(e)
-
-        sleep_duration = random.uniform(2, 10)
-        log.info("休眠 %.2f 秒, 等待下一轮Tick" % sleep_duration)
-        time.sleep(sleep_duration)
+            log.error(f"{cube_name} 写入调仓归档失败: {e}")
+    if analytics is not None and fetched[0]:
+        update_analytics(cube, *fetched)
+    fingerprints.commit(history_key(cube["cube_id"]))
+    return msg is not None
+
+
+def update_analytics(cube, new_entries, current):
+    """更新持仓矩阵，多个组合今天同向调整同一只股票时推送提醒。
+
+    每只股票每天每个方向只在第一次达到阈值时推送一次，之后组合数继续增加不再重复推送。
+    """
+    matrix = analytics.get_matrix()
+    signals = matrix.apply_rebalance(cube["cube_id"], new_entries)
+    if current is not None:
+        matrix.update_holdings(cube["cube_id"], {x["stock_symbol"]: x["weight"] for x in current["last_success_rb"]["holdings"]})
+
+    if not COORDINATED_SIGNALS:
+        return
+    today = datetime.date.today().isoformat()
+    for direction, label in (("buy", "加仓"), ("sell", "减仓")):
+        for symbol, count in signals[direction].items():
+            push_queue.submit(
+                f"{count} 个组合今日同向{label} {symbol}",
+                f"    {symbol}: 今日共有 {count} 个组合{label}\n",
+                sender="CUBE",
+                key=f"coordinated/{today}/{direction}/{symbol}",
+            )
+
+
+def seed_analytics(cube_dict):
+    """用归档中的最新持仓快照初始化持仓矩阵。"""
+    if analytics is None or not archive.ARCHIVE_ENABLED:
+        return
+    matrix = analytics.get_matrix()
+    for cube in cube_dict.values():
+        holdings = archive.get_archive().snapshot(cube["cube_id"])
+        holdings.pop(archive.CASH, None)
+        if holdings:
+            matrix.update_holdings(cube["cube_id"], holdings)
+
+
+def targets(cube_dict=None):
+    """为每个组合创建一个轮询目标。同一批到期的组合并发获取，按到期顺序推送。"""
+    if cube_dict is None:
+        cube_dict = load_cubes()
+    seed_analytics(cube_dict)
+    return [
+        Target(
+            cube_name,
+            partial(fetch_cube, cube),
+            apply=partial(push_cube, cube_name, cube),
+            sender="CUBE",
+            error_title="组合监控脚本出错",
+            shard_key=cube["cube_id"],
+        )
+        for cube_name, cube in cube_dict.items()
+    ]
+
+
+def main():
+    engine = Engine()
+    engine.add(*targets())
+    engine.run()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,18 @@
-import requests
-import json
-from pathlib import Path
-import time
-import random
-from z_stocks._headers import headers
+from functools import partial
+from z_stocks import events, fast_json, metrics, render, session, state
 import log
-from z_stocks.fn_push import push
+from z_stocks.fingerprint import fingerprints
+from z_stocks.push_queue import push_queue
+from z_stocks.engine import Engine, Target
+from z_stocks.watchlist_diff import WatchlistDelta, diff_watchlist, index_watchlist, load_watchlist
+from z_stocks import watchers
 
 
-stocks_json = Path(__file__).parent / r"data" / r"stocks.json"
-
 FILTER_MARKETPLACE = ["CN", "HK"]
+# 多个用户同向调整自选的提醒；关注索引只在本进程内，多进程分片时只能看到本分片的用户，由 shard 关闭
+TREND_SIGNALS = True
+# 只有备注、分组或关注时间变化时是否也推送整张自选；默认只在增删股票时推送，修改仍会保存并发布事件
+PUSH_MODIFIED = False
 PASS_SYMBOLS = [
     "CSI930914",  # 港股通高股息
     "CSIH30590",  # 机器人
@@ -18,96 +20,114 @@ PASS_SYMBOLS = [
 
 
 def get_url(uuid):
-    return f"https://stock.xueqiu.com/v5/stock/portfolio/stock/list.json?pid=-1&category=1&size=1000&uid={uuid}"
+    return f"{session.XUEQIU_STOCK_URL}/v5/stock/portfolio/stock/list.json?pid=-1&category=1&size=1000&uid={uuid}"
 
 
 def get_stocks_from_url(url):
-    """从雪球API获取最新的股票数据。"""
+    """从雪球API获取最新的股票数据。响应与上次处理过的相同时返回 None，不解码。"""
     try:
         log.info("正在发送请求至雪球 API...")
-        response = requests.get(url, headers=headers)
+        response = session.get(url, headers=fingerprints.request_headers(url))
         response.raise_for_status()  # 如果请求失败则抛出异常
         log.success("请求成功！")
-        data = response.json()["data"]["stocks"]
+        if fingerprints.unchanged(url, response):
+            return None
+        data = fast_json.extract(response.content, "data", "stocks")
         return data
     except Exception as e:
         log.error(f"从API获取数据时出错: {e}")
         raise
 
 
-def compare_stocks(old_data, new_data):
-    """比较新旧数据，找出差异。"""
-    log.info("正在比较数据差异...")
-
-    old_symbols = {stock["symbol"] for stock in old_data}
-    new_symbols = {stock["symbol"] for stock in new_data}
-
-    added_symbols = new_symbols - old_symbols
-    removed_symbols = old_symbols - new_symbols
-
-    added_stocks = {stock["symbol"]: stock for stock in new_data if stock["symbol"] in added_symbols}
-    removed_stocks = {stock["symbol"]: stock for stock in old_data if stock["symbol"] in removed_symbols}
-
-    diff = {
-        "add": added_stocks,
-        "remove": removed_stocks,
-        "current": new_data,
-        "filtered": {stock["symbol"]: stock for stock in new_data if stock["marketplace"] in FILTER_MARKETPLACE},
-    }
-    log.success("数据比较完成。")
-    return diff
-
-
-def format_stocks_message(data: dict):
-    """根据差异数据格式化要发送的消息。"""
-    message = "\n"
-    if data["add"]:
-        for stock in data["add"].values():
-            message += f"    ✅ ADD: {stock['name']} ({stock['symbol']})\n"
-    if data["remove"]:
-        for stock in data["remove"].values():
-            message += f"    ❌ REMOVE: {stock['name']} ({stock['symbol']})\n"
-
-    message += "\n\nCurrent:\n\n"
-    for stock in data["filtered"].values():
-        if stock["symbol"] in PASS_SYMBOLS:
-            continue
-        message += f"    {stock['marketplace']: <4}{stock['symbol']: <12}{stock['name']}\n"
-    return message
+def format_stocks_message(delta: WatchlistDelta, current: dict):
+    """根据差异数据格式化要发送的消息。
+
+    :param delta: 本轮的差异。
+    :param current: 本轮的 {symbol: WatchEntry}。
+    """
+    shown = (stock for stock in current.values() if stock.marketplace in FILTER_MARKETPLACE and stock.symbol not in PASS_SYMBOLS)
+    return "".join(["\n"] + render.render_watchlist_delta(delta, current) + render.render_watchlist(shown))
+
+
+def load_users():
+    """读取用户配置，每个用户的自选保存为 {symbol: WatchEntry}。"""
+    data = state.load_targets("stocks")
+    for user_data in data.values():
+        user_data["stocks"] = index_watchlist(user_data["stocks"])
+    return data
+
+
+def save_user(name, user_data):
+    state.get_store().put("stocks", name, {"stocks": [stock.to_dict() for stock in user_data["stocks"].values()]})
+
+
+def push_user(name, user_data, new_stocks_list):
+    """对比用户的新旧自选，有变化时保存并发布事件，增删股票时推送，返回是否有变化。"""
+    if new_stocks_list is None:
+        log.info("数据无变化")
+        return False
+    with metrics.STAGE_SECONDS.time(stage="diff"):
+        delta, new_index = diff_watchlist(user_data["stocks"], load_watchlist(new_stocks_list, user_data["stocks"]))
+    if delta:
+        log.info(f"{name} 自选有变化: {delta}")
+        metrics.WATCHLIST_CHANGES.inc(len(delta.added) + len(delta.removed) + len(delta.modified))
+        user_data["stocks"] = new_index
+        events.publish_watchlist(name, delta, new_index)
+        if delta.added or delta.removed or PUSH_MODIFIED:
+            with metrics.STAGE_SECONDS.time(stage="render"):
+                msg = format_stocks_message(delta, new_index)
+            for i, (title, page) in enumerate(render.paginate(f"{name} 自选更新通知", msg)):
+                push_queue.submit(title, page, sender="STOCKS", coalesce_key=f"stocks/{user_data['uuid']}/{i}")
+        save_user(name, user_data)
+        if TREND_SIGNALS:
+            push_trends(watchers.get_index().apply(name, delta))
+    else:
+        log.info("数据无变化")
+    fingerprints.commit(get_url(user_data["uuid"]))
+    return bool(delta)
+
+
+def push_trends(signals):
+    """多个用户在短时间内同向调整同一只股票时单独推送。"""
+    for signal in signals:
+        label = "加入" if signal.direction == "add" else "删除"
+        minutes = watchers.get_index().window // 60
+        msg = f"\n    {signal.name} ({signal.symbol}) {minutes:g} 分钟内被 {len(signal.users)} 个用户{label}自选\n"
+        msg += f"    用户: {', '.join(signal.users)}\n    当前关注人数: {signal.watchers}\n"
+        log.info(f"自选趋势: {signal}")
+        push_queue.submit(
+            f"{len(signal.users)} 个用户{label} {signal.name}",
+            msg,
+            sender="STOCKS",
+            key=f"trend/{signal.direction}/{signal.symbol}/{','.join(signal.users)}",
+        )
+
+
+def targets(data=None):
+    """为每个用户创建一个轮询目标。data 为 {name: {"uuid", "stocks": {symbol: WatchEntry}}}。"""
+    if data is None:
+        data = load_users()
+    if TREND_SIGNALS:
+        index = watchers.get_index()
+        for name, user_data in data.items():
+            index.seed(name, user_data["stocks"])
+    return [
+        Target(
+            name,
+            partial(get_stocks_from_url, get_url(user_data["uuid"])),
+            apply=partial(push_user, name, user_data),
+            sender="STOCKS",
+            error_title="用户自选监控失败",
+            shard_key=user_data["uuid"],
+        )
+        for name, user_data in data.items()
+    ]
 
 
 def main():
-    error_num = 0
-    while True:
-        try:
-            with stocks_json.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            for name, user_data in data.items():
-                uuid = user_data["uuid"]
-                url = get_url(uuid)
-                new_stocks_list = get_stocks_from_url(url)
-                compare_data = compare_stocks(user_data["stocks"], new_stocks_list)
-                if compare_data["add"] or compare_data["remove"]:
-                    log.info("自选有变化")
-                    msg = format_stocks_message(compare_data)
-                    user_data["stocks"] = new_stocks_list
-                    push(f"{name} 自选更新通知", msg, sender="STOCKS")
-                    with stocks_json.open("w", encoding="utf-8") as f:
-                        json.dump(data, f, ensure_ascii=False, indent=4)
-                else:
-                    log.info("数据无变化")
-        except Exception as e:
-            error_num += 1
-            if error_num >= 10:
-                log.error(f"连续失败十次，发送错误报告没，程序暂停 {7200 * 2}s.")
-                push("用户自选监控失败", str(e), sender="STOCKS")
-                log.exception(e)
-                time.sleep(7200 * 2)
-            log.exception(e)
-
-        sleep_duration = random.uniform(1, 20)
-        log.info("休眠 %.2f 秒, 等待下一轮Tick" % sleep_duration)
-        time.sleep(sleep_duration)
+    engine = Engine()
+    engine.add(*targets())
+    engine.run()
 
 
 if __name__ == "__main__":
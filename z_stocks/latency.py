@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import log
+from z_stocks import fast_json, metrics
+
+# 从调仓发生到推送送达超过 DETECTION_SLA 秒时告警
+DETECTION_SLA = 60
+# 发现时已经比调仓时间晚这么多秒的调仓单（补抓的历史调仓）不计入延迟统计
+STALE_AFTER = DETECTION_SLA * 10
+# 每个组合与全局各保留最近多少次测量用于计算分位数
+WINDOW = 1000
+# 已发现但尚未推送的调仓单最多记录多少个
+MAX_PENDING = 10000
+latency_log = Path(os.environ.get("Z_STOCKS_LATENCY_LOG", Path(__file__).parent / r"data" / r"latency.jsonl"))
+
+DETECTION_SECONDS = metrics.REGISTRY.register(
+    metrics.Histogram(
+        "z_stocks_detection_seconds",
+        "调仓发生到各阶段的耗时: seen / enqueued / delivered",
+        ("stage",),
+        buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600),
+    )
+)
+SLA_BREACHES = metrics.REGISTRY.register(metrics.Counter("z_stocks_detection_sla_breaches_total", "超过 DETECTION_SLA 的推送数"))
+
+
+class Detection:
+    """一个调仓单在流水线上的时间戳（秒）。
+
+    :ivar updated_at: 雪球上的调仓时间。
+    :ivar seen: 第一次轮询到它的时间。
+    :ivar enqueued: 推送入队时间。
+    :ivar delivered: 推送送达时间。
+    """
+
+    __slots__ = ("cube_id", "rb_id", "updated_at", "seen", "enqueued", "delivered")
+
+    def __init__(self, cube_id, rb_id, updated_at, seen):
+        self.cube_id = cube_id
+        self.rb_id = rb_id
+        self.updated_at = updated_at
+        self.seen = seen
+        self.enqueued = None
+        self.delivered = None
+
+    @property
+    def total(self):
+        return self.delivered - self.updated_at
+
+    def to_dict(self) -> dict:
+        return {
+            "cube_id": self.cube_id,
+            "rb_id": self.rb_id,
+            "updated_at": self.updated_at,
+            "seen": self.seen,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "detect": self.seen - self.updated_at,
+            "total": self.total,
+        }
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class LatencyTracker:
+    """记录每个调仓单从发生、被发现、入队到送达的耗时，按组合与全局统计分位数。
+
+    测量结果追加写入 JSON Lines 日志，超过 sla 时告警。
+    """
+
+    def __init__(self, path=latency_log, sla: float = DETECTION_SLA, window: int = WINDOW, stale_after: float = STALE_AFTER):
+        self.path = Path(path) if path else None
+        self.sla = sla
+        self.stale_after = stale_after
+        self.window = window
+        self._pending = {}
+        self._by_cube = {}
+        self._all = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def seen(self, cube_id, entries, at: float = None):
+        """fetch 拿到新调仓单时调用，同一调仓单只记录第一次。
+
+        发现时已超过 stale_after 秒的调仓单是补抓的历史，不是检测延迟，不记录。
+        """
+        at = time.time() if at is None else at
+        with self._lock:
+            for x in entries:
+                key = (cube_id, x["id"])
+                if self.stale_after and at - x["updated_at"] / 1000 > self.stale_after:
+                    continue
+                if key not in self._pending:
+                    self._pending[key] = Detection(cube_id, x["id"], x["updated_at"] / 1000, at)
+            while len(self._pending) > MAX_PENDING:
+                del self._pending[next(iter(self._pending))]
+
+    def enqueued(self, cube_id, rb_ids, at: float = None) -> list:
+        """推送入队时调用，返回对应的 Detection 列表，用于送达回调。"""
+        at = time.time() if at is None else at
+        with self._lock:
+            detections = [self._pending.pop((cube_id, rb_id), None) for rb_id in rb_ids]
+        detections = [d for d in detections if d is not None]
+        for d in detections:
+            d.enqueued = at
+        return detections
+
+    def discard(self, cube_id, rb_ids):
+        """调仓单不会被推送（例如重复推送）时调用。"""
+        with self._lock:
+            for rb_id in rb_ids:
+                self._pending.pop((cube_id, rb_id), None)
+
+    def delivered(self, detections, at: float):
+        for d in detections:
+            d.delivered = at
+            DETECTION_SECONDS.observe(d.seen - d.updated_at, stage="seen")
+            DETECTION_SECONDS.observe(d.enqueued - d.updated_at, stage="enqueued")
+            DETECTION_SECONDS.observe(d.total, stage="delivered")
+            with self._lock:
+                self._all.append(d.total)
+                self._by_cube.setdefault(d.cube_id, deque(maxlen=self.window)).append(d.total)
+            if self.sla and d.total > self.sla:
+                SLA_BREACHES.inc()
+                log.warning(
+                    f"调仓 {d.cube_id}/{d.rb_id} 推送延迟 {d.total:.1f}s 超过 {self.sla}s"
+                    f"（发现 {d.seen - d.updated_at:.1f}s，入队 {d.enqueued - d.seen:.1f}s，送达 {d.delivered - d.enqueued:.1f}s）"
+                )
+        self._persist(detections)
+
+    def _persist(self, detections):
+        if self.path is None or not detections:
+            return
+        lines = "".join(fast_json.dumps(d.to_dict()) + "\n" for d in detections)
+        try:
+            with self._write_lock:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(lines)
+        except OSError as e:
+            log.error(f"写入延迟日志失败: {e}")
+
+    def on_sent(self, detections):
+        """推送送达回调。"""
+        return lambda at: self.delivered(detections, at)
+
+    def percentiles(self, cube_id=None, qs=(0.5, 0.9, 0.99)) -> dict:
+        """最近 window 次送达的总延迟分位数 {q: 秒}，cube_id 为 None 时为全局。"""
+        with self._lock:
+            values = list(self._all if cube_id is None else self._by_cube.get(cube_id, ()))
+        return {q: percentile(values, q) for q in qs}
+
+    def summary(self) -> dict:
+        """{cube_id: {q: 秒}}，"*" 为全局。"""
+        with self._lock:
+            cubes = list(self._by_cube)
+        result = {"*": self.percentiles()}
+        for cube_id in cubes:
+            result[cube_id] = self.percentiles(cube_id)
+        return result
+
+
+def load_log(path=latency_log) -> list:
+    """读取延迟日志: [dict, ...]。"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with path.open("rb") as f:
+        return [fast_json.loads(line) for line in f if line.strip()]
+
+
+tracker = LatencyTracker()
+
+DETECTION_QUANTILES = metrics.REGISTRY.register(
+    metrics.Gauge("z_stocks_detection_latency_seconds", "最近送达的推送总延迟分位数，cube_id 为 * 时为全局", ("cube_id", "quantile"))
+)
+DETECTION_QUANTILES.set_function(
+    lambda: {(cube_id, q): value for cube_id, qs in tracker.summary().items() for q, value in qs.items() if value is not None}
+)
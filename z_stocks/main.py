@@ -1,46 +1,40 @@
-import z_stocks.get_cube as get_cube
-import z_stocks.get_stocks as get_stocks
+import argparse
 
-import log
-
-import threading
-
-import time
+from z_stocks import events, metrics, profiling, replay
+from z_stocks.shard import Supervisor, build_engine
 
+import log
 
-def main():
-    """主函数，用于设置和启动监控线程。"""
-    log.info("主程序启动，准备初始化监控线程...")
+# 工作进程数量，1 表示在当前进程内运行
+SHARDS = 1
 
-    # 1. 创建线程列表
-    threads = []
 
-    # 2. 创建并配置 cube.main 线程
-    cube_thread = threading.Thread(target=get_cube.main, name="CubeMonitor")
-    cube_thread.daemon = True  # 设置为守护线程
-    threads.append(cube_thread)
+def main(shards: int = SHARDS, metrics_port: int = metrics.METRICS_PORT, record=None, replay_dir=None, speed: float = 0):
+    """主函数，用于注册全部监控目标并启动轮询引擎。
 
-    # 3. 创建并配置 get_stocks.main 线程
-    stocks_thread = threading.Thread(target=get_stocks.main, name="StocksMonitor")
-    stocks_thread.daemon = True  # 设置为守护线程
-    threads.append(stocks_thread)
-    # 4. 启动所有线程
-    for t in threads:
-        log.info(f"正在启动线程: {t.name}")
-        t.start()
-    # 5. 主线程进入循环，以保持程序运行并监听退出信号
-    log.success("所有监控线程已启动，主程序进入等待模式。")
+    shards 大于 1 时，按 cube_id / uuid 一致性哈希把目标分到多个工作进程，由主进程守护，
+    各分片在 metrics_port + 1 + i 上提供自己的指标与 /events 事件流，守护进程在 metrics_port 上提供
+    加了 shard 标签的聚合指标；否则都在 metrics_port 上。
+    多进程模式下跨组合的同向调仓提醒与跨用户的自选趋势提醒会被关闭，见 shard.worker_main。
+    record 为录制目录，replay_dir / speed 为回放设置，多进程模式下由各工作进程分别应用。
+    """
+    # 服务端日志由后台线程写出，轮询线程不等待控制台
+    log.set_enqueue(True)
+    log.info("主程序启动，准备初始化轮询引擎...")
 
     try:
-        while True:
-            # 检查线程是否还在运行 (可选，用于监控)
-            for t in threads:
-                if not t.is_alive():
-                    log.error(f"警告！线程 {t.name} 已停止运行！")
-
-            # 主线程休眠，避免空转消耗CPU
-            time.sleep(60)
-
+        if shards > 1:
+            Supervisor(shards, metrics_port, record, replay_dir, speed).run()
+        else:
+            if record:
+                replay.enable_recording(record)
+            if replay_dir:
+                replay.enable_replay(replay_dir, speed)
+            metrics.start_server(metrics_port)
+            profiling.install()
+            events.install()
+            # 每个组合、每个用户都是事件循环上的一个独立目标
+            build_engine().run()
     except KeyboardInterrupt:
         log.warning("检测到 Ctrl+C，程序正在退出...")
 
@@ -48,4 +42,11 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, default=SHARDS, help="工作进程数量")
+    parser.add_argument("--record", action="store_true", help="录制雪球响应到 data/recordings")
+    parser.add_argument("--replay", metavar="DIR", help="回放 DIR 中录制的雪球响应，不访问网络")
+    parser.add_argument("--speed", type=float, default=0, help="回放速度倍率，0 表示逐条回放")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT, help="Prometheus 指标端口，0 表示不启动；多进程模式下此端口为聚合后的指标，分片 i 另在该端口 + 1 + i 上")
+    args = parser.parse_args()
+    main(args.shards, args.metrics_port, replay.RECORD_DIR if args.record else None, args.replay, args.speed)
@@ -0,0 +1,285 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import log
+
+METRICS_HOST = "127.0.0.1"
+# 单进程模式使用 METRICS_PORT；多进程模式下分片 i 使用 METRICS_PORT + 1 + i，0 表示不启动
+METRICS_PORT = 9108
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """带标签的指标，标签按 labelnames 的顺序以关键字参数传入。"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        """返回 [(后缀, 标签值, 额外标签, 值), ...]。"""
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """瞬时值。也可以用 set_function 在抓取时计算，函数返回 {标签值元组: 值}。"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        return [("", key, (), value) for key, value in self._function().items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数..., +Inf 桶计数, 总和]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        samples = []
+        for key, state in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", _number(bound)),), cumulative))
+            samples.append(("_sum", key, (), state[-1]))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus 文本格式。"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter("z_stocks_requests_total", "HTTP 请求数", ("service", "status")))
+HTTP_ERRORS = REGISTRY.register(Counter("z_stocks_http_errors_total", "HTTP 错误数，status 为状态码或异常类型", ("service", "status")))
+POLL_ERRORS = REGISTRY.register(Counter("z_stocks_poll_errors_total", "轮询目标失败次数", ("sender",)))
+PUSHES = REGISTRY.register(Counter("z_stocks_pushes_total", "推送结果", ("result",)))
+REBALANCES = REGISTRY.register(Counter("z_stocks_rebalances_total", "检测到的调仓单数"))
+WATCHLIST_CHANGES = REGISTRY.register(Counter("z_stocks_watchlist_changes_total", "检测到的自选变化数"))
+STAGE_SECONDS = REGISTRY.register(Histogram("z_stocks_stage_seconds", "各阶段耗时: fetch / decode / diff / render / push", ("stage",)))
+ROUND_SECONDS = REGISTRY.register(Gauge("z_stocks_round_seconds", "最近一批到期目标从获取到全部处理完的耗时"))
+LAST_SUCCESS_AGE = REGISTRY.register(Gauge("z_stocks_last_success_age_seconds", "距离目标上一次成功轮询的秒数", ("target",)))
+
+_last_success = {}
+
+
+def mark_success(target: str):
+    _last_success[target] = time.time()
+
+
+LAST_SUCCESS_AGE.set_function(lambda: {(target,): time.time() - at for target, at in list(_last_success.items())})
+
+
+def _family(name: str, families: dict) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in families:
+            return name[: -len(suffix)]
+    return name
+
+
+def merge(texts: dict, label: str = "shard") -> str:
+    """把多份 Prometheus 文本合并为一份，{标签值: 文本}，每个样本加上 label 标签。
+
+    同名指标的样本放在同一组下，HELP / TYPE 只保留一次。
+    """
+    families = {}
+    for value, text in texts.items():
+        extra = f'{label}="{_escape(value)}"'
+        for line in text.splitlines():
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = families.setdefault(parts[2], {"HELP": None, "TYPE": None, "samples": []})
+                    family[parts[1]] = family[parts[1]] or line
+                continue
+            if not line.strip():
+                continue
+            brace = line.find("{")
+            space = line.find(" ")
+            if brace != -1 and brace < space:
+                name, rest = line[:brace], line[brace + 1 :]
+                sample = f"{name}{{{extra}{'' if rest.startswith('}') else ','}{rest}"
+            else:
+                name = line[:space]
+                sample = f"{name}{{{extra}}}{line[space:]}"
+            families.setdefault(_family(name, families), {"HELP": None, "TYPE": None, "samples": []})["samples"].append(sample)
+    lines = []
+    for family in families.values():
+        lines += [family[kind] for kind in ("HELP", "TYPE") if family[kind]]
+        lines += family["samples"]
+    return "\n".join(lines) + "\n"
+
+
+# 额外的控制接口 {path: handler(query) -> (status, 可 JSON 序列化的 body)}
+_routes = {}
+# 流式接口 {path: handler(query) -> (content_type, 逐块产出 bytes 的迭代器)}
+_streams = {}
+
+
+def add_route(path: str, handler):
+    """在指标服务上挂一个返回 JSON 的 GET 接口。"""
+    _routes[path] = handler
+
+
+def add_stream_route(path: str, handler):
+    """在指标服务上挂一个流式 GET 接口（例如 SSE），连接断开时关闭迭代器。"""
+    _streams[path] = handler
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        log.trace("metrics: {}", format % args)
+
+    def _reply(self, status, body: bytes, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, content_type, chunks):
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            for chunk in chunks:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            chunks.close()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path in ("/metrics", "/"):
+            return self._reply(200, self.server.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        if parts.path in _streams:
+            return self._stream(*_streams[parts.path](dict(parse_qsl(parts.query))))
+        handler = _routes.get(parts.path)
+        if handler is None:
+            return self._reply(404, b"{}", "application/json")
+        status, body = handler(dict(parse_qsl(parts.query)))
+        self._reply(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+
+def start_server(port: int = METRICS_PORT, host: str = METRICS_HOST, render=None):
+    """在后台线程中提供 /metrics，port 为 0 时不启动。
+
+    :param render: 生成 /metrics 文本的函数，默认为 REGISTRY.render。
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        log.error(f"指标服务启动失败 {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.render = render or REGISTRY.render
+    threading.Thread(target=server.serve_forever, name="Metrics", daemon=True).start()
+    log.info(f"指标服务: http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,166 @@
+import marshal
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import log
+from log import config as log_config
+from z_stocks import metrics
+
+# 计时 span 的采样率，0 表示关闭
+SPAN_SAMPLE_RATE = 0.05
+# 按需采样：默认时长（秒）、采样间隔（秒）与输出目录
+CAPTURE_SECONDS = 10
+# /profile 接口允许的最长采样时长
+MAX_CAPTURE_SECONDS = 60
+CAPTURE_INTERVAL = 0.005
+profile_dir = Path(os.environ.get("Z_STOCKS_PROFILE_DIR", Path(__file__).parent / r"data" / r"profiles"))
+
+SPAN_SECONDS = metrics.REGISTRY.register(metrics.Histogram("z_stocks_span_seconds", "采样的热路径 span 耗时", ("span",)))
+
+_capture_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str):
+    """按 SPAN_SAMPLE_RATE 采样计时，未采中时只有一次随机数的开销。"""
+    if not SPAN_SAMPLE_RATE or random.random() >= SPAN_SAMPLE_RATE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - start, span=name)
+
+
+def _observe_sink(name, seconds):
+    if SPAN_SAMPLE_RATE and random.random() < SPAN_SAMPLE_RATE:
+        SPAN_SECONDS.observe(seconds, span=f"log.{name}")
+
+
+def _code_key(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class StackSampler:
+    """定时抓取所有线程的调用栈。
+
+    cProfile 只能作用于开启它的线程，无法附加到已经在运行的事件循环与线程池上，
+    所以按需分析使用采样：输出火焰图用的折叠栈，以及由样本换算的 pstats 文件。
+    """
+
+    def __init__(self, interval: float = CAPTURE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        # {code: [自身样本数, 包含样本数]} 与 {(caller, callee): 样本数}
+        self.functions = {}
+        self.edges = Counter()
+
+    def _sample(self, skip):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            self.samples += 1
+            self.stacks[(names.get(ident, str(ident)),) + tuple(f"{c.co_name} ({os.path.basename(c.co_filename)}:{c.co_firstlineno})" for c in codes)] += 1
+            keys = [_code_key(c) for c in codes]
+            for key in set(keys):
+                self.functions.setdefault(key, [0, 0])[1] += 1
+            if keys:
+                self.functions[keys[-1]][0] += 1
+            for edge in set(zip(keys, keys[1:])):
+                self.edges[edge] += 1
+
+    def run(self, seconds: float):
+        me = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            self._sample(me)
+            time.sleep(self.interval)
+
+    def write_collapsed(self, path: Path):
+        """每行 "线程;外层;...;内层 样本数"，可直接交给 flamegraph.pl / speedscope。"""
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+
+    def write_pstats(self, path: Path):
+        """换算为 pstats 格式：时间 = 样本数 × 采样间隔，调用次数记为样本数。"""
+        callers = {}
+        for (caller, callee), count in self.edges.items():
+            callers.setdefault(callee, {})[caller] = (count, count, count * self.interval, count * self.interval)
+        stats = {
+            key: (inclusive, inclusive, own * self.interval, inclusive * self.interval, callers.get(key, {}))
+            for key, (own, inclusive) in self.functions.items()
+        }
+        with path.open("wb") as f:
+            marshal.dump(stats, f)
+
+
+def capture(seconds: float = CAPTURE_SECONDS, out_dir=None) -> dict:
+    """采样 seconds 秒，写入 .collapsed 与 .pstats，返回文件路径。同一时间只允许一次采样。"""
+    out_dir = Path(out_dir or profile_dir)
+    if not _capture_lock.acquire(blocking=False):
+        raise RuntimeError("已有采样正在进行")
+    try:
+        log.warning(f"开始采样分析 {seconds}s")
+        sampler = StackSampler()
+        sampler.run(seconds)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        stem = out_dir / f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        paths = {"collapsed": stem.with_suffix(".collapsed"), "pstats": stem.with_suffix(".pstats")}
+        sampler.write_collapsed(paths["collapsed"])
+        sampler.write_pstats(paths["pstats"])
+        log.warning(f"采样分析完成，{sampler.samples} 个样本: {paths['collapsed']} {paths['pstats']}")
+        return {name: str(path) for name, path in paths.items()}
+    finally:
+        _capture_lock.release()
+
+
+def capture_in_background(seconds: float = CAPTURE_SECONDS):
+    def _run():
+        try:
+            capture(seconds)
+        except Exception as e:
+            log.error(f"采样分析失败: {e}")
+
+    threading.Thread(target=_run, name="Profiler", daemon=True).start()
+
+
+def _profile_route(query: dict):
+    try:
+        seconds = float(query.get("seconds", CAPTURE_SECONDS))
+    except ValueError:
+        return 400, {"error": f"seconds 不是数字: {query['seconds']}"}
+    if not 0 < seconds <= MAX_CAPTURE_SECONDS:
+        return 400, {"error": f"seconds 需要在 (0, {MAX_CAPTURE_SECONDS}] 之内"}
+    try:
+        return 200, capture(seconds)
+    except RuntimeError as e:
+        return 409, {"error": str(e)}
+
+
+def install(signum=getattr(signal, "SIGUSR1", None)):
+    """启用按需采样：kill -USR1 <pid>（Windows 上没有该信号），或 GET /profile?seconds=N。
+
+    信号处理只在主线程调用时安装。同时给 log 的控制台输出挂上 span 采样。
+    """
+    metrics.add_route("/profile", _profile_route)
+    log_config.add_sink_hook(_observe_sink)
+    if signum is not None and threading.current_thread() is threading.main_thread():
+        signal.signal(signum, lambda *_: capture_in_background())
+        log.info(f"按需采样分析: kill -{signal.Signals(signum).name[3:]} {os.getpid()}")
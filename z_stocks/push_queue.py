@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import log
+from z_stocks import metrics, profiling
+from z_stocks.fn_push import push
+
+# 待投递队列长度上限，队列满时新的推送被丢弃而不是阻塞轮询
+QUEUE_SIZE = 1000
+# 失败重试：最多尝试次数，指数退避的基数与上限（秒）
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+# 同一 coalesce_key 在窗口期内的多条推送合并为一条，0 表示不合并
+COALESCE_WINDOW = 0
+# 记住多少个已投递的幂等 key
+DEDUP_SIZE = 10000
+
+
+class PushJob:
+    __slots__ = ("title", "message", "sender", "key", "coalesce_key", "attempts", "on_sent")
+
+    def __init__(self, title, message, sender=None, key=None, coalesce_key=None, on_sent=None):
+        self.title = title
+        self.message = message
+        self.sender = sender
+        self.key = key
+        self.coalesce_key = coalesce_key
+        self.attempts = 0
+        self.on_sent = [on_sent] if on_sent is not None else []
+
+
+class PushQueue:
+    """后台推送投递队列。
+
+    轮询线程调用 submit() 后立即返回；后台线程负责发送、失败时带抖动的指数退避重试，
+    并按幂等 key 去重，保证同一个调仓单不会被推送两次。
+
+    :param send: 实际发送函数，签名同 fn_push.push，返回 True 表示成功。
+    """
+
+    def __init__(self, send=push, maxsize=QUEUE_SIZE, coalesce_window=COALESCE_WINDOW):
+        self.send = send
+        self.coalesce_window = coalesce_window
+        self._inbox = queue.Queue(maxsize=maxsize)
+        self._pending = []
+        self._seq = itertools.count()
+        self._coalescing = {}
+        self._seen = OrderedDict()
+        self._seen_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, title, message, sender=None, key=None, coalesce_key=None, on_sent=None) -> bool:
+        """提交一条推送，重复或被丢弃时返回 False。
+
+        :param on_sent: 投递成功后在推送线程中调用 on_sent(送达时间)，合并推送时各自的回调都会被调用。
+        """
+        if key is not None:
+            with self._seen_lock:
+                if key in self._seen:
+                    log.debug(f"跳过重复推送: {key}")
+                    return False
+                self._seen[key] = None
+                if len(self._seen) > DEDUP_SIZE:
+                    self._seen.popitem(last=False)
+
+        self.start()
+        try:
+            self._inbox.put_nowait(PushJob(title, message, sender, key, coalesce_key, on_sent))
+        except queue.Full:
+            self.dropped += 1
+            metrics.PUSHES.inc(result="dropped")
+            log.error(f"推送队列已满，丢弃推送: {title}")
+            return False
+        return True
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="PushQueue", daemon=True)
+                self._thread.start()
+
+    def qsize(self) -> int:
+        return self._inbox.qsize() + len(self._pending)
+
+    def _schedule(self, job, ready_at):
+        heapq.heappush(self._pending, (ready_at, next(self._seq), job))
+
+    def _accept(self, job):
+        if job.coalesce_key is None or self.coalesce_window <= 0:
+            self._schedule(job, time.monotonic())
+            return
+        waiting = self._coalescing.get(job.coalesce_key)
+        if waiting is not None:
+            waiting.title = job.title
+            waiting.message = f"{waiting.message}\n\n{job.message}"
+            waiting.on_sent += job.on_sent
+            return
+        self._coalescing[job.coalesce_key] = job
+        self._schedule(job, time.monotonic() + self.coalesce_window)
+
+    def _deliver(self, job):
+        if self._coalescing.get(job.coalesce_key) is job:
+            del self._coalescing[job.coalesce_key]
+        job.attempts += 1
+        try:
+            with metrics.STAGE_SECONDS.time(stage="push"), profiling.span("push.deliver"):
+                ok = self.send(job.title, job.message, sender=job.sender)
+        except Exception as e:
+            log.error(f"推送异常: {e}")
+            ok = False
+
+        if ok:
+            self.sent += 1
+            metrics.PUSHES.inc(result="sent")
+            delivered = time.time()
+            for callback in job.on_sent:
+                try:
+                    callback(delivered)
+                except Exception as e:
+                    log.error(f"推送回调异常: {e}")
+            return
+        if job.attempts >= MAX_ATTEMPTS:
+            self.failed += 1
+            metrics.PUSHES.inc(result="failed")
+            log.error(f"推送失败 {job.attempts} 次，放弃: {job.title}")
+            return
+        metrics.PUSHES.inc(result="retry")
+        delay = min(BACKOFF_MAX, BACKOFF_BASE**job.attempts) * random.uniform(0.5, 1.5)
+        log.warning(f"推送失败，{delay:.1f}s 后第 {job.attempts + 1} 次重试: {job.title}")
+        self._schedule(job, time.monotonic() + delay)
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                timeout = max(0.0, self._pending[0][0] - time.monotonic())
+            try:
+                self._accept(self._inbox.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            while self._pending and self._pending[0][0] <= now:
+                self._deliver(heapq.heappop(self._pending)[2])
+
+
+push_queue = PushQueue()
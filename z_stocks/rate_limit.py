@@ -0,0 +1,173 @@
+import threading
+import time
+
+import log
+
+# 雪球全局请求预算：每秒请求数与突发容量
+RATE = 2.0
+BURST = 5
+# 自适应范围：被限流时乘性降速，健康时加性恢复
+MIN_RATE = 0.1
+BACKOFF_FACTOR = 0.5
+RECOVER_STEP = 0.05
+# 被限流后所有请求额外暂停的秒数
+THROTTLE_PAUSE = 30
+
+# 熔断：连续失败多少次后断开，断开后的冷却时间（每次重新断开翻倍）
+BREAKER_THRESHOLD = 10
+BREAKER_COOLDOWN = 600
+BREAKER_MAX_COOLDOWN = 7200 * 2
+# 半开状态下探测请求在途时，其他目标等待多久再来询问；探测超过这个时间没有结果时允许新的探测
+BREAKER_PROBE_WAIT = 30
+
+
+class TokenBucket:
+    """线程安全的令牌桶，acquire() 阻塞直到拿到一个令牌。"""
+
+    def __init__(self, rate: float = RATE, burst: int = BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter(TokenBucket):
+    """按响应自动调整速率的令牌桶 (AIMD)。
+
+    遇到 429/403 或反爬页面时速率减半并整体暂停 THROTTLE_PAUSE 秒，
+    之后每个正常响应把速率加回 RECOVER_STEP，直到恢复到初始预算。
+    """
+
+    def __init__(self, rate: float = RATE, burst: int = BURST, min_rate: float = MIN_RATE):
+        super().__init__(rate, burst)
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self._paused_until = 0.0
+
+    def acquire(self):
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        super().acquire()
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + RECOVER_STEP)
+
+    def on_throttled(self, reason):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            self._tokens = 0.0
+            self._paused_until = time.monotonic() + THROTTLE_PAUSE
+            rate = self.rate
+        log.warning(f"雪球限流 ({reason})，降速至 {rate:.2f} 次/秒，暂停 {THROTTLE_PAUSE}s")
+
+    def feedback(self, response):
+        """根据响应判断是否被限流并调整速率。"""
+        reason = throttle_reason(response)
+        if reason:
+            self.on_throttled(reason)
+        else:
+            self.on_success()
+
+
+def throttle_reason(response):
+    """判断响应是否为限流或反爬，是则返回原因，否则返回 None。"""
+    if response.status_code in (429, 403):
+        return f"HTTP {response.status_code}"
+    if response.status_code == 304 or not response.content:
+        # 条件请求命中的 304 没有响应体，也没有 Content-Type
+        return None
+    if response.ok and "json" not in response.headers.get("Content-Type", ""):
+        # 雪球反爬会返回 200 的 HTML 验证页
+        return "反爬页面"
+    return None
+
+
+class CircuitBreaker:
+    """连续失败熔断器。
+
+    连续失败 threshold 次后断开，冷却期内 allow() 返回 False；冷却结束后进入半开状态，
+    只放行一个探测请求，其余调用方继续等待。探测成功即闭合，失败则立即再次断开并将冷却时间翻倍。
+    record_failure() 只在闭合后第一次断开时返回 True，反复断开不会重复发送错误报告。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """距离允许下一次尝试还有多少秒，闭合时为 0。半开时只有拿到探测资格的调用方得到 0。"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return 0.0
+            if self.state == self.OPEN:
+                remaining = self._opened_at + self.cooldown - now
+                if remaining > 0:
+                    return remaining
+                self.state = self.HALF_OPEN
+                self._probe_at = None
+            if self._probe_at is not None and now - self._probe_at < BREAKER_PROBE_WAIT:
+                return self._probe_at + BREAKER_PROBE_WAIT - now
+            self._probe_at = now
+            return 0.0
+
+    def allow(self) -> bool:
+        return self.retry_in() == 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probe_at = None
+            self._reported = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，若因此从闭合第一次断开则返回 True。"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            elif self.state == self.OPEN or self.failures < self.threshold:
+                return False
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+            first = not self._reported
+            self._reported = True
+            return first
+
+
+# 进程内所有雪球请求共用同一个限流器
+xueqiu_limiter = AdaptiveLimiter()
@@ -0,0 +1,132 @@
+import datetime
+import unicodedata
+from functools import lru_cache
+
+# 单条推送的最大字符数，0 表示不限制；超出时 "split" 拆成多条，"cap" 截断并注明省略的行数
+MESSAGE_LIMIT = 0
+MESSAGE_OVERFLOW = "split"
+# 名称列按显示宽度对齐到的列数
+NAME_COLUMN = 28
+INDENT = " " * 4
+RIGHT_COLUMN = " " * 50
+
+# 调仓消息
+REBALANCE_TIME = "[{time}]\n\n"
+REBALANCE_STOCK = INDENT + "{name}({symbol})\n"
+REBALANCE_PRICE = RIGHT_COLUMN + " 价格:{price:>8.2f} \n"
+REBALANCE_WEIGHT = RIGHT_COLUMN + "{prev_weight:>5.2f}%  >>> {weight:>5.2f}%\n"
+HOLDINGS_HEADER = RIGHT_COLUMN + "\n" + RIGHT_COLUMN + "\n" + "当前持仓 \n"
+HOLDING = INDENT + "{name}{weight:>7.2f}% \n"
+
+# 自选消息
+WATCH_ADD = INDENT + "✅ ADD: {name} ({symbol})\n"
+WATCH_REMOVE = INDENT + "❌ REMOVE: {name} ({symbol})\n"
+WATCH_MODIFY = INDENT + "✏️ MODIFY: {name} ({symbol}) {fields}\n"
+WATCH_CURRENT_HEADER = "\n\nCurrent:\n\n"
+WATCH_CURRENT = INDENT + "{marketplace: <4}{symbol: <12}{name}\n"
+
+
+@lru_cache(maxsize=65536)
+def display_width(text: str) -> int:
+    """文本在等宽字体下的显示宽度，全角与宽字符（含中文标点）占两列。"""
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+@lru_cache(maxsize=65536)
+def ljust(text: str, width: int = NAME_COLUMN) -> str:
+    """按显示宽度左对齐到 width 列。"""
+    return text + " " * max(0, width - display_width(text))
+
+
+@lru_cache(maxsize=4096)
+def format_time(ms: int) -> str:
+    return datetime.datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def render_rebalances(entries) -> list:
+    """history.json 的调仓单列表（从旧到新）渲染为行。"""
+    lines = []
+    for x in entries:
+        lines.append(REBALANCE_TIME.format(time=format_time(x["updated_at"])))
+        for s in x["rebalancing_histories"]:
+            lines.append(REBALANCE_STOCK.format(name=s.get("stock_name"), symbol=s.get("stock_symbol")))
+            lines.append(REBALANCE_PRICE.format(price=s.get("price") or 0.0))
+            lines.append(REBALANCE_WEIGHT.format(prev_weight=s.get("prev_weight_adjusted") or 0.0, weight=s.get("weight") or 0.0))
+        lines.append("\n\n")
+    return lines
+
+
+def render_holdings(rb) -> list:
+    """current.json 的 last_success_rb 渲染为持仓行（含现金）。"""
+    lines = [HOLDINGS_HEADER]
+    for x in rb["holdings"]:
+        lines.append(HOLDING.format(name=ljust(f"{x['stock_name']}({x['stock_symbol']})"), weight=x["weight"]))
+    lines.append(HOLDING.format(name=ljust("现金"), weight=rb["cash"]))
+    return lines
+
+
+def render_watchlist_delta(delta, current) -> list:
+    """WatchlistDelta 渲染为新增、删除、修改行。"""
+    lines = [WATCH_ADD.format(name=stock.name, symbol=stock.symbol) for stock in delta.added.values()]
+    lines += [WATCH_REMOVE.format(name=stock.name, symbol=stock.symbol) for stock in delta.removed.values()]
+    for symbol, changes in delta.modified.items():
+        fields = ", ".join(f"{field}: {old} -> {new}" for field, (old, new) in changes.items())
+        lines.append(WATCH_MODIFY.format(name=current[symbol].name, symbol=symbol, fields=fields))
+    return lines
+
+
+def render_watchlist(stocks) -> list:
+    lines = [WATCH_CURRENT_HEADER]
+    lines += [WATCH_CURRENT.format(marketplace=stock.marketplace, symbol=stock.symbol, name=stock.name) for stock in stocks]
+    return lines
+
+
+def split(message: str, limit: int) -> list:
+    """按行把消息拆成每条不超过 limit 个字符（单行超长时按字符切开）。"""
+    pages = []
+    page = []
+    size = 0
+    for line in message.splitlines(keepends=True):
+        while len(line) > limit:
+            if page:
+                pages.append("".join(page))
+                page, size = [], 0
+            pages.append(line[:limit])
+            line = line[limit:]
+        if size + len(line) > limit and page:
+            pages.append("".join(page))
+            page, size = [], 0
+        page.append(line)
+        size += len(line)
+    if page:
+        pages.append("".join(page))
+    return pages
+
+
+def cap(message: str, limit: int) -> str:
+    """截断到 limit 个字符以内，末尾注明省略的行数。"""
+    if len(message) <= limit:
+        return message
+    lines = message.splitlines(keepends=True)
+    kept = []
+    size = 0
+    for line in lines:
+        # 预留省略提示的位置
+        if size + len(line) > limit - 32:
+            break
+        kept.append(line)
+        size += len(line)
+    kept.append(f"\n{INDENT}…… 省略 {len(lines) - len(kept)} 行\n")
+    return "".join(kept)
+
+
+def paginate(title: str, message: str, limit: int = None, overflow: str = None) -> list:
+    """按 MESSAGE_LIMIT / MESSAGE_OVERFLOW 处理超长消息，返回 [(title, message), ...]。"""
+    limit = MESSAGE_LIMIT if limit is None else limit
+    overflow = overflow or MESSAGE_OVERFLOW
+    if not limit or len(message) <= limit:
+        return [(title, message)]
+    if overflow == "cap":
+        return [(title, cap(message, limit))]
+    pages = split(message, limit)
+    return [(f"{title} ({i}/{len(pages)})", page) for i, page in enumerate(pages, 1)]
@@ -0,0 +1,156 @@
+import bisect
+import datetime
+import gzip
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import log
+from z_stocks import fast_json, session
+
+RECORD_DIR = Path(__file__).parent / r"data" / r"recordings"
+# 需要保留的响应头
+RECORD_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def endpoint_of(url: str) -> str:
+    """把雪球 URL 归类为 history / current / watchlist / other。"""
+    path = urlsplit(url).path
+    if path.endswith("/rebalancing/history.json"):
+        return "history"
+    if path.endswith("/rebalancing/current.json"):
+        return "current"
+    if path.endswith("/stock/list.json"):
+        return "watchlist"
+    return "other"
+
+
+def normalize_url(url: str) -> str:
+    """忽略主机与参数顺序，作为回放时匹配请求的键。"""
+    parts = urlsplit(url)
+    return f"{parts.path}?{urlencode(sorted(parse_qsl(parts.query)))}"
+
+
+def make_response(request, status: int, body: bytes, headers: dict = None) -> requests.Response:
+    """构造一个不经过网络的 requests.Response。"""
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers = CaseInsensitiveDict(headers or {"Content-Type": "application/json;charset=UTF-8"})
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    response.reason = "OK" if status < 400 else "Error"
+    return response
+
+
+class Recorder:
+    """把雪球原始响应按天、按接口追加写入 gzip 压缩的 JSON Lines 文件。
+
+    :param tag: 写入 {endpoint}.{tag}.jsonl.gz，多个进程同时录制时各写各的文件。
+    """
+
+    def __init__(self, root=RECORD_DIR, tag: str = None):
+        self.root = Path(root)
+        self.tag = tag
+        self._lock = threading.Lock()
+
+    def record(self, response: requests.Response):
+        endpoint = endpoint_of(response.url)
+        day = datetime.date.today().isoformat()
+        line = fast_json.dumps(
+            {
+                "time": time.time(),
+                "url": response.url,
+                "status": response.status_code,
+                "headers": {k: response.headers[k] for k in RECORD_HEADERS if k in response.headers},
+                "body": response.content.decode("utf-8", errors="replace"),
+                "elapsed": response.elapsed.total_seconds(),
+            }
+        )
+        name = f"{endpoint}.{self.tag}" if self.tag else endpoint
+        path = self.root / day / f"{name}.jsonl.gz"
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # gzip 支持多成员追加，每次追加都是一个完整的压缩块
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def load_recordings(root=RECORD_DIR) -> dict:
+    """读取目录下所有录制，返回 {normalize_url: [record, ...]}，按时间排序。"""
+    recordings = {}
+    for path in sorted(Path(root).rglob("*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = fast_json.loads(line)
+                recordings.setdefault(normalize_url(record["url"]), []).append(record)
+    for records in recordings.values():
+        records.sort(key=lambda r: r["time"])
+    return recordings
+
+
+class ReplayAdapter(BaseAdapter):
+    """把录制的响应回放给 requests 的传输层。
+
+    speed 为 0 时每个 URL 按录制顺序逐条返回，最后一条之后一直返回最后一条；
+    否则按录制时间线回放：回放开始后经过 t 秒，返回录制开始后 t * speed 秒时最新的那条响应。
+    未录制过的 URL 返回 404。
+    """
+
+    def __init__(self, recordings: dict, speed: float = 0):
+        super().__init__()
+        self.recordings = recordings
+        self.speed = speed
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._origin = min((r[0]["time"] for r in recordings.values() if r), default=0.0)
+        self._times = {key: [r["time"] for r in records] for key, records in recordings.items()}
+
+    def _pick(self, key):
+        records = self.recordings[key]
+        if not self.speed:
+            with self._lock:
+                index = self._cursor.get(key, 0)
+                self._cursor[key] = min(index + 1, len(records) - 1)
+            return records[index]
+        replay_time = self._origin + (time.time() - self._start) * self.speed
+        index = max(0, bisect.bisect_right(self._times[key], replay_time) - 1)
+        return records[index]
+
+    def send(self, request, **kwargs):
+        key = normalize_url(request.url)
+        if key not in self.recordings:
+            return make_response(request, 404, b'{"error_description": "not recorded"}')
+        record = self._pick(key)
+        return make_response(request, record["status"], record["body"].encode("utf-8"), record["headers"])
+
+    def close(self):
+        pass
+
+
+def enable_recording(root=RECORD_DIR, tag: str = None) -> Recorder:
+    """开始录制所有雪球响应。"""
+    session.recorder = Recorder(root, tag)
+    log.info(f"开始录制雪球响应到 {root}")
+    return session.recorder
+
+
+def mount(adapter: BaseAdapter):
+    """让所有雪球请求改走 adapter 而不是网络。"""
+    for base_url in (session.XUEQIU_URL, session.XUEQIU_STOCK_URL):
+        session.xueqiu_session.mount(f"{base_url}/", adapter)
+
+
+def enable_replay(root=RECORD_DIR, speed: float = 0) -> ReplayAdapter:
+    """所有雪球请求改为回放 root 下的录制。"""
+    adapter = ReplayAdapter(load_recordings(root), speed)
+    mount(adapter)
+    log.info(f"回放 {root} 中的 {len(adapter.recordings)} 个 URL，速度 {speed or '逐条'}")
+    return adapter
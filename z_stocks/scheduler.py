@@ -0,0 +1,126 @@
+import datetime
+import heapq
+import random
+import threading
+import time
+
+# A股/港股所在时区（无夏令时）
+MARKET_TZ = datetime.timezone(datetime.timedelta(hours=8))
+
+TRADING = "trading"
+PRE_OPEN = "pre_open"
+OFF_HOURS = "off_hours"
+WEEKEND = "weekend"
+
+# 以当天分钟数表示的时段，交易时段取 A股 与 港股 的并集
+TRADING_SESSIONS = [(9 * 60 + 30, 12 * 60), (13 * 60, 16 * 60)]
+PRE_OPEN_SESSIONS = [(9 * 60, 9 * 60 + 30)]
+
+# 各时段的基础检测间隔（秒），针对最近经常变化的目标
+BASE_INTERVALS = {
+    TRADING: 2,
+    PRE_OPEN: 3,
+    OFF_HOURS: 60,
+    WEEKEND: 300,
+}
+# 长期无变化的目标，间隔最多放大到基础间隔的 MAX_FACTOR 倍
+MAX_FACTOR = 4.0
+# 变化记录的半衰期（秒）
+ACTIVITY_HALF_LIFE = 3 * 24 * 3600
+# 每次间隔的随机抖动比例
+JITTER = 0.2
+
+
+def market_phase(ts: float) -> str:
+    """返回时间戳 ts 所处的市场时段。节假日按工作日处理。"""
+    t = datetime.datetime.fromtimestamp(ts, MARKET_TZ)
+    if t.weekday() >= 5:
+        return WEEKEND
+    minute = t.hour * 60 + t.minute
+    for start, end in TRADING_SESSIONS:
+        if start <= minute < end:
+            return TRADING
+    for start, end in PRE_OPEN_SESSIONS:
+        if start <= minute < end:
+            return PRE_OPEN
+    return OFF_HOURS
+
+
+def next_boundary(ts: float) -> float:
+    """返回 ts 之后下一个时段切换的时间戳。"""
+    t = datetime.datetime.fromtimestamp(ts, MARKET_TZ)
+    midnight = t.replace(hour=0, minute=0, second=0, microsecond=0)
+    minute = t.hour * 60 + t.minute
+    for boundary in sorted({m for session in TRADING_SESSIONS + PRE_OPEN_SESSIONS for m in session}):
+        if boundary > minute:
+            return (midnight + datetime.timedelta(minutes=boundary)).timestamp()
+    return (midnight + datetime.timedelta(days=1)).timestamp()
+
+
+class Scheduler:
+    """按下次到期时间排序的目标优先队列。
+
+    每个目标的间隔 = 当前时段基础间隔 × 目标自身倍率 × 活跃度系数。
+    活跃度是按 ACTIVITY_HALF_LIFE 衰减的变化次数，最近变化越多间隔越短。
+    间隔不会跨过下一个时段切换点，开盘前后能立即收紧。
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0
+        self._scale = {}
+        self._activity = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, scale: float = 1.0, due: float = None):
+        self._scale[key] = scale
+        self._activity.setdefault(key, (0.0, time.time()))
+        self._push(key, time.time() if due is None else due)
+
+    def _push(self, key, due):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (due, self._seq, key))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def wait_time(self, now: float = None) -> float:
+        """距离最早到期的目标还有多少秒，队列为空时返回 None。"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now)
+
+    def pop_due(self, now: float = None) -> list:
+        """弹出所有已到期的目标，按到期顺序返回。"""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def activity(self, key, now: float = None) -> float:
+        now = time.time() if now is None else now
+        score, updated = self._activity[key]
+        return score * 0.5 ** ((now - updated) / ACTIVITY_HALF_LIFE)
+
+    def interval(self, key, now: float = None) -> float:
+        now = time.time() if now is None else now
+        factor = max(1.0, MAX_FACTOR / (1.0 + self.activity(key, now)))
+        interval = BASE_INTERVALS[market_phase(now)] * self._scale[key] * factor
+        interval *= random.uniform(1 - JITTER, 1 + JITTER)
+        return min(interval, max(0.0, next_boundary(now) - now) + random.uniform(0, BASE_INTERVALS[PRE_OPEN]))
+
+    def done(self, key, changed: bool, now: float = None):
+        """目标检测完成后重新入队，changed 表示本次是否发现变化。"""
+        now = time.time() if now is None else now
+        if changed:
+            self._activity[key] = (self.activity(key, now) + 1.0, now)
+        self._push(key, now + self.interval(key, now))
+
+    def delay(self, key, seconds: float):
+        """把目标推迟 seconds 秒（例如熔断期间）。"""
+        self._push(key, time.time() + seconds)
@@ -0,0 +1,92 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from z_stocks import metrics
+from z_stocks._headers import headers
+from z_stocks.rate_limit import xueqiu_limiter
+
+# (连接超时, 读取超时)，避免单个挂起的连接卡住监控
+TIMEOUT = (5, 15)
+
+# 接口地址，可通过环境变量指向本地模拟服务 (python -m z_stocks.fake_server)
+XUEQIU_URL = os.environ.get("Z_STOCKS_XUEQIU_URL", "https://xueqiu.com").rstrip("/")
+XUEQIU_STOCK_URL = os.environ.get("Z_STOCKS_XUEQIU_STOCK_URL", "https://stock.xueqiu.com").rstrip("/")
+PUSH_URL = os.environ.get("Z_STOCKS_PUSH_URL", "http://www.ggsuper.com.cn").rstrip("/")
+
+# 每个接口地址的连接池大小，未列出的地址使用 DEFAULT_POOL_SIZE
+DEFAULT_POOL_SIZE = 4
+XUEQIU_POOL_SIZE = 16
+PUSH_POOL_SIZE = 4
+# 按配置的接口地址前缀识别雪球请求；本地模拟服务下三个地址可能是同一个 host:port
+XUEQIU_PREFIXES = (f"{XUEQIU_URL}/", f"{XUEQIU_STOCK_URL}/")
+
+
+def _build_session(default_headers: dict, pools: dict) -> requests.Session:
+    """pools 为 {接口地址: 连接池大小}，两个会话各自挂载，地址相同时也互不影响。"""
+    session = requests.Session()
+    session.headers.update(default_headers)
+    default_adapter = HTTPAdapter(pool_connections=len(pools) + 1, pool_maxsize=DEFAULT_POOL_SIZE)
+    session.mount("http://", default_adapter)
+    session.mount("https://", default_adapter)
+    for base_url, size in pools.items():
+        session.mount(f"{base_url}/", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+    return session
+
+
+# 雪球请求携带 Cookie；推送接口是第三方服务，只带 User-Agent
+xueqiu_session = _build_session(headers, {XUEQIU_URL: XUEQIU_POOL_SIZE, XUEQIU_STOCK_URL: XUEQIU_POOL_SIZE})
+push_session = _build_session({"User-Agent": headers["User-Agent"]}, {PUSH_URL: PUSH_POOL_SIZE})
+
+# 不为 None 时，每个雪球响应都会交给 recorder.record(response)，见 z_stocks.replay
+recorder = None
+
+
+def _is_xueqiu(url: str) -> bool:
+    return url.startswith(XUEQIU_PREFIXES)
+
+
+def _send(service: str, http: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+    start = time.perf_counter()
+    try:
+        response = http.request(method, url, **kwargs)
+    except Exception as e:
+        metrics.REQUESTS.inc(service=service, status="error")
+        metrics.HTTP_ERRORS.inc(service=service, status=type(e).__name__)
+        raise
+    finally:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="fetch")
+    metrics.REQUESTS.inc(service=service, status=response.status_code)
+    if response.status_code >= 400:
+        metrics.HTTP_ERRORS.inc(service=service, status=response.status_code)
+    return response
+
+
+def _request(method: str, url: str, service: str = None, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", TIMEOUT)
+    if service is None:
+        service = "xueqiu" if _is_xueqiu(url) else "push"
+    if service != "xueqiu":
+        return _send("push", push_session, method, url, **kwargs)
+
+    # 雪球请求统一从全局限流器取令牌，并把响应反馈给限流器
+    xueqiu_limiter.acquire()
+    response = _send("xueqiu", xueqiu_session, method, url, **kwargs)
+    xueqiu_limiter.feedback(response)
+    if recorder is not None:
+        recorder.record(response)
+    return response
+
+
+def get(url: str, service: str = None, **kwargs) -> requests.Response:
+    """通过共享的长连接会话发送 GET 请求。
+
+    :param service: "xueqiu" 或 "push"；为 None 时按 XUEQIU_PREFIXES 判断。
+    """
+    return _request("GET", url, service, **kwargs)
+
+
+def post(url: str, service: str = None, **kwargs) -> requests.Response:
+    """通过共享的长连接会话发送 POST 请求，service 同 get()。"""
+    return _request("POST", url, service, **kwargs)
@@ -0,0 +1,220 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import urllib.request
+
+import log
+from z_stocks import metrics
+
+# 每个工作进程在哈希环上的虚拟节点数
+VNODES = 64
+# 工作进程上报指标的间隔，以及多久没有上报视为卡死
+REPORT_INTERVAL = 30
+HEARTBEAT_TIMEOUT = REPORT_INTERVAL * 4
+# 监督循环间隔与重启退避上限（秒）
+SUPERVISE_INTERVAL = 5
+MAX_RESTART_DELAY = 300
+# 守护进程聚合各分片指标时，抓取单个分片的超时（秒）
+SCRAPE_TIMEOUT = 2
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """一致性哈希环，增减分片时只有少量目标会换到别的进程。"""
+
+    def __init__(self, nodes, vnodes: int = VNODES):
+        self._ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._points = [point for point, _ in self._ring]
+
+    def node_for(self, key: str):
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._ring)
+        return self._ring[index][1]
+
+
+def build_engine(shard: int = 0, shards: int = 1):
+    """创建只包含本分片目标的轮询引擎。"""
+    import z_stocks.get_cube as get_cube
+    import z_stocks.get_stocks as get_stocks
+    from z_stocks.engine import Engine
+
+    engine = Engine()
+    ring = HashRing(range(shards))
+    for target in get_cube.targets() + get_stocks.targets():
+        if ring.node_for(target.shard_key) == shard:
+            engine.add(target)
+    return engine
+
+
+def _report(engine, shard, reports):
+    from z_stocks.push_queue import push_queue
+    from z_stocks.rate_limit import xueqiu_limiter
+
+    while True:
+        reports.put(
+            {
+                "shard": shard,
+                "pid": os.getpid(),
+                "time": time.time(),
+                "targets": len(engine),
+                **engine.stats,
+                "push_sent": push_queue.sent,
+                "push_failed": push_queue.failed,
+                "push_dropped": push_queue.dropped,
+                "xueqiu_rate": xueqiu_limiter.rate,
+            }
+        )
+        time.sleep(REPORT_INTERVAL)
+
+
+def share_budget(limiter, shards: int):
+    """把全局请求预算平分给 shards 个进程：速率与突发容量都按分片数缩小，突发容量至少为 1。"""
+    with limiter._lock:
+        limiter.max_rate = limiter.rate = limiter.rate / shards
+        limiter.burst = max(1, limiter.burst // shards)
+        limiter._tokens = min(limiter._tokens, float(limiter.burst))
+
+
+def worker_main(shard: int, shards: int, reports, metrics_port: int = 0, record=None, replay_dir=None, speed: float = 0):
+    """工作进程入口：按分片过滤目标，分摊全局请求预算后运行引擎。
+
+    metrics_port 不为 0 时，本分片的指标服务使用 metrics_port + 1 + shard。
+    spawn 出的进程不继承父进程的录制与回放设置，record / replay_dir / speed 在这里重新应用，
+    录制写入各分片自己的文件。
+
+    持仓矩阵与关注索引是进程内的，分片后只能看到本分片的组合与用户，跨组合 / 跨用户的
+    同向提醒会漏报，所以多进程模式下关闭这两类提醒（持仓矩阵本身仍然维护）。
+    """
+    from z_stocks import events, get_cube, get_stocks, profiling, replay, state
+    from z_stocks.rate_limit import xueqiu_limiter
+
+    # spawn 出的进程重新导入 log，需要再次开启后台写日志
+    log.set_enqueue(True)
+    if shards > 1:
+        get_cube.COORDINATED_SIGNALS = False
+        get_stocks.TREND_SIGNALS = False
+        if shard == 0:
+            log.warning("多进程模式下关闭组合同向调仓与自选趋势提醒：这两类统计只覆盖本分片")
+
+    if record:
+        replay.enable_recording(record, tag=f"shard{shard}")
+    if replay_dir:
+        replay.enable_replay(replay_dir, speed)
+
+    if state.STATE_BACKEND != "sqlite":
+        log.warning("多进程模式下 JSON 状态后端会互相覆盖，请使用 sqlite 后端")
+    share_budget(xueqiu_limiter, shards)
+    if metrics_port:
+        metrics.start_server(metrics_port + 1 + shard)
+    profiling.install()
+    events.install()
+    engine = build_engine(shard, shards)
+    log.info(f"分片 {shard}/{shards} 启动，pid={os.getpid()}，目标 {len(engine)} 个")
+    threading.Thread(target=_report, args=(engine, shard, reports), name="ShardReport", daemon=True).start()
+    engine.run()
+
+
+class Supervisor:
+    """启动并守护 N 个工作进程，汇总它们上报的指标。
+
+    工作进程退出或超过 HEARTBEAT_TIMEOUT 没有上报时会被重启，连续重启按指数退避。
+    metrics_port 不为 0 时，守护进程在 metrics_port 上提供聚合后的 /metrics：
+    抓取各分片 metrics_port + 1 + i 上的指标，样本加上 shard 标签。
+    """
+
+    def __init__(self, shards: int, metrics_port: int = 0, record=None, replay_dir=None, speed: float = 0):
+        self.shards = shards
+        self.metrics_port = metrics_port
+        self.replay_options = (record, replay_dir, speed)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._reports = self._ctx.Queue()
+        self._procs = {}
+        self._restarts = {shard: 0 for shard in range(shards)}
+        self._not_before = {shard: 0.0 for shard in range(shards)}
+        self._started = {}
+        self.metrics = {}
+
+    def _start(self, shard):
+        proc = self._ctx.Process(target=worker_main, args=(shard, self.shards, self._reports, self.metrics_port, *self.replay_options), name=f"Shard-{shard}", daemon=True)
+        proc.start()
+        self._procs[shard] = proc
+        self._started[shard] = time.time()
+        self.metrics[shard] = {"shard": shard, "pid": proc.pid, "time": time.time()}
+        log.info(f"正在启动分片进程: {proc.name} pid={proc.pid}")
+
+    def _drain(self):
+        while True:
+            try:
+                report = self._reports.get_nowait()
+            except queue.Empty:
+                return
+            self.metrics[report["shard"]] = report
+
+    def _supervise(self):
+        now = time.time()
+        for shard in range(self.shards):
+            proc = self._procs.get(shard)
+            if proc is not None and proc.is_alive():
+                if now - self.metrics[shard]["time"] <= HEARTBEAT_TIMEOUT:
+                    # 稳定运行一段时间后才清零重启退避
+                    if now - self._started[shard] > HEARTBEAT_TIMEOUT:
+                        self._restarts[shard] = 0
+                    continue
+                log.error(f"分片 {shard} 超过 {HEARTBEAT_TIMEOUT}s 未上报，强制重启")
+                proc.terminate()
+                proc.join(5)
+            elif proc is not None:
+                log.error(f"警告！分片进程 {proc.name} 已退出 (exitcode={proc.exitcode})，准备重启")
+                self._procs.pop(shard)
+            if now < self._not_before[shard]:
+                continue
+            delay = min(MAX_RESTART_DELAY, 2 ** self._restarts[shard])
+            self._restarts[shard] += 1
+            self._not_before[shard] = now + delay
+            self._start(shard)
+
+    def render_metrics(self) -> str:
+        texts = {}
+        up = ["# HELP z_stocks_shard_up 分片指标是否抓取成功", "# TYPE z_stocks_shard_up gauge"]
+        for shard in range(self.shards):
+            url = f"http://{metrics.METRICS_HOST}:{self.metrics_port + 1 + shard}/metrics"
+            try:
+                with urllib.request.urlopen(url, timeout=SCRAPE_TIMEOUT) as response:
+                    texts[shard] = response.read().decode("utf-8")
+            except OSError as e:
+                log.debug(f"抓取分片 {shard} 指标失败: {e}")
+            up.append(f'z_stocks_shard_up{{shard="{shard}"}} {int(shard in texts)}')
+        return metrics.merge(texts) + "\n".join(up) + "\n"
+
+    def totals(self) -> dict:
+        """把所有分片的计数类指标求和。"""
+        totals = {}
+        for report in self.metrics.values():
+            for key, value in report.items():
+                if key not in ("shard", "pid", "time", "xueqiu_rate") and isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def run(self):
+        if self.metrics_port:
+            metrics.start_server(self.metrics_port, render=self.render_metrics)
+        for shard in range(self.shards):
+            self._start(shard)
+        last_summary = time.time()
+        try:
+            while True:
+                time.sleep(SUPERVISE_INTERVAL)
+                self._drain()
+                self._supervise()
+                if time.time() - last_summary >= REPORT_INTERVAL:
+                    last_summary = time.time()
+                    log.info(f"分片汇总: {self.totals()}")
+        finally:
+            for proc in self._procs.values():
+                proc.terminate()
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import log
+from z_stocks import fast_json, profiling
+
+# 状态后端: "sqlite" 按目标增量写入; "json" 原子地整体重写 JSON 文件
+STATE_BACKEND = "sqlite"
+
+data_dir = Path(__file__).parent / r"data"
+# 压测或调试时可通过环境变量指向临时数据库，避免污染真实状态
+state_db = Path(os.environ.get("Z_STOCKS_STATE_DB", data_dir / r"state.db"))
+# JSON 文件同时是监控目标的配置，sqlite 后端只把它们当作初始状态
+JSON_FILES = {
+    "cube": data_dir / r"cube_symbol.json",
+    "stocks": data_dir / r"stocks.json",
+}
+
+
+class StateStore:
+    """状态后端接口。
+
+    状态按 (kind, key) 存放，value 是要合并进目标配置的字段字典，
+    例如 ("cube", "稀缺法则") -> {"laster_id": 213186595}。
+    """
+
+    def load(self, kind: str) -> dict:
+        """返回 {key: value}。"""
+        raise NotImplementedError
+
+    def put(self, kind: str, key: str, value: dict):
+        self.put_many(kind, {key: value})
+
+    def put_many(self, kind: str, items: dict):
+        """原子地写入多条状态。"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteStateStore(StateStore):
+    """SQLite (WAL) 后端，每个目标单独一行，写入量只与变化的目标有关。"""
+
+    def __init__(self, path=state_db):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (kind, key))"
+        )
+
+    def load(self, kind):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM state WHERE kind = ?", (kind,)).fetchall()
+        return {key: fast_json.loads(value) for key, value in rows}
+
+    def put_many(self, kind, items):
+        rows = [(kind, key, fast_json.dumps(value)) for key, value in items.items()]
+        with self._lock, profiling.span("state.put"):
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO state (kind, key, value) VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JsonStateStore(StateStore):
+    """直接写回 JSON 配置文件的后端，先写临时文件再替换，写到一半崩溃也不会损坏原文件。"""
+
+    def __init__(self, files=None):
+        self.files = files or JSON_FILES
+        self._lock = threading.Lock()
+        self._docs = {}
+
+    def _doc(self, kind):
+        if kind not in self._docs:
+            self._docs[kind] = fast_json.loads(self.files[kind].read_bytes())
+        return self._docs[kind]
+
+    def load(self, kind):
+        with self._lock:
+            return {key: dict(value) for key, value in self._doc(kind).items()}
+
+    def put_many(self, kind, items):
+        with self._lock:
+            doc = self._doc(kind)
+            for key, value in items.items():
+                doc.setdefault(key, {}).update(value)
+            atomic_dump(doc, self.files[kind])
+
+
+def atomic_dump(obj, path: Path):
+    """把 obj 以 JSON 写入 path，写入临时文件并 fsync 后原子替换。"""
+    fd, tmp_path = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(fast_json.dumps(obj, pretty=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_targets(kind: str) -> dict:
+    """读取目标配置，并用状态后端中保存的状态覆盖。"""
+    targets = fast_json.loads(JSON_FILES[kind].read_bytes())
+    for key, value in get_store().load(kind).items():
+        if key in targets:
+            targets[key].update(value)
+    return targets
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StateStore:
+    """返回进程内共享的状态后端。"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STATE_BACKEND == "sqlite":
+                _store = SqliteStateStore()
+            else:
+                _store = JsonStateStore()
+            log.info(f"状态后端: {type(_store).__name__}")
+        return _store
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+from z_stocks.watchlist_diff import WatchlistDelta
+
+# 在 TREND_WINDOW 秒内至少 TREND_MIN_USERS 个用户同向调整同一只股票时提醒
+TREND_MIN_USERS = 3
+TREND_WINDOW = 30 * 60
+
+
+class TrendSignal:
+    """一次跨用户的同向调整。
+
+    :ivar direction: "add" 或 "remove"。
+    :ivar users: 窗口内做出同样调整的用户，按时间先后排列。
+    :ivar watchers: 调整后关注该股票的用户数。
+    """
+
+    __slots__ = ("direction", "symbol", "name", "users", "watchers")
+
+    def __init__(self, direction, symbol, name, users, watchers):
+        self.direction = direction
+        self.symbol = symbol
+        self.name = name
+        self.users = users
+        self.watchers = watchers
+
+    def __repr__(self):
+        return f"TrendSignal({self.direction} {self.symbol}, users={self.users}, watchers={self.watchers})"
+
+
+class WatcherIndex:
+    """symbol -> 关注用户 的倒排索引，以及按股票、按方向的滑动窗口。
+
+    只用每个用户的 WatchlistDelta 增量更新，不需要重新扫描所有自选。
+    窗口内的用户数首次达到 min_users 时产生一次信号，窗口内用户数回落到阈值以下后才会再次触发。
+    同一用户在窗口内先加后删（或先删后加）时，互相抵消。
+    """
+
+    def __init__(self, min_users: int = TREND_MIN_USERS, window: float = TREND_WINDOW):
+        self.min_users = min_users
+        self.window = window
+        self.watchers = {}
+        # {(direction, symbol): OrderedDict(user -> time)}
+        self._recent = {}
+        self._fired = set()
+        self._pruned = 0.0
+        self._lock = threading.Lock()
+
+    def seed(self, user, index: dict):
+        """用用户当前的 {symbol: stock} 初始化倒排索引，不产生信号。"""
+        with self._lock:
+            for symbol in index:
+                self.watchers.setdefault(symbol, set()).add(user)
+
+    def watching(self, symbol) -> int:
+        with self._lock:
+            return len(self.watchers.get(symbol, ()))
+
+    def _expire(self, key, now):
+        recent = self._recent[key]
+        while recent and next(iter(recent.values())) <= now - self.window:
+            recent.popitem(last=False)
+        if len(recent) < self.min_users:
+            self._fired.discard(key)
+        if not recent:
+            del self._recent[key]
+
+    def _prune(self, now):
+        # 之后再没有变化的股票不会走到 _record，每个窗口周期统一清理一次
+        if now - self._pruned < self.window:
+            return
+        self._pruned = now
+        for key in list(self._recent):
+            self._expire(key, now)
+
+    def _record(self, direction, symbol, user, now):
+        opposite = ("remove" if direction == "add" else "add", symbol)
+        if opposite in self._recent:
+            self._recent[opposite].pop(user, None)
+            self._expire(opposite, now)
+
+        key = (direction, symbol)
+        recent = self._recent.setdefault(key, OrderedDict())
+        recent.pop(user, None)
+        recent[user] = now
+        self._expire(key, now)
+        if key not in self._fired and len(self._recent.get(key, ())) >= self.min_users:
+            self._fired.add(key)
+            return list(self._recent[key])
+        return None
+
+    def apply(self, user, delta: WatchlistDelta, now: float = None) -> list:
+        """用一个用户的差异更新索引，返回本次新触发的 [TrendSignal, ...]。"""
+        now = time.time() if now is None else now
+        signals = []
+        with self._lock:
+            self._prune(now)
+            for direction, stocks in (("add", delta.added), ("remove", delta.removed)):
+                for symbol, stock in stocks.items():
+                    watchers = self.watchers.setdefault(symbol, set())
+                    if direction == "add":
+                        watchers.add(user)
+                    else:
+                        watchers.discard(user)
+                    users = self._record(direction, symbol, user, now)
+                    if users:
+                        signals.append(TrendSignal(direction, symbol, stock.name, users, len(watchers)))
+                    if not watchers:
+                        del self.watchers[symbol]
+        return signals
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> WatcherIndex:
+    """返回进程内共享的倒排索引。"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = WatcherIndex()
+        return _index
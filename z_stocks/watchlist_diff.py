@@ -0,0 +1,174 @@
+import sys
+import threading
+
+# 同一只股票这些字段变化时视为修改
+WATCHED_FIELDS = ("remark", "category", "watched")
+# 常见取值预先编码，其余取值第一次出现时追加
+MARKETPLACES = ["CN", "HK", "US"]
+EXCHANGES = ["SH", "SZ", "BJ", "HK", "NASDAQ", "NYSE", "CSI"]
+
+
+class CodeTable:
+    """把重复出现的短字符串编码为小整数。"""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._lock = threading.Lock()
+
+    def encode(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self.values)
+                    self.values.append(value)
+        return code
+
+    def decode(self, code: int):
+        return self.values[code]
+
+
+marketplace_codes = CodeTable(MARKETPLACES)
+exchange_codes = CodeTable(EXCHANGES)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class WatchEntry:
+    """一只自选股，只保留对比与格式化用到的字段。
+
+    symbol / name 经过 intern，同一只股票在所有用户之间共享同一个字符串；
+    marketplace / exchange 保存为 CodeTable 中的整数。
+    """
+
+    __slots__ = ("symbol", "name", "_marketplace", "_exchange", "remark", "category", "watched")
+
+    def __init__(self, symbol, name, marketplace=None, exchange=None, remark="", category=None, watched=None):
+        self.symbol = _intern(symbol)
+        self.name = _intern(name)
+        self._marketplace = marketplace_codes.encode(marketplace)
+        self._exchange = exchange_codes.encode(exchange)
+        self.remark = _intern(remark) if remark else ""
+        self.category = category
+        self.watched = watched
+
+    @property
+    def marketplace(self):
+        return marketplace_codes.decode(self._marketplace)
+
+    @property
+    def exchange(self):
+        return exchange_codes.decode(self._exchange)
+
+    @classmethod
+    def from_dict(cls, stock: dict) -> "WatchEntry":
+        """从雪球 API 或保存的状态中的字典构建。"""
+        return cls(
+            stock["symbol"],
+            stock.get("name", stock["symbol"]),
+            stock.get("marketplace"),
+            stock.get("exchange"),
+            stock.get("remark") or "",
+            stock.get("category"),
+            stock.get("watched"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "name": self.name,
+            "marketplace": self.marketplace,
+            "exchange": self.exchange,
+            "remark": self.remark,
+            "category": self.category,
+            "watched": self.watched,
+        }
+
+    def __repr__(self):
+        return f"WatchEntry({self.symbol} {self.name})"
+
+
+def _unchanged(entry: WatchEntry, stock: dict) -> bool:
+    return (
+        entry.watched == stock.get("watched")
+        and entry.category == stock.get("category")
+        and entry.remark == (stock.get("remark") or "")
+        and entry.name == stock.get("name", entry.symbol)
+    )
+
+
+def load_watchlist(stocks, previous: dict = None) -> list:
+    """把 API 返回的自选列表转换为 [WatchEntry, ...]，已经转换过的条目原样保留。
+
+    :param previous: 上一轮的 {symbol: WatchEntry}。字段没有变化的股票直接复用上一轮的对象，
+        绝大多数轮次里整张自选都不需要新建对象，diff_watchlist 也可以按身份跳过比较。
+    """
+    previous = previous or {}
+    entries = []
+    for stock in stocks:
+        if not isinstance(stock, WatchEntry):
+            entry = previous.get(stock["symbol"])
+            stock = entry if entry is not None and _unchanged(entry, stock) else WatchEntry.from_dict(stock)
+        entries.append(stock)
+    return entries
+
+
+class WatchlistDelta:
+    """一次自选对比的结果。
+
+    :ivar added: {symbol: WatchEntry} 新增的股票。
+    :ivar removed: {symbol: WatchEntry} 删除的股票。
+    :ivar modified: {symbol: {field: (old, new)}} 字段发生变化的股票。
+    """
+
+    __slots__ = ("added", "removed", "modified")
+
+    def __init__(self, added=None, removed=None, modified=None):
+        self.added = added or {}
+        self.removed = removed or {}
+        self.modified = modified or {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def __repr__(self):
+        return f"WatchlistDelta(added={list(self.added)}, removed={list(self.removed)}, modified={list(self.modified)})"
+
+
+def index_watchlist(stocks) -> dict:
+    """把自选列表转换为 {symbol: WatchEntry}，保持原顺序。"""
+    return {stock.symbol: stock for stock in load_watchlist(stocks)}
+
+
+def diff_watchlist(old_index: dict, new_stocks):
+    """一次遍历新列表，计算新增、删除与修改。
+
+    :param old_index: 上一轮的 {symbol: WatchEntry}。
+    :param new_stocks: 本轮的 [WatchEntry, ...]，见 load_watchlist。
+    :return: (WatchlistDelta, 本轮的 {symbol: WatchEntry})
+    """
+    new_index = {}
+    added = {}
+    modified = {}
+    for stock in new_stocks:
+        symbol = stock.symbol
+        new_index[symbol] = stock
+        old = old_index.get(symbol)
+        if old is None:
+            added[symbol] = stock
+            continue
+        if old is stock:
+            continue
+        changes = {field: (getattr(old, field), getattr(stock, field)) for field in WATCHED_FIELDS if getattr(old, field) != getattr(stock, field)}
+        if changes:
+            modified[symbol] = changes
+
+    # 新旧数量对得上时不可能有删除，省去对旧索引的扫描
+    removed = {}
+    if len(old_index) != len(new_index) - len(added):
+        removed = {symbol: stock for symbol, stock in old_index.items() if symbol not in new_index}
+    return WatchlistDelta(added, removed, modified), new_index